@@ -1,22 +1,26 @@
-from dotenv import load_dotenv
+import uuid
 
 from typing import Annotated
 
 from typing_extensions import TypedDict
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from langchain_mcp_adapters.tools import load_mcp_tools
-
-from langgraph.graph import StateGraph, START, END
-from langgraph.graph.message import add_messages
-
-from langgraph.prebuilt import ToolNode, tools_condition
-
-from langgraph.checkpoint.memory import MemorySaver
+from octorag_tracing import chat_span, record_model_usage, span
 
 
 class OctoRAG:
-    def __init__(self, path_to_env_file=None):
+    def __init__(self, path_to_env_file=None, model: str | None = None):
+        # LangChain and LangGraph take about a second to import, so importing this module
+        # leaves them to the first OctoRAG instance.
+        from dotenv import load_dotenv
+        from langgraph.graph import StateGraph, START, END
+        from langgraph.graph.message import add_messages
+        from langgraph.prebuilt import tools_condition
+        from langgraph.checkpoint.memory import MemorySaver
+
+        from octorag_cassette import invoke_model
+        from octorag_models import model_for
+        from octorag_toolnode import ConcurrentToolNode
+
         class State(TypedDict):
             # Messages have the type "list". The `add_messages` function
             # in the annotation defines how this state key should be updated
@@ -29,21 +33,29 @@ class OctoRAG:
 
         from langchain.chat_models import init_chat_model
 
-        llm = init_chat_model("anthropic:claude-3-7-sonnet-latest")
+        # The model can be configured in the .env file.
+        load_dotenv(path_to_env_file)
 
-        def llm_state(state: State):
-            return {"messages": [llm.invoke(state["messages"])]}
+        llm = init_chat_model(model_for("local", model))
 
-        load_dotenv(path_to_env_file)
+        def llm_state(state: State):
+            with span(
+                "invoke_agent OctoRAG", **{"gen_ai.agent.name": "OctoRAG"}
+            ), chat_span(llm) as call:
+                message = invoke_model("OctoRAG", llm, state["messages"])
+                record_model_usage(call, message)
+            return {"messages": [message]}
 
         from octorag_tools import (
             query_for_github_repos,
             get_readme,
             get_repo_tree,
             get_file_contents,
+            get_files_contents,
             create_repo,
             create_file,
             append_to_file,
+            upload_files,
         )
 
         tools = [
@@ -51,7 +63,9 @@ class OctoRAG:
             get_readme,
             get_repo_tree,
             get_file_contents,
+            get_files_contents,
             create_repo,
+            upload_files,
             create_file,
             append_to_file,
         ]
@@ -66,7 +80,7 @@ class OctoRAG:
         graph_builder.add_edge(START, "llm")
         graph_builder.add_edge("llm", END)
 
-        tool_node = ToolNode(tools=tools)
+        tool_node = ConcurrentToolNode(tools=tools)
         graph_builder.add_node("tools", tool_node)
 
         graph_builder.add_conditional_edges(
@@ -77,16 +91,38 @@ class OctoRAG:
 
         self.graph = graph_builder.compile(checkpointer=memory)
 
-        self.config = {"configurable": {"thread_id": "1"}, "recursion_limit": 100}
-
-    def query(self, query: str):
-        events = self.graph.stream(
-            {"messages": [{"role": "user", "content": query}]},
-            self.config,
-            stream_mode="values",
-        )
-
-        # Force run to finish before printing responses
-        all_events = list(events)
-
-        return all_events[-1]["messages"][-1].content
+        self.config = {"recursion_limit": 100}
+
+    def _config(self, thread_id: str | None) -> dict:
+        # Each query gets its own conversation thread unless it continues an earlier one.
+        return {
+            **self.config,
+            "configurable": {"thread_id": thread_id or uuid.uuid4().hex},
+        }
+
+    def query(self, query: str, thread_id: str | None = None):
+        config = self._config(thread_id)
+        with span(
+            "query", **{"octorag.thread_id": config["configurable"]["thread_id"]}
+        ):
+            state = self.graph.invoke(
+                {"messages": [{"role": "user", "content": query}]}, config
+            )
+
+        return state["messages"][-1].content
+
+    def stream(self, query: str, thread_id: str | None = None):
+        """Yields model tokens and tool calls as they happen, as the events described in
+        ``octorag_stream``."""
+        from octorag_stream import STREAM_MODE, to_events
+
+        config = self._config(thread_id)
+        with span(
+            "query", **{"octorag.thread_id": config["configurable"]["thread_id"]}
+        ):
+            for mode, chunk in self.graph.stream(
+                {"messages": [{"role": "user", "content": query}]},
+                config,
+                stream_mode=STREAM_MODE,
+            ):
+                yield from to_events(mode, chunk)
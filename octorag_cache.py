@@ -0,0 +1,299 @@
+"""Persistent, content-addressed cache for GitHub API read responses.
+
+Responses are indexed in a small SQLite database by request key, while the bodies themselves are
+stored once per distinct content hash under ``blobs/``. Each entry keeps the ``ETag`` and
+``Last-Modified`` validators GitHub returned, so stale entries are revalidated with a conditional
+request; a ``304 Not Modified`` does not count against the primary rate limit.
+
+The cache is bounded by total body size and evicts least recently used entries first. Freshness is
+decided per endpoint, see ``DEFAULT_TTLS``. Environment variables:
+
+- ``OCTORAG_CACHE``: Set to ``0`` to disable caching. Default enabled.
+- ``OCTORAG_CACHE_DIR``: Where to keep the cache. Default ``~/.cache/octorag``.
+- ``OCTORAG_CACHE_MAX_BYTES``: Maximum total size of cached bodies. Default 256 MiB.
+- ``OCTORAG_CACHE_TTL_<ENDPOINT>``: Override the TTL in seconds of one endpoint, e.g. ``OCTORAG_CACHE_TTL_TREE=60``.
+  Responses pinned to a commit or tree SHA use the ``pinned`` endpoint.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+# Seconds an entry is served without contacting GitHub. After that it is revalidated.
+DEFAULT_TTLS = {
+    "pinned": 7 * 24 * 3600,
+    "readme": 3600,
+    "contents": 3600,
+    "tree": 600,
+    "repo": 300,
+    "default": 60,
+}
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+_SHA_PATTERN = re.compile(r"[0-9a-f]{40}")
+
+
+def endpoint_for_path(path: str, query: str = "") -> str:
+    """Classifies an API path into one of the ``DEFAULT_TTLS`` endpoints."""
+    # Objects addressed by commit or tree SHA never change.
+    tree = re.search(r"/git/trees/([^/]+)$", path)
+    if (tree and _SHA_PATTERN.fullmatch(tree.group(1))) or re.search(
+        r"(^|&)ref=[0-9a-f]{40}(&|$)", query
+    ):
+        return "pinned"
+    if re.search(r"/contents/readme(\.[^/]*)?$", path, re.IGNORECASE) or path.endswith(
+        "/readme"
+    ):
+        return "readme"
+    if "/contents/" in path:
+        return "contents"
+    if "/git/trees/" in path:
+        return "tree"
+    if re.fullmatch(r"/repos/[^/]+/[^/]+(/branches/[^/]+)?", path):
+        return "repo"
+    return "default"
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    body: bytes
+    content_type: str | None
+    etag: str | None
+    last_modified: str | None
+    fresh: bool
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttls: dict | None = None,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "revalidations": 0,
+            "refreshes": 0,
+            "stores": 0,
+            "evictions": 0,
+            "bytes_saved": 0,
+        }
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(directory, "index.sqlite"), check_same_thread=False
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, endpoint TEXT, digest TEXT, size INTEGER, content_type TEXT, "
+            "etag TEXT, last_modified TEXT, stored_at REAL, last_access REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def make_key(method: str, url: str, accept: str | None = None) -> str:
+        return hashlib.sha256(f"{method} {url} {accept or ''}".encode()).hexdigest()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], digest)
+
+    def lookup(self, key: str) -> CacheEntry | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT endpoint, digest, content_type, etag, last_modified, stored_at "
+                "FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            endpoint, digest, content_type, etag, last_modified, stored_at = row
+            try:
+                with open(self._blob_path(digest), "rb") as f:
+                    body = f.read()
+            except FileNotFoundError:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.commit()
+                self.counters["misses"] += 1
+                return None
+            fresh = time.time() - stored_at < self.ttls.get(
+                endpoint, self.ttls["default"]
+            )
+            if fresh:
+                self.counters["hits"] += 1
+                self.counters["bytes_saved"] += len(body)
+                self._db.execute(
+                    "UPDATE entries SET last_access = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+                self._db.commit()
+            return CacheEntry(key, body, content_type, etag, last_modified, fresh)
+
+    def conditional_headers(self, entry: CacheEntry | None) -> dict:
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def revalidated(self, entry: CacheEntry):
+        """Marks a stale entry as fresh again after GitHub answered ``304 Not Modified``."""
+        with self._lock:
+            now = time.time()
+            self._db.execute(
+                "UPDATE entries SET stored_at = ?, last_access = ? WHERE key = ?",
+                (now, now, entry.key),
+            )
+            self._db.commit()
+            self.counters["revalidations"] += 1
+            self.counters["bytes_saved"] += len(entry.body)
+
+    def store(
+        self,
+        key: str,
+        endpoint: str,
+        body: bytes,
+        content_type: str | None = None,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        refreshed: bool = False,
+    ):
+        if len(body) > self.max_bytes:
+            return
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+            now = time.time()
+            previous = self._db.execute(
+                "SELECT digest FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    endpoint,
+                    digest,
+                    len(body),
+                    content_type,
+                    etag,
+                    last_modified,
+                    now,
+                    now,
+                ),
+            )
+            if previous and previous[0] != digest:
+                self._release_blob(previous[0])
+            self.counters["refreshes" if refreshed else "stores"] += 1
+            self._evict()
+            self._db.commit()
+
+    def _release_blob(self, digest: str):
+        # Bodies are shared between keys, so only delete the file once nothing points at it.
+        (refs,) = self._db.execute(
+            "SELECT COUNT(*) FROM entries WHERE digest = ?", (digest,)
+        ).fetchone()
+        if refs == 0:
+            try:
+                os.remove(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def _total_bytes(self) -> int:
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM "
+            "(SELECT size FROM entries GROUP BY digest)"
+        ).fetchone()
+        return total
+
+    def _evict(self):
+        total = self._total_bytes()
+        while total > self.max_bytes:
+            row = self._db.execute(
+                "SELECT key, digest FROM entries ORDER BY last_access LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            key, digest = row
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._release_blob(digest)
+            self.counters["evictions"] += 1
+            total = self._total_bytes()
+
+    def clear(self):
+        with self._lock:
+            digests = [
+                d for (d,) in self._db.execute("SELECT DISTINCT digest FROM entries")
+            ]
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+            for digest in digests:
+                self._release_blob(digest)
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+            stats = dict(self.counters)
+            stats["entries"] = entries
+            stats["bytes"] = self._total_bytes()
+            stats["max_bytes"] = self.max_bytes
+            return stats
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache = None
+_cache_disabled = False
+
+
+def get_cache() -> ResponseCache | None:
+    """Returns the process-wide cache configured from the environment, or None if caching is disabled."""
+    global _cache, _cache_disabled
+    if _cache is not None or _cache_disabled:
+        return _cache
+    if os.getenv("OCTORAG_CACHE", "1").lower() in ("0", "false", "no"):
+        _cache_disabled = True
+        return None
+    directory = os.getenv("OCTORAG_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "octorag"
+    )
+    max_bytes = int(os.getenv("OCTORAG_CACHE_MAX_BYTES") or DEFAULT_MAX_BYTES)
+    ttls = {}
+    for endpoint in DEFAULT_TTLS:
+        value = os.getenv(f"OCTORAG_CACHE_TTL_{endpoint.upper()}")
+        if value:
+            ttls[endpoint] = float(value)
+    _cache = ResponseCache(directory, max_bytes=max_bytes, ttls=ttls)
+    return _cache
+
+
+def set_cache(cache: ResponseCache | None):
+    """Replaces the process-wide cache. Passing None disables caching."""
+    global _cache, _cache_disabled
+    _cache = cache
+    _cache_disabled = cache is None
@@ -0,0 +1,317 @@
+"""Record/replay of GitHub requests and model calls, for reruns of a session without the network.
+
+In record mode, every GitHub response and every agent's model reply is written to a cassette as it
+happens. In replay mode, they are served from the cassette instead, either with the latency they
+originally had or with none, so a whole multi-agent run can be rerun in seconds, offline and
+deterministically. Requests are matched by method and URL, and model calls by agent, in the order
+they were recorded; when several are waiting, the one with the same request body or prompt goes
+first. Nothing else has to match, so a tool that sends a random repository name still gets the
+recorded answer, and the recorded name is then used from there on.
+
+A cassette is a directory holding ``github.jsonl.gz`` and ``models.jsonl.gz``, written by
+whichever process makes those calls, so the MCP server and its client can share one. Both are
+gzip-compressed JSON lines in which each distinct body is stored once. Recording and replaying
+start from an empty response cache, so that the same requests reach the cassette both times.
+
+- ``OCTORAG_CASSETTE``: Cassette directory. Default none, which disables recording and replaying.
+- ``OCTORAG_CASSETTE_MODE``: ``record`` or ``replay``. Default ``replay`` when the cassette already
+  has the file, ``record`` otherwise.
+- ``OCTORAG_CASSETTE_LATENCY``: ``original`` to replay calls as slowly as they were recorded, or
+  ``none``. Default ``original``.
+"""
+
+import asyncio
+import atexit
+import base64
+import collections
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import httpx
+
+from octorag_cache import ResponseCache, get_cache, set_cache
+
+_overrides = {}
+_cassettes = {}
+_lock = threading.Lock()
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def configure_cassette(
+    path: str | None = None, mode: str | None = None, latency: str | None = None
+):
+    """Overrides the environment variables above. Call it before the first GitHub or model call."""
+    for key, value in (("path", path), ("mode", mode), ("latency", latency)):
+        if value is not None:
+            _overrides[key] = value
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class Cassette:
+    """One file of recorded interactions, each filed under a key such as ``GET /repos/a/b``."""
+
+    def __init__(self, path: str, mode: str, replay_latency: bool = True):
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._bodies = {}
+        self._entries = collections.defaultdict(collections.deque)
+        self._file = None
+        if mode == "replay":
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = gzip.open(path, "wt", encoding="utf-8")
+
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                if record["type"] == "body":
+                    self._bodies[record["digest"]] = base64.b64decode(record["data"])
+                else:
+                    self._entries[record["key"]].append(record)
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def body(self, digest: str) -> bytes:
+        return self._bodies[digest]
+
+    def record(self, key: str, entry: dict, bodies: dict[str, bytes]):
+        """Appends ``entry`` under ``key``. ``bodies`` maps the entry's fields that hold large
+        data to that data, which is stored once however often it recurs."""
+        with self._lock:
+            for field, data in bodies.items():
+                digest = _digest(data)
+                if digest not in self._bodies:
+                    self._bodies[digest] = data
+                    self._write(
+                        {
+                            "type": "body",
+                            "digest": digest,
+                            "data": base64.b64encode(data).decode(),
+                        }
+                    )
+                entry[field] = digest
+            self._write({"type": "entry", "key": key, **entry})
+            # Flushed each time, so a session that is killed still leaves a usable cassette.
+            self._file.flush()
+
+    def take(self, key: str, match: str | None = None) -> dict:
+        """Returns the next recorded entry under ``key``, preferring one whose ``match`` field
+        equals ``match``. The last entry is served again once the others are used up."""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded interaction for {key}")
+            entry = next((e for e in entries if e.get("match") == match), entries[0])
+            if len(entries) > 1:
+                entries.remove(entry)
+            return entry
+
+    def delay(self, entry: dict) -> float:
+        return entry["elapsed"] if self.replay_latency else 0.0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def get_cassette(kind: str) -> Cassette | None:
+    """Returns the process-wide cassette of ``kind`` (``github`` or ``models``), or None."""
+    directory = _overrides.get("path") or os.getenv("OCTORAG_CASSETTE")
+    if not directory:
+        return None
+    with _lock:
+        if kind not in _cassettes:
+            path = os.path.join(directory, f"{kind}.jsonl.gz")
+            mode = _overrides.get("mode") or os.getenv("OCTORAG_CASSETTE_MODE")
+            mode = mode or ("replay" if os.path.exists(path) else "record")
+            latency = (
+                _overrides.get("latency")
+                or os.getenv("OCTORAG_CASSETTE_LATENCY")
+                or "original"
+            )
+            if not _cassettes:
+                _isolate_cache()
+            _cassettes[kind] = Cassette(path, mode, latency != "none")
+        return _cassettes[kind]
+
+
+def _isolate_cache():
+    cache = get_cache()
+    if cache is not None:
+        set_cache(
+            ResponseCache(
+                tempfile.mkdtemp(prefix="octorag-cassette-"),
+                max_bytes=cache.max_bytes,
+                ttls=cache.ttls,
+            )
+        )
+
+
+def close_cassettes():
+    with _lock:
+        for cassette in _cassettes.values():
+            cassette.close()
+        _cassettes.clear()
+
+
+atexit.register(close_cassettes)
+
+
+# GitHub requests
+
+
+def _request_key(request: httpx.Request) -> str:
+    url = request.url
+    query = "&".join(sorted(url.query.decode().split("&"))) if url.query else ""
+    # The same URL answers differently depending on the media type asked for.
+    accept = request.headers.get("Accept", "")
+    return (
+        f"{request.method} {url.path}" + (f"?{query}" if query else "") + f" {accept}"
+    )
+
+
+def _request_match(request: httpx.Request) -> str:
+    return _digest(request.content or b"")
+
+
+def _response(status: int, headers, raw: bytes, request) -> httpx.Response:
+    # Bodies are kept as sent, still compressed if they were, and decoded by the client.
+    return httpx.Response(
+        status, headers=headers, stream=httpx.ByteStream(raw), request=request
+    )
+
+
+def _replayed(cassette: Cassette, entry: dict, request) -> httpx.Response:
+    return _response(
+        entry["status"], entry["headers"], cassette.body(entry["body"]), request
+    )
+
+
+def _record_response(
+    cassette: Cassette, request, response: httpx.Response, raw: bytes, elapsed: float
+):
+    cassette.record(
+        _request_key(request),
+        {
+            "match": _request_match(request),
+            "status": response.status_code,
+            "headers": response.headers.multi_items(),
+            "elapsed": round(elapsed, 4),
+        },
+        {"body": raw},
+    )
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """Records the responses of ``transport``, or replays them without calling it."""
+
+    def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport):
+        self.cassette = cassette
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        if self.cassette.mode == "replay":
+            entry = self.cassette.take(_request_key(request), _request_match(request))
+            await asyncio.sleep(self.cassette.delay(entry))
+            return _replayed(self.cassette, entry, request)
+        start = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        try:
+            raw = b"".join([chunk async for chunk in response.stream])
+        finally:
+            await response.aclose()
+        _record_response(
+            self.cassette, request, response, raw, time.perf_counter() - start
+        )
+        return _response(response.status_code, response.headers, raw, request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def wrap_transport(transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+    """Returns ``transport`` wrapped to record to or replay from the GitHub cassette, or as is if
+    no cassette is configured."""
+    cassette = get_cassette("github")
+    if cassette is None:
+        return transport
+    return CassetteTransport(cassette, transport)
+
+
+# Model calls
+
+
+def _prompt_match(messages) -> str:
+    from langchain_core.messages import convert_to_messages
+
+    # Message IDs differ from run to run, so only what the model actually reads is compared.
+    prompt = [
+        [message.type, message.content, getattr(message, "tool_calls", None)]
+        for message in convert_to_messages(messages)
+    ]
+    return _digest(json.dumps(prompt, sort_keys=True, default=str).encode())
+
+
+def _record_reply(cassette: Cassette, agent: str, messages, reply, elapsed: float):
+    from langchain_core.messages import message_to_dict
+
+    cassette.record(
+        agent,
+        {"match": _prompt_match(messages), "elapsed": round(elapsed, 4)},
+        {"reply": json.dumps(message_to_dict(reply)).encode()},
+    )
+
+
+def _recorded_reply(cassette: Cassette, entry: dict):
+    from langchain_core.messages import messages_from_dict
+
+    return messages_from_dict([json.loads(cassette.body(entry["reply"]))])[0]
+
+
+def invoke_model(agent: str, model, messages):
+    """Calls ``model`` on behalf of ``agent``, recording or replaying the reply if a cassette is
+    configured."""
+    cassette = get_cassette("models")
+    if cassette is None:
+        return model.invoke(messages)
+    if cassette.mode == "replay":
+        entry = cassette.take(agent, _prompt_match(messages))
+        time.sleep(cassette.delay(entry))
+        return _recorded_reply(cassette, entry)
+    start = time.perf_counter()
+    reply = model.invoke(messages)
+    _record_reply(cassette, agent, messages, reply, time.perf_counter() - start)
+    return reply
+
+
+async def ainvoke_model(agent: str, model, messages):
+    """Async counterpart of ``invoke_model``."""
+    cassette = get_cassette("models")
+    if cassette is None:
+        return await model.ainvoke(messages)
+    if cassette.mode == "replay":
+        entry = cassette.take(agent, _prompt_match(messages))
+        await asyncio.sleep(cassette.delay(entry))
+        return _recorded_reply(cassette, entry)
+    start = time.perf_counter()
+    reply = await model.ainvoke(messages)
+    _record_reply(cassette, agent, messages, reply, time.perf_counter() - start)
+    return reply
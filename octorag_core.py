@@ -0,0 +1,547 @@
+"""The GitHub tools of OctoRAG, implemented once as coroutines.
+
+``octorag_mcp_server`` serves them as MCP tools, and ``octorag_tools`` wraps them for the local
+agent, so both get the same pooled client, response cache, rate limiting and concurrency from
+``octorag_github``.
+"""
+
+from typing import Any
+import asyncio
+import re
+import base64
+
+from octorag_embeddings import rerank, rerank_enabled, rerank_pool
+from octorag_readme import select_sections
+from octorag_search import (
+    MAX_RESULTS,
+    build_queries,
+    candidate_count,
+    merge_results,
+    page_count,
+    per_page,
+)
+from octorag_github import (
+    agithub_request,
+    agithub_stream,
+    acached_get,
+    cached_body,
+    RAW_HEADERS,
+    aresolve_head_sha,
+    pinned_ref,
+    tree_concurrency,
+    read_concurrency,
+)
+from octorag_snapshot import get_snapshots, snapshot_file
+
+LINESEP = "----------------------\n"
+
+
+async def search_repos(query: str, count: int) -> list[dict]:
+    params = {"q": query, "sort": "stars", "per_page": per_page(count)}
+
+    async def page(number: int) -> dict:
+        response = await agithub_request(
+            "GET", "/search/repositories", params={**params, "page": number}
+        )
+        response.raise_for_status()
+        return response.json()
+
+    # The first page tells how many results exist; the remaining pages are fetched concurrently.
+    first = await page(1)
+    items = first["items"]
+    available = min(first["total_count"], MAX_RESULTS, count)
+    pages = min(page_count(count), -(-available // params["per_page"]))
+    for data in await asyncio.gather(*(page(n) for n in range(2, pages + 1))):
+        items.extend(data["items"])
+    return items[:count]
+
+
+async def query_repos(keywords: str, count: int) -> Any:
+    queries = build_queries(keywords)
+    # A single search is already ranked; several are merged from larger pools of candidates.
+    pool = candidate_count(count) if len(queries) > 1 else count
+    try:
+        results = await asyncio.gather(
+            *(search_repos(query, pool) for query in queries)
+        )
+        return merge_results(results, count)
+    except Exception as e:
+        return f"An error occurred: {e}"
+
+
+def format_repos(repos_json: Any, count: int) -> str:
+    repos = repos_json["items"][: min(len(repos_json["items"]), count)]
+    out = ""
+    for r in repos:
+        out += LINESEP
+        out += f"Repository Name: {r['name']}\n"
+        out += f"Repository Owner: {r['owner']['login']}\n"
+        out += f"Repository URL: {r['html_url']}\n"
+        out += f"Repository Description: {r['description']}\n"
+        out += f"Repository Stars: {r['stargazers_count']}\n"
+        out += f"Repository License: {r['license']['name'] if r['license'] else 'No license'}\n"
+    out += LINESEP
+    return out
+
+
+async def get_readme(
+    html_url: str, focus: str | None = None, full: bool = False
+) -> str:
+    """Returns the README of an input GitHub repository, without badges, images and HTML. Long READMEs are shortened to the sections that fit in a token budget; pass `focus` to get the sections most relevant to what you are looking for.
+
+    Args:
+        html_url: The URL of the repository whose README you want to read. URL should be of the form https://github.com/owner/repo.
+        focus: What you want to learn from the README, for example `installation and usage as a library`. The sections most relevant to it are returned. Defaults to the README's first sections.
+        full: Set to True to get the entire, unprocessed README instead. Default False.
+    """
+    matches = re.match("https?://github\\.com/([^/]+)/([^/]+)/?", html_url)
+    owner = ""
+    repo = ""
+    if matches:
+        owner, repo = matches.groups()
+    else:
+        return "Malformed input URL. Expects a GitHub HTML URL of the form https://github.com/owner/repo"
+
+    body = snapshot_file(owner, repo, "README.md")
+    if body is not None:
+        return select_sections(
+            body.decode("utf-8", errors="replace"), focus=focus, full=full
+        )
+
+    url = f"/repos/{owner}/{repo}/contents/README.md"
+    try:
+        response = await acached_get(url)
+        response.raise_for_status()
+        data = response.json()
+        content = base64.b64decode(data["content"]).decode("utf-8")
+    except Exception:
+        return "Repository does not have a readme"
+    return select_sections(content, focus=focus, full=full)
+
+
+async def query_for_github_repos(keywords: str, count: int = 1) -> str:
+    """Get information about repositories relevant to the keywords you enter. Repositories matching more of the keywords come first, then those with more stars.
+
+    Args:
+        keywords: List of keywords you want to search for. Keywords can be multiple words long (in which case they must be separated by spaces), but each keyword must be delimited by a comma. A sample query might be `python,computer vision,confidential`, without the backticks. Keywords that are programming languages, GitHub search qualifiers such as `topic:raytracing` or `stars:>100`, or phrases such as `more than 500 stars` or `updated since 2024` filter every keyword's results.
+        count: The number of repositories you want information about (the top `count` repositories). Default 1. If the keywords return less repositories than the inputted value, returns information about all repositories.
+    """
+    # Re-ranking needs a larger pool of candidates to choose the top `count` from.
+    pool = rerank_pool(count) if rerank_enabled() else count
+    repo_info = await query_repos(keywords, pool)
+    if isinstance(repo_info, str):
+        return repo_info
+    if rerank_enabled():
+        # Embedding, and loading a sentence-transformers model, would otherwise block every
+        # other query sharing the event loop.
+        repo_info = await asyncio.to_thread(
+            rerank, keywords.replace(",", " "), repo_info, count
+        )
+    repo_output = format_repos(repo_info, count)
+    return repo_output
+
+
+async def fetch_tree(
+    owner: str, repo: str, sha: str, semaphore: asyncio.Semaphore, prefix: str = ""
+) -> list[str]:
+    tree_url = f"/repos/{owner}/{repo}/git/trees/{sha}"
+    async with semaphore:
+        response = await acached_get(tree_url + "?recursive=1")
+    response.raise_for_status()
+    data = response.json()
+    if not data.get("truncated"):
+        return [prefix + v["path"] for v in data["tree"]]
+
+    # GitHub caps recursive listings, so list this level and fetch every subtree concurrently.
+    async with semaphore:
+        response = await acached_get(tree_url)
+    response.raise_for_status()
+    entries = response.json()["tree"]
+    subtrees = await asyncio.gather(
+        *(
+            fetch_tree(owner, repo, v["sha"], semaphore, prefix + v["path"] + "/")
+            for v in entries
+            if v["type"] == "tree"
+        )
+    )
+    subtrees = iter(subtrees)
+    paths = []
+    for v in entries:
+        paths.append(prefix + v["path"])
+        if v["type"] == "tree":
+            paths.extend(next(subtrees))
+    return paths
+
+
+async def get_repo_tree(html_url: str) -> str:
+    """Get the list of files of a given repository.
+
+    Args:
+        html_url: The URL of the repository you want the file list of. Must be of the format `https://github.com/owner/repo`.
+    """
+
+    matches = re.match("https?://github\\.com/([^/]+)/([^/]+)/?", html_url)
+    owner = ""
+    repo = ""
+    if matches:
+        owner, repo = matches.groups()
+    else:
+        return "Malformed input URL. Expects a GitHub HTML URL of the form https://github.com/owner/repo"
+    try:
+        # Pinning to the commit SHA lets later get_file_contents calls read the same snapshot.
+        head_sha = await aresolve_head_sha(owner, repo)
+    except Exception as e:
+        return f"Failed at default branch SHA obtain: {e}"
+
+    tree = None
+    # In snapshot mode the whole repository is downloaded once, and later reads of it are local.
+    snapshots = get_snapshots()
+    if snapshots is not None:
+        snapshot = await snapshots.aopen(owner, repo, head_sha)
+        if snapshot is not None:
+            tree = snapshot.tree()
+    try:
+        if tree is None:
+            tree = await fetch_tree(
+                owner, repo, head_sha, asyncio.Semaphore(tree_concurrency())
+            )
+    except Exception as e:
+        return f"Repository does not have a tree: {e}"
+
+    out = ""
+    out += "File list:\n"
+    for path in tree:
+        out += f"{path}\n"
+    return out
+
+
+# Statuses GitHub answers with when a file is too large for the contents API.
+TOO_LARGE_STATUSES = (403, 413, 422)
+
+
+async def blob_url(owner: str, repo: str, file_dir: str) -> str:
+    # The blobs API serves files the contents API refuses; find the blob SHA in the parent directory.
+    parent, _, name = file_dir.rstrip("/").rpartition("/")
+    url = f"/repos/{owner}/{repo}/contents/{parent}"
+    ref = pinned_ref(owner, repo)
+    if ref is not None:
+        url += f"?ref={ref}"
+    response = await acached_get(url)
+    response.raise_for_status()
+    for entry in response.json():
+        if entry["name"] == name:
+            return f"/repos/{owner}/{repo}/git/blobs/{entry['sha']}"
+    raise FileNotFoundError(file_dir)
+
+
+async def read_lines(
+    url: str, start_line: int, end_line: int | None
+) -> list[str] | None:
+    lines = []
+    async with agithub_stream("GET", url, headers=RAW_HEADERS) as response:
+        if response.status_code in TOO_LARGE_STATUSES:
+            return None
+        response.raise_for_status()
+        number = 0
+        # Stop downloading as soon as the requested range has been read.
+        async for line in response.aiter_lines():
+            number += 1
+            if end_line is not None and number > end_line:
+                break
+            if number >= start_line:
+                lines.append(line)
+    return lines
+
+
+async def fetch_file(
+    owner: str,
+    repo: str,
+    file_dir: str,
+    start_line: int | None = None,
+    end_line: int | None = None,
+) -> str:
+    url = f"/repos/{owner}/{repo}/contents/{file_dir}"
+    ref = pinned_ref(owner, repo)
+    if ref is not None:
+        url += f"?ref={ref}"
+
+    body = snapshot_file(owner, repo, file_dir)
+    if start_line is None and end_line is None:
+        if body is not None:
+            return body.decode("utf-8", errors="replace")
+        response = await acached_get(url, headers=RAW_HEADERS)
+        if response.status_code in TOO_LARGE_STATUSES:
+            response = await acached_get(
+                await blob_url(owner, repo, file_dir), headers=RAW_HEADERS
+            )
+        response.raise_for_status()
+        return response.content.decode("utf-8", errors="replace")
+
+    start_line = max(start_line or 1, 1)
+    if body is None:
+        body = cached_body(url, headers=RAW_HEADERS)
+    if body is not None:
+        lines = body.decode("utf-8", errors="replace").splitlines()
+        lines = lines[start_line - 1 : end_line]
+    else:
+        lines = await read_lines(url, start_line, end_line)
+        if lines is None:
+            lines = await read_lines(
+                await blob_url(owner, repo, file_dir), start_line, end_line
+            )
+    if not lines:
+        return f"File {file_dir} has fewer than {start_line} lines."
+    return "\n".join(lines)
+
+
+def format_files(paths: list[str], contents: list[str], max_bytes: int) -> str:
+    out = ""
+    used = 0
+    omitted = []
+    for file_dir, content in zip(paths, contents):
+        size = len(content.encode("utf-8"))
+        if used + size > max_bytes:
+            omitted.append(file_dir)
+            continue
+        used += size
+        out += f"==== {file_dir} ====\n{content}\n"
+    if omitted:
+        out += f"Omitted because the {max_bytes} byte budget was reached, read them separately if needed: {', '.join(omitted)}\n"
+    return out
+
+
+async def get_file_contents(
+    html_url: str,
+    file_dir: str,
+    start_line: int | None = None,
+    end_line: int | None = None,
+) -> str:
+    """Returns the contents of a file in a GitHub repository. For large files, read one range of lines at a time with start_line and end_line.
+
+    Args:
+        html_url: The URL of the repository you want the file list of. Must be of the format `https://github.com/owner/repo`.
+        file_dir: The location of the file you want to read within the repository. For example, if the file is located at `ROOT/path/to/file`, where `ROOT` is the root of the repository, you would input 'path/to/file'.
+        start_line: The first line to return, counting from 1. Defaults to the start of the file.
+        end_line: The last line to return, inclusive. Defaults to the end of the file.
+    """
+
+    matches = re.match("https?://github\\.com/([^/]+)/([^/]+)/?", html_url)
+    owner = ""
+    repo = ""
+    if matches:
+        owner, repo = matches.groups()
+    else:
+        return "Malformed input URL. Expects a GitHub HTML URL of the form https://github.com/owner/repo"
+
+    try:
+        return await fetch_file(owner, repo, file_dir, start_line, end_line)
+    except Exception as e:
+        return f"Repository {owner}/{repo} does not have file {file_dir}, or file is too big: {e}"
+
+
+async def get_files_contents(
+    html_url: str, paths: list[str], max_bytes: int = 200000
+) -> str:
+    """Returns the contents of several files in a GitHub repository at once. Prefer this over calling get_file_contents repeatedly when you need more than one file.
+
+    Args:
+        html_url: The URL of the repository you want to read files from. Must be of the format `https://github.com/owner/repo`.
+        paths: The locations of the files you want to read within the repository, in the same format as the `file_dir` argument of get_file_contents. For example, `["src/main.rs", "Cargo.toml"]`.
+        max_bytes: The maximum total size of file contents to return. Files that do not fit are listed as omitted. Default 200000.
+    """
+
+    matches = re.match("https?://github\\.com/([^/]+)/([^/]+)/?", html_url)
+    owner = ""
+    repo = ""
+    if matches:
+        owner, repo = matches.groups()
+    else:
+        return "Malformed input URL. Expects a GitHub HTML URL of the form https://github.com/owner/repo"
+
+    semaphore = asyncio.Semaphore(read_concurrency())
+
+    async def read(file_dir: str) -> str:
+        async with semaphore:
+            try:
+                return await fetch_file(owner, repo, file_dir)
+            except Exception as e:
+                return f"Repository {owner}/{repo} does not have file {file_dir}, or file is too big: {e}"
+
+    contents = await asyncio.gather(*(read(file_dir) for file_dir in paths))
+    return format_files(paths, contents, max_bytes)
+
+
+async def create_repo(repository_name: str = "test-repo") -> str:
+    """Creates a new GitHub repository with the given repository name. The repository will be private and have a default description. A random value will be appended to the repository name to ensure uniqueness.
+
+    Args:
+        repository_name: The name of the repository to create. Defaults to "test-repo".
+    """
+
+    import random
+
+    random_value = random.randint(0x1000000, 0xFFFFFFF)
+    repository_name = f"{repository_name}-{hex(random_value)[2:]}"
+
+    url = "/user/repos"
+    data = {
+        "name": repository_name,
+        "description": "This is a code repository generated by OctoRAG.",
+        "private": True,
+    }
+
+    try:
+        response = await agithub_request("POST", url, json=data)
+        code = response.status_code
+        if code == 403:
+            return "The provided GitHub Access Token does not have permission to create repositories."
+        response.raise_for_status()
+        json = response.json()
+        return f"Repository {json['name']} created successfully at {json['html_url']}"
+    except Exception as e:
+        return f"An error occurred while creating the repository: {e}"
+
+
+async def create_file(
+    owner: str, repo: str, file_contents: str, filename: str = "code.txt"
+) -> str:
+    """Creates a file in a GitHub repository with the given contents.
+
+    Args:
+        owner: The owner of the repository. For example, if the repository URL is `https://github.com/owner/repo`, the owner would be `owner`.
+        repo: The name of the repository. For example, if the repository URL is `https://github.com/owner/repo`, the repo would be `repo`.
+        file_contents: The (initial) text contents of the file to create.
+        filename: The name of the file to create. Defaults to "code.txt".
+    """
+
+    url = f"/repos/{owner}/{repo}/contents/{filename}"
+
+    data = {
+        "message": f"Create file {filename}",
+        "content": base64.b64encode(file_contents.encode()).decode(),
+        "branch": "main",
+    }
+    try:
+        response = await agithub_request("PUT", url, json=data)
+        response.raise_for_status()
+        return f"File {repo}/{filename} created successfully."
+    except Exception as e:
+        return f"An error occurred while creating the file: {e}"
+
+
+async def append_to_file(
+    owner: str, repo: str, further_content: str, filename: str = "code.txt"
+) -> str:
+    """Appends data to an existing file on GitHub with the provided further content.
+
+    Args:
+        owner: The owner of the repository. For example, if the repository URL is `https://github.com/owner/repo`, the owner would be `owner`.
+        repo: The name of the repository. For example, if the repository URL is `https://github.com/owner/repo`, the repo would be `repo`.
+        further_content: The text to append to the file.
+        filename: The name of the file to append to. Defaults to "code.txt".
+    """
+
+    url = f"/repos/{owner}/{repo}/contents/{filename}"
+
+    try:
+        # Step 1: Get the current file contents and sha
+        get_response = await agithub_request("GET", url)
+        get_response.raise_for_status()
+        file_info = get_response.json()
+        existing_content = base64.b64decode(file_info["content"]).decode()
+        sha = file_info["sha"]
+
+        # Step 2: Append new content
+        updated_content = existing_content + further_content
+        encoded_content = base64.b64encode(updated_content.encode()).decode()
+
+        # Step 3: Send a PUT request with the updated content
+        data = {
+            "message": f"Append to {filename}",
+            "content": encoded_content,
+            "sha": sha,
+            "branch": "main",
+        }
+
+        put_response = await agithub_request("PUT", url, json=data)
+        put_response.raise_for_status()
+
+        return f"File {repo}/{filename} updated successfully."
+    except Exception as e:
+        return f"An error occurred while appending to the file: {e}"
+
+
+async def upload_files(owner: str, repo: str, files: dict[str, str]) -> str:
+    """Uploads several files to a GitHub repository in a single commit. Prefer this over create_file and append_to_file: the whole set of files is written at once, no matter how large.
+
+    Args:
+        owner: The owner of the repository. For example, if the repository URL is `https://github.com/owner/repo`, the owner would be `owner`.
+        repo: The name of the repository. For example, if the repository URL is `https://github.com/owner/repo`, the repo would be `repo`.
+        files: A mapping from each file's path within the repository to its full text contents. For example, `{"README.md": "# My project", "src/main.py": "print('Hello, world!')"}`.
+    """
+    if not files:
+        return "No files to upload."
+
+    repo_url = f"/repos/{owner}/{repo}"
+    paths = list(files)
+
+    try:
+        response = await agithub_request("GET", repo_url)
+        response.raise_for_status()
+        branch = response.json()["default_branch"]
+
+        ref_url = repo_url + f"/git/ref/heads/{branch}"
+        response = await agithub_request("GET", ref_url)
+        if response.status_code in (404, 409):
+            # The Git Data API refuses to work on an empty repository, so the first file is
+            # written through the contents API, which also creates the default branch.
+            first = paths.pop(0)
+            data = {
+                "message": f"Create file {first}",
+                "content": base64.b64encode(files[first].encode()).decode(),
+            }
+            response = await agithub_request(
+                "PUT", repo_url + f"/contents/{first}", json=data
+            )
+            response.raise_for_status()
+            if not paths:
+                return f"Uploaded 1 file to {owner}/{repo}."
+            response = await agithub_request("GET", ref_url)
+        response.raise_for_status()
+        parent_sha = response.json()["object"]["sha"]
+
+        response = await agithub_request("GET", repo_url + f"/git/commits/{parent_sha}")
+        response.raise_for_status()
+        base_tree = response.json()["tree"]["sha"]
+
+        # Inline contents let GitHub create the blobs itself, saving one request per file.
+        tree = [
+            {"path": path, "mode": "100644", "type": "blob", "content": files[path]}
+            for path in paths
+        ]
+        response = await agithub_request(
+            "POST",
+            repo_url + "/git/trees",
+            json={"base_tree": base_tree, "tree": tree},
+        )
+        response.raise_for_status()
+        tree_sha = response.json()["sha"]
+
+        data = {
+            "message": f"Upload {len(paths)} files",
+            "tree": tree_sha,
+            "parents": [parent_sha],
+        }
+        response = await agithub_request("POST", repo_url + "/git/commits", json=data)
+        response.raise_for_status()
+        commit_sha = response.json()["sha"]
+
+        response = await agithub_request(
+            "PATCH", repo_url + f"/git/refs/heads/{branch}", json={"sha": commit_sha}
+        )
+        response.raise_for_status()
+        return (
+            f"Uploaded {len(files)} files to {owner}/{repo} in commit {commit_sha[:7]}."
+        )
+    except Exception as e:
+        return f"An error occurred while uploading the files: {e}"
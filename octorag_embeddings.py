@@ -0,0 +1,260 @@
+"""Local semantic re-ranking of repository search results.
+
+GitHub sorts search results by stars, so the most popular match often is not the most relevant one
+and the Repository Curator has to read many READMEs before finding a good fit. When enabled, the
+search tools fetch a larger pool of candidates and re-rank it by the cosine similarity between the
+query and each repository's name, description and topics.
+
+Embeddings are computed locally on CPU. The default vectorizer hashes words, word bigrams and
+character trigrams into a fixed-size vector, which needs nothing but NumPy. If
+``sentence-transformers`` is installed, a model can be selected instead. Vectors are kept in a
+NumPy-backed index persisted next to the response cache, so each repository is embedded once. The
+index keeps the most recently used vectors only, so its size and the cost of saving it are bounded.
+
+NumPy is an optional dependency: without it, re-ranking is skipped. Environment variables:
+
+- ``OCTORAG_RERANK``: Set to ``1`` to enable re-ranking. Default disabled.
+- ``OCTORAG_RERANK_POOL``: Minimum number of candidates fetched for re-ranking. Default 30.
+- ``OCTORAG_EMBED_MODEL``: ``hash`` (default) or the name of a sentence-transformers model.
+- ``OCTORAG_EMBED_DIR``: Where to persist the index. Default ``embeddings`` in the cache directory.
+- ``OCTORAG_EMBED_MAX_VECTORS``: Repository vectors kept in the index. Default 10000.
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import threading
+import zlib
+
+DEFAULT_MAX_VECTORS = 10000
+
+# Imported by the first vectorizer or index, as importing NumPy is slow and re-ranking is rare.
+np = None
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        import numpy
+
+        np = numpy
+
+
+def rerank_enabled() -> bool:
+    enabled = os.getenv("OCTORAG_RERANK", "0").lower() in ("1", "true", "yes")
+    return enabled and importlib.util.find_spec("numpy") is not None
+
+
+def rerank_pool(count: int) -> int:
+    """Number of candidates to fetch so that re-ranking has something to choose from."""
+    return max(count * 5, int(os.getenv("OCTORAG_RERANK_POOL") or 30))
+
+
+def repo_text(repo: dict) -> str:
+    # Split names like "tiny-raytracer" or "RayTracer" into words.
+    name = re.sub(r"([a-z])([A-Z])", r"\1 \2", repo["name"]).replace("-", " ")
+    name = name.replace("_", " ")
+    topics = " ".join(repo.get("topics") or [])
+    return f"{name} {repo.get('description') or ''} {topics}"
+
+
+class HashingVectorizer:
+    def __init__(self, dim: int = 1024):
+        _import_numpy()
+        self.dim = dim
+        self.name = f"hash{dim}"
+
+    def _features(self, text: str) -> list[str]:
+        words = re.findall(r"[a-z0-9+#]+", text.lower())
+        features = list(words)
+        features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            features += [padded[i : i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def encode(self, texts: list[str]) -> "np.ndarray":
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode())
+                # The sign bit keeps hash collisions from only ever adding up.
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerVectorizer:
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        _import_numpy()
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.name = re.sub(r"[^A-Za-z0-9]+", "_", model_name)
+
+    def encode(self, texts: list[str]) -> "np.ndarray":
+        return np.asarray(
+            self.model.encode(texts, normalize_embeddings=True), dtype=np.float32
+        )
+
+
+class RepoIndex:
+    """Repository vectors keyed by full name, persisted as ``vectors.npy`` plus ``keys.json``.
+
+    At most ``max_vectors`` are kept, the least recently used dropped first. Each vector has a row
+    of ``vectors``, which is memory-mapped from disk, so new vectors are written in place and the
+    matrix is only copied when it grows.
+    """
+
+    def __init__(
+        self, directory: str | None, vectorizer, max_vectors: int = DEFAULT_MAX_VECTORS
+    ):
+        _import_numpy()
+        self.vectorizer = vectorizer
+        self.directory = directory
+        self.max_vectors = max_vectors
+        # Key -> row of ``vectors``, least recently used first.
+        self.keys = {}
+        self.vectors = None
+        self._lock = threading.Lock()
+        if directory is not None:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.directory, "keys.json")) as f:
+                self.keys = json.load(f)
+            self.vectors = np.load(
+                os.path.join(self.directory, "vectors.npy"), mmap_mode="r+"
+            )
+        except (FileNotFoundError, ValueError):
+            self.keys = {}
+            self.vectors = None
+        # A crash between writing the two files may leave keys pointing past the vectors.
+        if self.vectors is None or any(
+            row >= len(self.vectors) for row in self.keys.values()
+        ):
+            self.keys = {}
+            self.vectors = None
+
+    def _tmp_path(self, name: str) -> str:
+        path = os.path.join(self.directory, name)
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _resize(self, capacity: int, dim: int):
+        old = self.vectors
+        if self.directory is None:
+            vectors = np.zeros((capacity, dim), dtype=np.float32)
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._tmp_path("vectors.npy")
+            vectors = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=np.float32, shape=(capacity, dim)
+            )
+        if old is not None:
+            vectors[: len(old)] = old
+        if self.directory is not None:
+            vectors.flush()
+            # The mapping follows the file to its new name.
+            os.replace(tmp_path, os.path.join(self.directory, "vectors.npy"))
+        self.vectors = vectors
+
+    def _save_keys(self):
+        if self.directory is None:
+            return
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+        tmp_path = self._tmp_path("keys.json")
+        with open(tmp_path, "w") as f:
+            json.dump(self.keys, f)
+        os.replace(tmp_path, os.path.join(self.directory, "keys.json"))
+
+    @staticmethod
+    def _key(repo: dict) -> str:
+        # Include the text, so a changed description is embedded again.
+        digest = hashlib.sha1(repo_text(repo).encode()).hexdigest()[:12]
+        return f"{repo['full_name'].lower()}@{digest}"
+
+    def vectors_for(self, repos: list[dict]) -> "np.ndarray":
+        keys = [self._key(repo) for repo in repos]
+        with self._lock:
+            missing = {
+                key: repo for key, repo in zip(keys, repos) if key not in self.keys
+            }
+            if not missing:
+                rows = [self.keys[key] for key in keys]
+                for key in keys:
+                    self.keys[key] = self.keys.pop(key)
+                return np.asarray(self.vectors[rows])
+            new = self.vectorizer.encode([repo_text(repo) for repo in missing.values()])
+            capacity = 0 if self.vectors is None else len(self.vectors)
+            free = sorted(set(range(capacity)) - set(self.keys.values()))
+            # Once the index is full, the least recently used vectors not asked for make room.
+            shortfall = len(missing) - len(free) - max(self.max_vectors - capacity, 0)
+            if shortfall > 0:
+                asked = set(keys)
+                evicted = [key for key in self.keys if key not in asked][:shortfall]
+                for key in evicted:
+                    free.append(self.keys.pop(key))
+                # Their rows are about to be overwritten, so they must be gone from disk first.
+                self._save_keys()
+            if len(free) < len(missing):
+                needed = len(self.keys) + len(missing)
+                self._resize(
+                    max(min(capacity * 2, self.max_vectors), needed), new.shape[1]
+                )
+                free += range(capacity, len(self.vectors))
+            for key, row, vector in zip(missing, free, new):
+                self.vectors[row] = vector
+                self.keys[key] = row
+            for key in keys:
+                self.keys[key] = self.keys.pop(key)
+            self._save_keys()
+            return np.asarray(self.vectors[[self.keys[key] for key in keys]])
+
+    def rank(self, query: str, repos: list[dict], count: int) -> list[dict]:
+        """Returns the ``count`` repositories most similar to ``query``."""
+        if not repos:
+            return []
+        query_vector = self.vectorizer.encode([query])[0]
+        scores = self.vectors_for(repos) @ query_vector
+        order = np.argsort(-scores, kind="stable")[:count]
+        return [repos[i] for i in order]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> RepoIndex:
+    global _index
+    with _index_lock:
+        if _index is not None:
+            return _index
+        model = os.getenv("OCTORAG_EMBED_MODEL") or "hash"
+        vectorizer = (
+            HashingVectorizer()
+            if model == "hash"
+            else SentenceTransformerVectorizer(model)
+        )
+        directory = os.getenv("OCTORAG_EMBED_DIR") or os.path.join(
+            os.getenv("OCTORAG_CACHE_DIR")
+            or os.path.join(os.path.expanduser("~"), ".cache", "octorag"),
+            "embeddings",
+        )
+        _index = RepoIndex(
+            os.path.join(directory, vectorizer.name),
+            vectorizer,
+            max_vectors=int(
+                os.getenv("OCTORAG_EMBED_MAX_VECTORS") or DEFAULT_MAX_VECTORS
+            ),
+        )
+        return _index
+
+
+def rerank(query: str, repos_json: dict, count: int) -> dict:
+    """Re-ranks the items of a search response by similarity to ``query`` and keeps the top ``count``."""
+    items = get_index().rank(query, repos_json["items"], count)
+    return {**repos_json, "items": items}
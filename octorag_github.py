@@ -0,0 +1,442 @@
+"""Shared, connection-pooled GitHub API clients used by every OctoRAG tool.
+
+Opening a fresh ``httpx`` client per tool call costs a TCP + TLS handshake to
+api.github.com every time. Instead, the tools share one long-lived async client
+per event loop, keep-alive and, when the optional ``h2`` package is installed,
+HTTP/2. The MCP server calls them on its own loop; synchronous callers such as
+``octorag_tools`` go through ``run_sync``, which runs them on one background loop
+shared by the whole process.
+
+Pool limits and timeouts are read from the environment when a client is first
+created, and can be overridden with ``configure``:
+
+- ``OCTORAG_HTTP2``: ``1``/``0`` to force HTTP/2 on or off. Defaults to on if ``h2`` is installed.
+- ``OCTORAG_MAX_CONNECTIONS``: Maximum concurrent connections. Default 20.
+- ``OCTORAG_MAX_KEEPALIVE``: Maximum idle keep-alive connections. Default 10.
+- ``OCTORAG_KEEPALIVE_EXPIRY``: Seconds an idle connection is kept open. Default 60.
+- ``OCTORAG_TIMEOUT``: Read/write/pool timeout in seconds. Default 30.
+- ``OCTORAG_CONNECT_TIMEOUT``: Connect timeout in seconds. Default 10.
+- ``OCTORAG_HEAD_SHA_TTL``: Seconds a resolved ``HEAD`` commit SHA is reused. Default 300.
+- ``OCTORAG_TREE_CONCURRENCY``: Subtrees fetched at once when a recursive tree is truncated. Default 8.
+- ``OCTORAG_READ_CONCURRENCY``: Files fetched at once by ``get_files_contents``. Default 8.
+
+Each request is traced as a span (see ``octorag_tracing``), and can be recorded to or replayed
+from a cassette (see ``octorag_cassette``).
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import contextlib
+import contextvars
+import importlib.util
+import os
+import threading
+import time
+import weakref
+
+import httpx
+
+from octorag_cache import get_cache, endpoint_for_path
+from octorag_cassette import get_cassette, wrap_transport
+from octorag_ratelimit import get_scheduler
+from octorag_tracing import span
+
+API_URL = "https://api.github.com"
+API_VERSION = "2022-11-28"
+
+# Returns file contents as-is instead of base64 inside JSON, for files up to 100 MB.
+RAW_HEADERS = {"Accept": "application/vnd.github.raw"}
+
+_overrides = {}
+
+# Event loop -> its pooled client. Pooled connections are bound to the loop that opened them.
+_async_clients = weakref.WeakKeyDictionary()
+
+_loop = None
+_loop_lock = threading.Lock()
+
+# (owner, repo) -> (HEAD commit SHA, monotonic time it was resolved)
+_head_shas = {}
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _http2_enabled() -> bool:
+    if "http2" in _overrides:
+        return _overrides["http2"]
+    value = os.getenv("OCTORAG_HTTP2")
+    h2_available = importlib.util.find_spec("h2") is not None
+    if value is None:
+        return h2_available
+    # Asking for HTTP/2 without h2 installed would make httpx raise on client creation.
+    return value.lower() in ("1", "true", "yes") and h2_available
+
+
+def configure(
+    *,
+    max_connections: int | None = None,
+    max_keepalive_connections: int | None = None,
+    keepalive_expiry: float | None = None,
+    timeout: float | None = None,
+    connect_timeout: float | None = None,
+    http2: bool | None = None,
+    async_transport: httpx.AsyncBaseTransport | None = None,
+):
+    """Overrides the environment-derived client settings.
+
+    Settings apply to clients created afterwards, so call this before the first tool call, or call
+    ``aclose_async_client`` first to rebuild the pool. ``async_transport`` replaces the network
+    layer entirely, which is useful for tests and benchmarks.
+    """
+    for name, value in (
+        ("max_connections", max_connections),
+        ("max_keepalive_connections", max_keepalive_connections),
+        ("keepalive_expiry", keepalive_expiry),
+        ("timeout", timeout),
+        ("connect_timeout", connect_timeout),
+        ("http2", http2),
+        ("async_transport", async_transport),
+    ):
+        if value is not None:
+            _overrides[name] = value
+
+
+def github_headers() -> dict:
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": API_VERSION,
+    }
+    # Read lazily so that a load_dotenv() performed after import is still honored.
+    token = os.getenv("GH_ACCESS_TOKEN")
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+
+def _client_kwargs() -> dict:
+    timeout = _overrides.get("timeout", _env_float("OCTORAG_TIMEOUT", 30.0))
+    connect_timeout = _overrides.get(
+        "connect_timeout", _env_float("OCTORAG_CONNECT_TIMEOUT", 10.0)
+    )
+    limits = httpx.Limits(
+        max_connections=_overrides.get(
+            "max_connections", _env_int("OCTORAG_MAX_CONNECTIONS", 20)
+        ),
+        max_keepalive_connections=_overrides.get(
+            "max_keepalive_connections", _env_int("OCTORAG_MAX_KEEPALIVE", 10)
+        ),
+        keepalive_expiry=_overrides.get(
+            "keepalive_expiry", _env_float("OCTORAG_KEEPALIVE_EXPIRY", 60.0)
+        ),
+    )
+    return {
+        "base_url": API_URL,
+        "headers": github_headers(),
+        "timeout": httpx.Timeout(timeout, connect=connect_timeout),
+        "limits": limits,
+        "http2": _http2_enabled(),
+    }
+
+
+def _transport():
+    transport = _overrides.get("async_transport")
+    if get_cassette("github") is None:
+        return transport
+    # The cassette sits between the client and the network layer the client would have used.
+    if transport is None:
+        kwargs = _client_kwargs()
+        transport = httpx.AsyncHTTPTransport(
+            http2=kwargs["http2"], limits=kwargs["limits"]
+        )
+    return wrap_transport(transport)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Returns the pooled async client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(transport=_transport(), **_client_kwargs())
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client():
+    """Closes the pooled client of the running event loop, if it has one."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="octorag-github", daemon=True
+            ).start()
+            atexit.register(_stop_background_loop)
+        return _loop
+
+
+def _stop_background_loop():
+    global _loop
+    if _loop is None:
+        return
+    with contextlib.suppress(Exception):
+        asyncio.run_coroutine_threadsafe(aclose_async_client(), _loop).result(5)
+    _loop.call_soon_threadsafe(_loop.stop)
+    _loop = None
+
+
+def run_sync(coroutine):
+    """Runs ``coroutine`` on the shared background event loop and returns its result.
+
+    Safe to call from any number of threads at once; their coroutines run concurrently on the one
+    loop and its pooled client. The caller's context, and so its tracing span, carries over.
+    """
+    loop = _background_loop()
+    context = contextvars.copy_context()
+    future = concurrent.futures.Future()
+
+    def start():
+        task = loop.create_task(coroutine, context=context)
+        task.add_done_callback(lambda done: _settle(future, done))
+
+    loop.call_soon_threadsafe(start)
+    return future.result()
+
+
+def _settle(future: concurrent.futures.Future, task: asyncio.Task):
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+def _request_span(method: str, url: str):
+    path = httpx.URL(API_URL).join(url)
+    return span(
+        f"GitHub {method}",
+        **{
+            "http.request.method": method,
+            "url.full": str(path),
+            "octorag.github.endpoint": endpoint_for_path(path.path),
+        },
+    )
+
+
+def _record_response(current, response: httpx.Response, attempt: int, waited: float):
+    """Sets what a finished request span needs to tell where a run spent its time."""
+    size = response.headers.get("Content-Length")
+    if size is None:
+        with contextlib.suppress(httpx.ResponseNotRead):
+            size = len(response.content)
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    current.set(
+        **{
+            "http.response.status_code": response.status_code,
+            "http.response.body.size": int(size) if size is not None else None,
+            "github.ratelimit.remaining": int(remaining) if remaining else None,
+            "octorag.ratelimit.wait_ms": round(waited * 1000, 1),
+            "octorag.retries": attempt,
+        }
+    )
+    if response.status_code >= 400:
+        current.fail(f"HTTP {response.status_code}")
+
+
+async def _asend(method: str, url: str, current, **kwargs) -> httpx.Response:
+    scheduler = get_scheduler()
+    resource = scheduler.resource_for(url)
+    attempt = 0
+    waited = 0.0
+    while True:
+        start = time.perf_counter()
+        await scheduler.aacquire(resource)
+        waited += time.perf_counter() - start
+        response = await get_async_client().request(method, url, **kwargs)
+        if not scheduler.observe(resource, response, attempt):
+            _record_response(current, response, attempt, waited)
+            return response
+        attempt += 1
+
+
+async def agithub_request(method: str, url: str, **kwargs) -> httpx.Response:
+    """Sends a request with the pooled client, queued behind the GitHub rate limits.
+
+    Rate-limited responses are retried once the limit resets; ``RateLimitExceeded`` is raised if
+    that would take longer than the scheduler allows.
+    """
+    with _request_span(method, url) as current:
+        return await _asend(method, url, current, **kwargs)
+
+
+@contextlib.asynccontextmanager
+async def agithub_stream(method: str, url: str, **kwargs):
+    """Like ``agithub_request``, but yields a response whose body has not been read yet."""
+    scheduler = get_scheduler()
+    resource = scheduler.resource_for(url)
+    attempt = 0
+    waited = 0.0
+    with _request_span(method, url) as current:
+        while True:
+            start = time.perf_counter()
+            await scheduler.aacquire(resource)
+            waited += time.perf_counter() - start
+            async with get_async_client().stream(method, url, **kwargs) as response:
+                if response.status_code in (403, 429):
+                    # Error bodies are small, and needed to tell rate limits apart from other errors.
+                    await response.aread()
+                if not scheduler.observe(resource, response, attempt):
+                    _record_response(current, response, attempt, waited)
+                    yield response
+                    return
+            attempt += 1
+
+
+def cached_body(url: str, headers: dict | None = None) -> bytes | None:
+    """Returns the body of a fresh cached response without touching the network, or None."""
+    _, _, entry = _cache_lookup(url, headers)
+    if entry is not None and entry.fresh:
+        return entry.body
+    return None
+
+
+def _cache_lookup(url: str, headers: dict | None):
+    cache = get_cache()
+    if cache is None:
+        return None, None, None
+    accept = (headers or {}).get("Accept", "application/vnd.github+json")
+    full_url = str(httpx.URL(API_URL).join(url))
+    key = cache.make_key("GET", full_url, accept)
+    return cache, key, cache.lookup(key)
+
+
+def _cached_response(entry, url: str) -> httpx.Response:
+    headers = {"X-OctoRAG-Cache": "hit"}
+    if entry.content_type:
+        headers["Content-Type"] = entry.content_type
+    return httpx.Response(
+        200,
+        content=entry.body,
+        headers=headers,
+        request=httpx.Request("GET", httpx.URL(API_URL).join(url)),
+    )
+
+
+def _cache_update(cache, key, entry, url: str, response: httpx.Response):
+    if response.status_code == 304 and entry is not None:
+        cache.revalidated(entry)
+        return _cached_response(entry, url)
+    if response.status_code == 200:
+        cache.store(
+            key,
+            endpoint_for_path(
+                response.request.url.path, response.request.url.query.decode()
+            ),
+            response.content,
+            content_type=response.headers.get("Content-Type"),
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            refreshed=entry is not None,
+        )
+    return response
+
+
+def _cache_outcome(entry, response: httpx.Response) -> str:
+    return (
+        "revalidated" if response.status_code == 304 and entry is not None else "miss"
+    )
+
+
+async def acached_get(url: str, headers: dict | None = None) -> httpx.Response:
+    """GETs ``url`` through the response cache using the pooled client.
+
+    Fresh entries are returned without a request, stale ones are revalidated with ``If-None-Match``
+    / ``If-Modified-Since``. The returned response behaves like a normal ``httpx.Response``.
+    """
+    with _request_span("GET", url) as current:
+        cache, key, entry = _cache_lookup(url, headers)
+        if entry is not None and entry.fresh:
+            current.set(**{"octorag.cache": "hit"})
+            return _cached_response(entry, url)
+        request_headers = dict(headers or {})
+        if cache is not None:
+            request_headers.update(cache.conditional_headers(entry))
+        response = await _asend("GET", url, current, headers=request_headers)
+        if cache is None:
+            return response
+        current.set(**{"octorag.cache": _cache_outcome(entry, response)})
+        return _cache_update(cache, key, entry, url, response)
+
+
+def cache_stats() -> dict:
+    """Returns hit/miss/revalidation counters of the response cache."""
+    cache = get_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+def tree_concurrency() -> int:
+    return int(os.getenv("OCTORAG_TREE_CONCURRENCY") or 8)
+
+
+def read_concurrency() -> int:
+    return int(os.getenv("OCTORAG_READ_CONCURRENCY") or 8)
+
+
+def pinned_ref(owner: str, repo: str) -> str | None:
+    """Returns the recently resolved HEAD commit SHA of a repository, if there is one.
+
+    Reads pinned to this SHA see the same snapshot as the tree that resolved it, and are immutable,
+    so the response cache never has to revalidate them.
+    """
+    entry = _head_shas.get((owner.lower(), repo.lower()))
+    ttl = float(os.getenv("OCTORAG_HEAD_SHA_TTL") or 300)
+    if entry is not None and time.monotonic() - entry[1] < ttl:
+        return entry[0]
+    return None
+
+
+def _head_sha_request(owner: str, repo: str) -> tuple:
+    # The sha media type returns just the commit SHA of the default branch in one small request.
+    return f"/repos/{owner}/{repo}/commits/HEAD", {
+        "Accept": "application/vnd.github.sha"
+    }
+
+
+def _remember_head_sha(owner: str, repo: str, response: httpx.Response) -> str:
+    response.raise_for_status()
+    sha = response.text.strip()
+    _head_shas[(owner.lower(), repo.lower())] = (sha, time.monotonic())
+    return sha
+
+
+async def aresolve_head_sha(owner: str, repo: str) -> str:
+    """Returns the HEAD commit SHA of a repository's default branch, memoized for a few minutes."""
+    sha = pinned_ref(owner, repo)
+    if sha is not None:
+        return sha
+    url, headers = _head_sha_request(owner, repo)
+    return _remember_head_sha(
+        owner, repo, await agithub_request("GET", url, headers=headers)
+    )
+
+
+def rate_limit_stats() -> dict:
+    """Returns request counts, queue wait time and bucket levels of the rate limit scheduler."""
+    return get_scheduler().stats()
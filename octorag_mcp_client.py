@@ -1,24 +1,64 @@
-from dotenv import load_dotenv
+import asyncio
+import os
+import time
+import uuid
 
-from typing import Annotated
+from typing import Annotated, Literal
 
 from typing_extensions import TypedDict
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from langchain_mcp_adapters.tools import load_mcp_tools
-
-
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 
-from langgraph.prebuilt import ToolNode, tools_condition
-
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.prebuilt import tools_condition
 
 from langchain_core.messages.ai import AIMessage
 
 from langchain_core.messages.human import HumanMessage
 
+from langchain_core.messages.tool import ToolMessage
+
+from langchain_core.tools import StructuredTool
+
+from pydantic import BaseModel, Field
+
+from octorag_cassette import ainvoke_model
+from octorag_memory import (
+    HANDOFF,
+    CheckpointRetention,
+    apply_compaction,
+    close_checkpointer,
+    compact_messages,
+    open_checkpointer,
+)
+from octorag_models import CLASSIFIER_PROMPT, fast_path_enabled, model_for, needs_code
+from octorag_prompts import cache_prompt, record_usage, supports_prompt_caching
+from octorag_stream import STREAM_MODE, text_of, to_events
+from octorag_toolnode import ConcurrentToolNode
+from octorag_tracing import chat_span, record_model_usage, span
+
+
+def handoff_tool(targets: list[str]) -> StructuredTool:
+    """Returns the tool an agent calls to pass its work to one of ``targets``."""
+
+    class Handoff(BaseModel):
+        to_agent: Literal[tuple(targets)] = Field(
+            description="The agent to hand your work to."
+        )
+        payload: str = Field(
+            description="Everything the agent needs to do its part, phrased as a request to it."
+        )
+
+    def handoff(to_agent: str, payload: str) -> str:
+        return f"Handed off to the {to_agent}."
+
+    return StructuredTool.from_function(
+        handoff,
+        name=HANDOFF,
+        description="Hands your work over to another agent. The other agent takes over after this call.",
+        args_schema=Handoff,
+    )
+
 
 class OctoRAG_MCP:
     class State(TypedDict):
@@ -27,20 +67,41 @@ class OctoRAG_MCP:
         # (in this case, it appends messages to the list, rather than overwriting them)
         messages: Annotated[list, add_messages]
         current_agent: str | None
+        # Set by the classifier: False if the query only asks for recommendations.
+        needs_code: bool | None
 
     def __init__(
         self,
         path_to_env_file: str = None,
         mcp_url: str = "http://localhost:8000/mcp",
         debug: bool = False,
+        max_concurrency: int | None = None,
+        query_timeout: float | None = None,
+        checkpointer=None,
+        model: str | None = None,
+        retriever_model: str | None = None,
+        curator_model: str | None = None,
+        generator_model: str | None = None,
+        poster_model: str | None = None,
+        classifier_model: str | None = None,
+        fast_path: bool | None = None,
     ):
-        self.memory = MemorySaver()
+        from dotenv import load_dotenv
 
-        self.graph_builder = StateGraph(OctoRAG_MCP.State)
+        # Models can be configured in the .env file.
+        load_dotenv(path_to_env_file)
+
+        # Any LangGraph checkpointer. By default start() opens the one configured by
+        # OCTORAG_CHECKPOINTER, SQLite on local disk.
+        self.memory = checkpointer
+        self._owns_memory = checkpointer is None
+        self._retention = None
 
         from langchain.chat_models import init_chat_model
 
-        self.agent1_raw = init_chat_model("anthropic:claude-3-7-sonnet-latest")
+        self.agent1_raw = init_chat_model(
+            model_for("retriever", retriever_model or model)
+        )
         self.agent1_name = "Repository Retriever"
         self.agent1_system_prompt = (
             "You are the Repository Retriever agent."
@@ -49,13 +110,13 @@ class OctoRAG_MCP:
             " and their details. Make sure to compare the user's use case against the repository's licensing to ensure the user can use the code in the repository."
             "You MUST use the query_for_github_repos tool to retrieve information about repositories from GitHub based on natural language keywords. Do NOT solely rely on your own knowledge, you NEED to provide up-to-date recommendations."
             "If the query you have is unrelated to GitHub, you may finish as soon as you respond. Otherwise, send the repositories you have found as well as your query to the Repository Curator."
-            "You MUST send your work to the Repository Curator once you are done. Only end the conversation if the query is unrelated to GitHub or if you have no repositories to send. You can send your work by mentioning the Repository Curator in your response."
+            "You MUST send your work to the Repository Curator once you are done. Only end the conversation if the query is unrelated to GitHub or if you have no repositories to send. You can send your work by calling the handoff tool with to_agent='Repository Curator'."
             "You ONLY retrieve repositories, you do NOT do further work on them yourself. Send your work to the Repository Curator for further processing."
-            "When passing the repositories to the Repository Curator, you MUST list all the GitHub repositories you found, and repeat the query. You MUST phrase it as an action the Code Generator should take, such as 'Please curate these repositories [repositories] based on the query: [query]'."
+            "When passing the repositories to the Repository Curator, the payload of the handoff tool MUST list all the GitHub repositories you found, and repeat the query. You MUST phrase it as an action the Code Generator should take, such as 'Please curate these repositories [repositories] based on the query: [query]'."
             "If you receive a request for more repositories from the Repository Curator, you MUST search for more repositories based on what it asks and send them back to the Repository Curator."
-            "Indicate that you want to end the conversation by saying <<END>>. THIS WILL END THE CONVERSATION FULLY AND NOT HAND YOUR WORK TO THE REPOSITORY CURATOR."
+            "Replying without calling any tool ends the conversation. THIS WILL END THE CONVERSATION FULLY AND NOT HAND YOUR WORK TO THE REPOSITORY CURATOR."
         )
-        self.agent2_raw = init_chat_model("anthropic:claude-3-7-sonnet-latest")
+        self.agent2_raw = init_chat_model(model_for("curator", curator_model or model))
         self.agent2_name = "Repository Curator"
         self.agent2_system_prompt = (
             "You are the Repository Curator agent."
@@ -63,48 +124,70 @@ class OctoRAG_MCP:
             "You may communicate with the Repository Retriever to get more repositories if needed, if you deem the ones you have to be insufficient. "
             "Once you are satisfied with the repositories you have, you may either return your message to the user and finish, or ask the Code Generator to generate code from the repositories, if"
             " the user has requested it. "
-            "Use the get_readme tool to get the README file of a repository."
+            "Use the get_readme tool to get the README file of a repository. Pass what you need to know about the repository as the focus argument, so you only receive the relevant sections."
             "You MUST use the tools provided to you to learn more about the repositories and curate them. Do NOT solely rely on your own knowledge, you NEED to provide up-to-date recommendations."
             "Once you have finished your preliminary work, you MUST either ask the Repository Retriever to get more repositories to get better results, or ask the Code Generator to generate code based on the repositories you have."
             "DO NOT GENERATE ANY CODE YOURSELF, YOU MUST PASS THE REPOSITORIES TO THE CODE GENERATOR FOR FURTHER PROCESSING."
-            "You can ask the Repository Retriever to get more repositories by mentioning the Repository Retriever in your response, and you can send your work to the Code Generator by mentioning the Code Generator in your response."
+            "You can ask the Repository Retriever to get more repositories by calling the handoff tool with to_agent='Repository Retriever', and you can send your work to the Code Generator by calling the handoff tool with to_agent='Code Generator'."
             "ONLY end the conversation if the prompt is unrelated to GitHub, or if you have no repositories to curate."
             "You ONLY curate repositories, you do NOT generate code yourself. Send your work to the Code Generator for further processing."
-            "When asking the Repository Retriever to get more repositories, you MUST phrase it as an action the Repository Retriever should take, such as 'Please retrieve more repositories based on the query: [query]'. Also include extra information you need if necessary."
-            "When finally passing the repositories to the Code Generator, you MUST list all the GitHub repositories you think it will need for code generation, and repeat the query. You MUST phrase it as an action the Code Generator should take, such as 'Please generate code based on these repositories [repositories] and the query: [query]'."
-            "Indicate that you want to end the conversation by saying <<END>>. THIS WILL END THE CONVERSATION FULLY AND NOT HAND YOUR WORK OVER TO ANOTHER AGENT."
+            "When asking the Repository Retriever to get more repositories, you MUST phrase the payload as an action the Repository Retriever should take, such as 'Please retrieve more repositories based on the query: [query]'. Also include extra information you need if necessary."
+            "When finally passing the repositories to the Code Generator, the payload MUST list all the GitHub repositories you think it will need for code generation, and repeat the query. You MUST phrase it as an action the Code Generator should take, such as 'Please generate code based on these repositories [repositories] and the query: [query]'."
+            "Replying without calling any tool ends the conversation. THIS WILL END THE CONVERSATION FULLY AND NOT HAND YOUR WORK OVER TO ANOTHER AGENT."
+        )
+        # Used instead when the classifier found that the user only wants recommendations.
+        self.agent2_recommend_system_prompt = (
+            "You are the Repository Curator agent."
+            "You are a helpful assistant that can take a list of GitHub repositories, as well as a query, and curate which repositories are most relevant to the query. "
+            "The user only asked for recommendations, so no code will be generated for this query. "
+            "You may communicate with the Repository Retriever to get more repositories if needed, if you deem the ones you have to be insufficient. "
+            "Use the get_readme tool to get the README file of a repository. Pass what you need to know about the repository as the focus argument, so you only receive the relevant sections."
+            "You MUST use the tools provided to you to learn more about the repositories and curate them. Do NOT solely rely on your own knowledge, you NEED to provide up-to-date recommendations."
+            "You can ask the Repository Retriever to get more repositories by calling the handoff tool with to_agent='Repository Retriever'."
+            "When asking the Repository Retriever to get more repositories, you MUST phrase the payload as an action the Repository Retriever should take, such as 'Please retrieve more repositories based on the query: [query]'. Also include extra information you need if necessary."
+            "Once you are satisfied with the repositories you have, reply to the user with your recommendations, explaining why each fits the query and how its license affects the user's use case."
+            "Replying without calling any tool ends the conversation, so only do so once your recommendations are final."
+        )
+        self.agent3_raw = init_chat_model(
+            model_for("generator", generator_model or model)
         )
-        self.agent3_raw = init_chat_model("anthropic:claude-3-7-sonnet-latest")
         self.agent3_name = "Code Generator"
         self.agent3_system_prompt = (
             "You are the Code Generator agent."
             "You are a helpful assistant that can take a list of GitHub repositories, as well as a query, and generate code based on the repositories. "
             "You have tools that can generate a file tree of an existing repository, as well as read files from a repository. Use these tools to write proper code based on the repositories and the query. "
-            "Use the get_repo_tree tool to get the file tree of a repository, and the get_file_contents tool to read files from a repository."
-            "Use the get_readme tool to get the README file of a repository."
+            "Use the get_repo_tree tool to get the file tree of a repository, and the get_file_contents tool to read files from a repository. When you need several files from the same repository, read them all in one call with the get_files_contents tool."
+            "Use the get_readme tool to get the README file of a repository. Pass what you need to know, such as installation or API usage, as the focus argument, and only set full=True if the focused sections are not enough."
             "PRIMARILY use get_readme to understand how to use the repository. As in, avoid reading other files in the repositories if possible. Only use the other tools if you REALLY need to read files other than the README file."  # don't we all love rate limits?
             "You MUST use the tools provided to you to learn more about the repositories and generate code. Do NOT solely rely on your own knowledge, you NEED to read through the repositories to understand how to use them."
             "Once you are satisfied with the code you have generated, you MUST send your work to the Code Poster. Only end the conversation if the prompt is unrelated to GitHub."
-            "You MUST indicate that you want to send the code to the Code Poster by mentioning the Code Poster in your response."
+            "You MUST send the code to the Code Poster by calling the handoff tool with to_agent='Code Poster'."
             "You ONLY generate code, you do NOT publish them yourself. Send your work to the Code Poster for further processing."
-            "When passing the code to the Code Poster, you MUST write out each file's name and its contents, and phrase it as an action the Code Poster should take, such as 'Please upload these files to a new GitHub repository: [file1_name]: [file1_contents], [file2_name]: [file2_contents], ...'."
-            "Indicate that you want to end the conversation by saying <<END>>. THIS WILL END THE CONVERSATION FULLY AND NOT HAND YOUR WORK OVER TO THE CODE POSTER."
+            "When passing the code to the Code Poster, the payload MUST write out each file's name and its contents, and be phrased as an action the Code Poster should take, such as 'Please upload these files to a new GitHub repository: [file1_name]: [file1_contents], [file2_name]: [file2_contents], ...'."
+            "Replying without calling any tool ends the conversation. THIS WILL END THE CONVERSATION FULLY AND NOT HAND YOUR WORK OVER TO THE CODE POSTER."
         )
-        self.agent4_raw = init_chat_model("anthropic:claude-3-7-sonnet-latest")
+        self.agent4_raw = init_chat_model(model_for("poster", poster_model or model))
         self.agent4_name = "Code Poster"
         self.agent4_system_prompt = (
             "You are the Code Poster agent."
             "You are a helpful assistant that can take in code snippets and upload them to a new GitHub repository."
-            "Use the create_repo tool to create a new repository, and the create_file tool to upload files to the repository. Only upload 150 characters at a time to a file to avoid rate limits."
-            "You may use the `append_to_file` tool to append to files if the file is too large to upload in one go (longer than 150 characters)."
+            "Use the create_repo tool to create a new repository, and the upload_files tool to upload all of the files to the repository in a single call."
             "Use these tools to create a new repository and upload the code snippets you have been given."
-            "The contents of each file, as well as their names, are in the previous messages. For each file, pass the first 150 characters of the file contents as well as the name of the file to the create_file tool."
-            "Pass subsequent batches of 150 characters of the file contents to the append_to_file tool, until the entire file is uploaded."
-            "For example, let's say the repository is at `github.com/my-account/my-repo`, and you want to create a file named `code.py` which contains `print('Hello, world!')`. You would call the create_file tool"
-            " as follows: create_file(owner='my_account', repo='my-repo', file_contents='print('Hello, world!')', filename='code.py'). "
-            "You MUST use the create_repo tool to create a new repository, and you MUST upload all the code files you have been given to the repository using the create_file and append_to_file tools."
-            "Indicate that you want to end the conversation by saying <<END>>. THIS WILL END THE CONVERSATION FULLY AND NOT ALLOW YOU TO TAKE ANY MORE ACTIONS TO POST THE CODE."
+            "The contents of each file, as well as their names, are in the previous messages. Pass every file to the upload_files tool at once, as a mapping from each file's name to its full contents. Do NOT split files into smaller pieces."
+            "For example, let's say the repository is at `github.com/my-account/my-repo`, and you want to create a file named `code.py` which contains `print('Hello, world!')` and a file named `README.md` which contains `# My repo`. You would call the upload_files tool"
+            " as follows: upload_files(owner='my-account', repo='my-repo', files={'code.py': 'print('Hello, world!')', 'README.md': '# My repo'}). "
+            "Only if upload_files fails, fall back to uploading files one at a time with the create_file tool, using the append_to_file tool for the rest of a file if it is too large to upload in one go."
+            "You MUST use the create_repo tool to create a new repository, and you MUST upload all the code files you have been given to the repository."
+            "Replying without calling any tool ends the conversation. THIS WILL END THE CONVERSATION FULLY AND NOT ALLOW YOU TO TAKE ANY MORE ACTIONS TO POST THE CODE."
         )
+        # Names of the MCP tools each agent may use.
+        self.agent_tool_names = [
+            None,
+            ["query_for_github_repos"],
+            ["get_readme"],
+            ["get_readme", "get_repo_tree", "get_file_contents", "get_files_contents"],
+            ["create_repo", "upload_files", "create_file", "append_to_file"],
+        ]
         self.agent_names = [
             None,
             self.agent1_name,
@@ -112,6 +195,14 @@ class OctoRAG_MCP:
             self.agent3_name,
             self.agent4_name,
         ]
+        # Agents each agent may hand its work to with the handoff tool.
+        self.agent_handoffs = [
+            None,
+            [self.agent2_name],
+            [self.agent1_name, self.agent3_name],
+            [self.agent4_name],
+            [],
+        ]
         self.system_prompts = [
             None,
             self.agent1_system_prompt,
@@ -120,7 +211,15 @@ class OctoRAG_MCP:
             self.agent4_system_prompt,
         ]
 
-        load_dotenv(path_to_env_file)
+        self.fast_path = fast_path_enabled() if fast_path is None else fast_path
+        if self.fast_path:
+            self.classifier = init_chat_model(
+                model_for("classifier", classifier_model or model)
+            )
+
+        # The MCP adapters are imported here rather than with this module, as only this
+        # client needs them.
+        from langchain_mcp_adapters.client import MultiServerMCPClient
 
         self.client = MultiServerMCPClient(
             {
@@ -133,15 +232,152 @@ class OctoRAG_MCP:
 
         self.debug = debug
 
-    async def create_graph(self, session):
-        tools = await load_mcp_tools(session)
-        print(len(tools), "tools loaded")
+        # Queries beyond this many wait their turn, in order of arrival.
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("OCTORAG_MAX_CONCURRENT_QUERIES") or 4
+        )
+        self.query_timeout = query_timeout or (
+            float(os.getenv("OCTORAG_QUERY_TIMEOUT") or 0) or None
+        )
+
+        # Compiled once by start() and reused by every query.
+        self.graph = None
+
+        # Tokens used by each agent, by agent name, including how many input tokens were read
+        # from or written to the provider's prompt cache.
+        self.token_usage = {}
+
+        self._loop = None
+        self._lock = None
+        self._slots = None
+        self._session_tools = None
+        self._session_task = None
+        self._session_loop = None
+        self._session_closing = None
+
+    def _bind_loop(self):
+        # asyncio primitives belong to one event loop, so each loop gets its own.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    def _loop_lock(self) -> asyncio.Lock:
+        self._bind_loop()
+        return self._lock
+
+    async def _open_session(self):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        closing = asyncio.Event()
+
+        # The MCP session is entered and exited by this task alone, as its anyio cancel scopes
+        # require, and stays open between queries until aclose() is called.
+        from langchain_mcp_adapters.tools import load_mcp_tools
+
+        async def hold_session():
+            try:
+                async with self.client.session("octorag-mcp") as session:
+                    tools = await load_mcp_tools(session)
+                    ready.set_result(tools)
+                    await closing.wait()
+            except Exception as e:
+                if not ready.done():
+                    ready.set_exception(e)
+
+        task = asyncio.create_task(hold_session())
+        tools = await ready
+        self._session_task, self._session_loop = task, loop
+        self._session_closing = closing
+        self._session_tools = {tool.name: tool for tool in tools}
+
+    async def _ensure_session(self) -> dict:
+        async with self._loop_lock():
+            # A session can't outlive its event loop, and reconnects if the server dropped it.
+            if (
+                self._session_loop is not asyncio.get_running_loop()
+                or self._session_task is None
+                or self._session_task.done()
+            ):
+                await self._open_session()
+            return self._session_tools
+
+    def _proxy_tool(self, tool) -> StructuredTool:
+        # The compiled graph keeps these proxies, which look up the live session on every call,
+        # so the graph survives reconnects and never has to be rebuilt.
+        async def call_tool(**arguments):
+            tools = await self._ensure_session()
+            return await tools[tool.name].coroutine(**arguments)
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=call_tool,
+            response_format=tool.response_format,
+            metadata=tool.metadata,
+        )
+
+    async def start(self):
+        """Connects to the MCP server and compiles the graph. Only the first call does any work,
+        and ``query`` calls it automatically."""
+        tools = await self._ensure_session()
+        async with self._loop_lock():
+            if self.memory is None:
+                self.memory = await open_checkpointer()
+            if self._retention is None:
+                self._retention = CheckpointRetention(self.memory)
+                await self._retention.load()
+            if self.graph is None:
+                if self.debug:
+                    print(len(tools), "tools loaded")
+                self.graph = self.create_graph(
+                    [self._proxy_tool(tool) for tool in tools.values()]
+                )
+
+    async def aclose(self):
+        """Closes the MCP session, and the checkpoint database if start() opened it. A later query
+        reopens them."""
+        if (
+            self._session_task is not None
+            and self._session_loop is asyncio.get_running_loop()
+        ):
+            self._session_closing.set()
+            await self._session_task
+        self._session_task = None
+        self._session_loop = None
+        if self._owns_memory and self.memory is not None:
+            await close_checkpointer(self.memory)
+            # The graph holds on to the closed checkpointer.
+            self.memory = None
+            self._retention = None
+            self.graph = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def create_graph(self, tools):
+        self.graph_builder = StateGraph(OctoRAG_MCP.State)
+
+        tools_by_name = {tool.name: tool for tool in tools}
+        agent_tools = [None] + [
+            [tools_by_name[name] for name in names]
+            + ([handoff_tool(targets)] if targets else [])
+            for names, targets in zip(
+                self.agent_tool_names[1:], self.agent_handoffs[1:]
+            )
+        ]
 
         # Give all agents only the tools they are allowed to use.
-        self.agent1 = self.agent1_raw.bind_tools([tools[1]])
-        self.agent2 = self.agent2_raw.bind_tools([tools[0]])
-        self.agent3 = self.agent3_raw.bind_tools([tools[0], tools[2], tools[3]])
-        self.agent4 = self.agent4_raw.bind_tools(tools[4:])
+        self.agent1 = self.agent1_raw.bind_tools(agent_tools[1])
+        self.agent2 = self.agent2_raw.bind_tools(agent_tools[2])
+        self.agent3 = self.agent3_raw.bind_tools(agent_tools[3])
+        self.agent4 = self.agent4_raw.bind_tools(agent_tools[4])
 
         self.agent1.name = self.agent1_name
         self.agent2.name = self.agent2_name
@@ -150,182 +386,147 @@ class OctoRAG_MCP:
 
         self.agents = [None, self.agent1, self.agent2, self.agent3, self.agent4]
 
-        def agent1_state(state: OctoRAG_MCP.State):
-            system_message = {
-                "role": "system",
-                "content": self.system_prompts[1],
-            }
-            # Only prepend system message for the model call, not for storage
-            prompt_messages = [system_message] + state["messages"]
-            ai_message = self.agents[1].invoke(prompt_messages)
-            return {
-                "messages": state["messages"] + [ai_message],
-                "current_agent": "agent1",
-            }
-
-        def agent2_state(state: OctoRAG_MCP.State):
-            system_message = {
-                "role": "system",
-                "content": self.system_prompts[2],
-            }
-            prompt_messages = [system_message] + state["messages"]
-            ai_message = self.agents[2].invoke(prompt_messages)
-            return {
-                "messages": state["messages"] + [ai_message],
-                "current_agent": "agent2",
-            }
-
-        def agent3_state(state: OctoRAG_MCP.State):
-            system_message = {
-                "role": "system",
-                "content": self.system_prompts[3],
-            }
-            prompt_messages = [system_message] + state["messages"]
-            ai_message = self.agents[3].invoke(prompt_messages)
-            return {
-                "messages": state["messages"] + [ai_message],
-                "current_agent": "agent3",
-            }
+        # Agents that work differently on recommendation-only queries: the Curator answers the
+        # user itself instead of handing its work to the Code Generator.
+        recommend_agents = {
+            2: (
+                self.agent2_raw.bind_tools(
+                    [tools_by_name[name] for name in self.agent_tool_names[2]]
+                    + [handoff_tool([self.agent1_name])]
+                ),
+                self.agent2_recommend_system_prompt,
+            )
+        }
+
+        prompt_caching = [None] + [
+            supports_prompt_caching(raw)
+            for raw in (
+                self.agent1_raw,
+                self.agent2_raw,
+                self.agent3_raw,
+                self.agent4_raw,
+            )
+        ]
 
-        def agent4_state(state: OctoRAG_MCP.State):
-            system_message = {
-                "role": "system",
-                "content": self.system_prompts[4],
-            }
-            prompt_messages = [system_message] + state["messages"]
-            ai_message = self.agents[4].invoke(prompt_messages)
-            return {
-                "messages": state["messages"] + [ai_message],
-                "current_agent": "agent4",
-            }
+        # The agent each node streams events for.
+        self.node_agents = {}
+        for number in range(1, 5):
+            self.node_agents[self.agent_names[number]] = self.agent_names[number]
+            self.node_agents[f"agent{number}_tools"] = self.agent_names[number]
+
+        def agent_node(number: int):
+            async def agent_state(state: OctoRAG_MCP.State):
+                # Truncated old tool outputs replace the originals in the state as well.
+                compacted = compact_messages(state["messages"])
+                messages = apply_compaction(state["messages"], compacted)
+                agent, system_prompt = self.agents[number], self.system_prompts[number]
+                if state.get("needs_code") is False and number in recommend_agents:
+                    agent, system_prompt = recommend_agents[number]
+                # Only prepend system message for the model call, not for storage
+                if prompt_caching[number]:
+                    prompt_messages = cache_prompt(system_prompt, messages)
+                else:
+                    system_message = {"role": "system", "content": system_prompt}
+                    prompt_messages = [system_message] + messages
+                with span(
+                    f"invoke_agent {self.agent_names[number]}",
+                    **{"gen_ai.agent.name": self.agent_names[number]},
+                ):
+                    with chat_span(agent) as call:
+                        ai_message = await ainvoke_model(
+                            self.agent_names[number], agent, prompt_messages
+                        )
+                        record_model_usage(call, ai_message)
+                record_usage(self.token_usage, self.agent_names[number], ai_message)
+                return {
+                    "messages": compacted + [ai_message],
+                    "current_agent": f"agent{number}",
+                }
 
-        self.graph_builder.add_node(self.agent_names[1], agent1_state)
-        self.graph_builder.add_node(self.agent_names[2], agent2_state)
-        self.graph_builder.add_node(self.agent_names[3], agent3_state)
-        self.graph_builder.add_node(self.agent_names[4], agent4_state)
+            return agent_state
+
+        for number in range(1, 5):
+            self.graph_builder.add_node(self.agent_names[number], agent_node(number))
+
+        if self.fast_path:
+
+            async def classifier_state(state: OctoRAG_MCP.State):
+                with chat_span(
+                    self.classifier, **{"gen_ai.agent.name": "Classifier"}
+                ) as call:
+                    answer = await ainvoke_model(
+                        "Classifier",
+                        self.classifier,
+                        [
+                            {"role": "system", "content": CLASSIFIER_PROMPT},
+                            {
+                                "role": "user",
+                                "content": text_of(state["messages"][-1].content),
+                            },
+                        ],
+                    )
+                    record_model_usage(call, answer)
+                record_usage(self.token_usage, "Classifier", answer)
+                return {"needs_code": needs_code(text_of(answer.content))}
 
-        self.graph_builder.add_edge(START, self.agent_names[1])
+            self.graph_builder.add_node("classifier", classifier_state)
+            self.graph_builder.add_edge(START, "classifier")
+            self.graph_builder.add_edge("classifier", self.agent_names[1])
+        else:
+            self.graph_builder.add_edge(START, self.agent_names[1])
 
         def orchestrator_state(state: OctoRAG_MCP.State):
-            return {
-                "messages": state["messages"],
-                "current_agent": state["current_agent"],
+            # Carry out a handoff once the tool call making it has been answered.
+            messages = state["messages"]
+            if not isinstance(messages[-1], ToolMessage):
+                return {}
+            tool_calls = next(
+                m.tool_calls for m in reversed(messages) if isinstance(m, AIMessage)
+            )
+            results = {
+                m.tool_call_id: m
+                for m in messages[-len(tool_calls) :]
+                if isinstance(m, ToolMessage)
             }
+            for call in tool_calls:
+                result = results.get(call["id"])
+                if (
+                    call["name"] == HANDOFF
+                    and result is not None
+                    and result.status == "success"
+                ):
+                    target = self.agent_names.index(call["args"]["to_agent"])
+                    return {
+                        "messages": [
+                            HumanMessage(content=call["args"]["payload"], name=HANDOFF)
+                        ],
+                        "current_agent": f"agent{target}",
+                    }
+            return {}
 
         self.graph_builder.add_node("orchestrator", orchestrator_state)
 
-        def mentions_agent(content, agent_name):
-            agent_name = agent_name.lower()
-            if isinstance(content, str):
-                return (
-                    agent_name in content.lower() or f"@{agent_name}" in content.lower()
-                )
-            elif isinstance(content, list):
-                return any(
-                    agent_name
-                    in (
-                        item.get("text", "").lower()
-                        if isinstance(item, dict)
-                        else str(item).lower()
-                    )
-                    or f"@{agent_name}"
-                    in (
-                        item.get("text", "").lower()
-                        if isinstance(item, dict)
-                        else str(item).lower()
-                    )
-                    for item in content
-                )
-            return False
-
-        def mentions_end(content):
-            if isinstance(content, str):
-                return "<<end>>" in content.lower()
-            elif isinstance(content, list):
-                return any(
-                    "<<end>>"
-                    in (
-                        item.get("text", "").lower()
-                        if isinstance(item, dict)
-                        else str(item).lower()
-                    )
-                    for item in content
-                )
-            return False
-
         def orchestrator_routing(state: OctoRAG_MCP.State):
-            if isinstance(state, list):
-                ai_message = state[-1]
-            elif messages := state.get("messages"):
-                ai_message = messages[-1]
-            else:
-                raise ValueError(
-                    f"No messages found in input state to tool_edge: {state}"
-                )
+            last_message = state["messages"][-1]
             if self.debug:
                 print(
-                    f"Current agent: {state['current_agent']}, tool_calls: {getattr(ai_message, 'tool_calls', None)} content: {ai_message.content if hasattr(ai_message, 'content') else None}"
+                    f"Current agent: {state['current_agent']}, tool_calls: {getattr(last_message, 'tool_calls', None)} content: {last_message.content}"
                 )
-            if hasattr(ai_message, "tool_calls") and len(ai_message.tool_calls) > 0:
+            # Tools were called: run them.
+            if isinstance(last_message, AIMessage) and last_message.tool_calls:
                 return state["current_agent"] + "_tools"
-            content = ai_message.content
-            # Agent 1 may use its tools to retrieve repositories, refine the response by asking agent 2, or finish the conversation
-            if state["current_agent"] == "agent1":
-                if mentions_agent(content, self.agent_names[2]):
-                    state["current_agent"] = "agent2"
-                    state["messages"].append(HumanMessage(content=content))
-                    return "agent2"
-                if mentions_end(content):
-                    return END
-                return "agent1"
-            # Agent 2 may use its tools to curate repositories, get more repositories from agent 1, ask agent 3 to generate code, or finish the conversation
-            elif state["current_agent"] == "agent2":
-                if mentions_agent(content, self.agent_names[1]):
-                    state["current_agent"] = "agent1"
-                    state["messages"].append(HumanMessage(content=content))
-                    return "agent1"
-                if mentions_agent(content, self.agent_names[3]):
-                    state["current_agent"] = "agent3"
-                    state["messages"].append(HumanMessage(content=content))
-                    return "agent3"
-                if mentions_end(content):
-                    return END
-                return "agent2"
-            # Agent 3 may use its tools to generate code, ask agent 4 to post the code, or finish the conversation
-            elif state["current_agent"] == "agent3":
-                if mentions_agent(content, self.agent_names[4]):
-                    state["current_agent"] = "agent4"
-                    state["messages"].append(HumanMessage(content=content))
-                    return "agent4"
-                if mentions_end(content):
-                    return END
-                return "agent3"
-            # Agent 4 may use its tools to create a repository and upload files, or finish the conversation
-            elif state["current_agent"] == "agent4":
-                if mentions_end(content):
-                    return END
-                return "agent4"
-            return END
-
-        agent1_tools = ToolNode(tools=[tools[1]])
-        self.graph_builder.add_node("agent1_tools", agent1_tools)
-        self.graph_builder.add_edge(self.agent_names[1], "orchestrator")
-        self.graph_builder.add_edge("agent1_tools", self.agent_names[1])
-
-        agent2_tools = ToolNode(tools=[tools[0]])
-        self.graph_builder.add_node("agent2_tools", agent2_tools)
-        self.graph_builder.add_edge(self.agent_names[2], "orchestrator")
-        self.graph_builder.add_edge("agent2_tools", self.agent_names[2])
-
-        agent3_tools = ToolNode(tools=[tools[0], tools[2], tools[3]])
-        self.graph_builder.add_node("agent3_tools", agent3_tools)
-        self.graph_builder.add_edge(self.agent_names[3], "orchestrator")
-        self.graph_builder.add_edge("agent3_tools", self.agent_names[3])
-
-        agent4_tools = ToolNode(tools=tools[4:])
-        self.graph_builder.add_node("agent4_tools", agent4_tools)
-        self.graph_builder.add_edge(self.agent_names[4], "orchestrator")
-        self.graph_builder.add_edge("agent4_tools", self.agent_names[4])
+            # An answer without tool calls is final.
+            if isinstance(last_message, AIMessage):
+                return END
+            # Tool results go back to the agent that asked for them, and a handoff request to
+            # the agent it was made to.
+            return state["current_agent"]
+
+        for number in range(1, 5):
+            tool_node = ConcurrentToolNode(tools=agent_tools[number])
+            self.graph_builder.add_node(f"agent{number}_tools", tool_node)
+            self.graph_builder.add_edge(self.agent_names[number], "orchestrator")
+            self.graph_builder.add_edge(f"agent{number}_tools", "orchestrator")
 
         self.graph_builder.add_conditional_edges(
             "orchestrator",
@@ -347,24 +548,123 @@ class OctoRAG_MCP:
 
         return graph
 
-    async def query(self, query: str):
-        async with self.client.session("octorag-mcp") as session:
-            graph = await self.create_graph(session)
+    async def _run(
+        self,
+        query: str,
+        thread_id: str,
+        timeout: float | None,
+        stream_mode,
+        handle,
+        items: asyncio.Queue,
+    ):
+        async def stream():
+            await self.start()
 
-            config = {"configurable": {"thread_id": "1"}, "recursion_limit": 10000}
+            config = {
+                "configurable": {"thread_id": thread_id},
+                "recursion_limit": 10000,
+            }
 
-            async for message in graph.astream(
+            async for chunk in self.graph.astream(
                 {"messages": [{"role": "user", "content": query}]},
                 config,
-                stream_mode="values",
+                stream_mode=stream_mode,
             ):
-                if isinstance(message["messages"][-1], AIMessage):
-                    content = message["messages"][-1].content
-                    if isinstance(content, str):
-                        yield content
-                    elif (
-                        isinstance(content, list)
-                        and len(content) > 0
-                        and "text" in content[-1]
-                    ):
-                        yield content[-1]["text"]
+                for item in handle(chunk):
+                    items.put_nowait(item)
+
+        try:
+            self._bind_loop()
+            with span("query", **{"octorag.thread_id": thread_id}) as current:
+                queued = time.perf_counter()
+                # The deadline starts before the query waits for a slot, so waiting counts too.
+                async with asyncio.timeout(timeout):
+                    async with self._slots:
+                        current.set(
+                            **{
+                                "octorag.queue_wait_ms": round(
+                                    (time.perf_counter() - queued) * 1000, 1
+                                )
+                            }
+                        )
+                        try:
+                            await stream()
+                        finally:
+                            if self._retention is not None:
+                                await asyncio.shield(
+                                    self._retention.finished(thread_id)
+                                )
+        finally:
+            items.put_nowait(None)
+
+    async def _serve(self, query, thread_id, timeout, stream_mode, handle):
+        if timeout is None:
+            timeout = self.query_timeout
+        items = asyncio.Queue()
+        # The graph runs in its own task, so the query can be timed out or cancelled whatever the
+        # caller is doing between items.
+        task = asyncio.create_task(
+            self._run(
+                query,
+                thread_id or uuid.uuid4().hex,
+                timeout,
+                stream_mode,
+                handle,
+                items,
+            )
+        )
+        try:
+            while (item := await items.get()) is not None:
+                yield item
+            await task
+        finally:
+            task.cancel()
+
+    @staticmethod
+    def _final_messages(values) -> list[str]:
+        if isinstance(values["messages"][-1], AIMessage):
+            content = values["messages"][-1].content
+            if isinstance(content, str):
+                return [content]
+            elif (
+                isinstance(content, list) and len(content) > 0 and "text" in content[-1]
+            ):
+                return [content[-1]["text"]]
+        return []
+
+    async def query(
+        self, query: str, thread_id: str | None = None, timeout: float | None = None
+    ):
+        """Yields the messages of the agents as they answer ``query``.
+
+        Each query runs in its own conversation thread, a new one unless ``thread_id`` names an
+        earlier one to continue. Up to ``max_concurrency`` queries run at once and the rest wait.
+        A query that takes longer than ``timeout`` seconds (``query_timeout`` by default), waiting
+        included, raises ``TimeoutError``. Closing the generator or cancelling its task cancels
+        the query.
+        """
+        async for message in self._serve(
+            query, thread_id, timeout, "values", self._final_messages
+        ):
+            yield message
+
+    async def astream(
+        self, query: str, thread_id: str | None = None, timeout: float | None = None
+    ):
+        """Like ``query``, but yields model tokens and tool calls as they happen, as the events
+        described in ``octorag_stream``."""
+        async for event in self._serve(
+            query,
+            thread_id,
+            timeout,
+            STREAM_MODE,
+            lambda chunk: to_events(*chunk, self.node_agents),
+        ):
+            yield event
+
+    async def run(
+        self, query: str, thread_id: str | None = None, timeout: float | None = None
+    ) -> list[str]:
+        """Runs ``query`` to completion and returns all its messages. Use with ``asyncio.gather``
+        or ``asyncio.create_task`` to serve many queries at once."""
+        return [message async for message in self.query(query, thread_id, timeout)]
@@ -0,0 +1,261 @@
+"""Keeps the conversation state of the multi-agent graph bounded.
+
+Checkpoints are stored in SQLite on local disk by default, so they survive restarts without growing
+the process. ``CheckpointRetention`` keeps only the latest checkpoint of each finished conversation,
+and only the most recently used conversations. ``compact_messages`` truncates old tool outputs, the
+full READMEs and files agents have already read, and old handoff payloads, such as the code the
+Code Generator hands to the Code Poster, once a conversation exceeds a token budget, so the prompt
+sent with each agent turn stops growing too. The latest handoff is kept whole, as it describes the
+work the current agent is doing.
+
+SQLite storage needs the ``langgraph-checkpoint-sqlite`` and ``aiosqlite`` packages; without them,
+checkpoints are kept in memory and a warning is logged. Environment variables:
+
+- ``OCTORAG_CHECKPOINTER``: ``sqlite`` (default) or ``memory``.
+- ``OCTORAG_CHECKPOINT_DB``: SQLite database path. Default ``checkpoints.sqlite`` in the cache directory.
+- ``OCTORAG_CHECKPOINT_MAX_THREADS``: Conversations whose checkpoints are kept. Default 100.
+- ``OCTORAG_HISTORY_MAX_TOKENS``: Approximate token budget of a conversation before old tool outputs are truncated. Default 40000.
+"""
+
+import asyncio
+import json
+import logging
+import os
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from octorag_readme import estimate_tokens
+
+try:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+except ImportError:
+    aiosqlite = None
+    AsyncSqliteSaver = None
+
+logger = logging.getLogger(__name__)
+
+# How much of a compacted tool output or handoff payload the agents still see.
+COMPACTED_CHARS = 400
+
+# The name of the messages carrying a handoff payload to the agent it was made to.
+HANDOFF = "handoff"
+
+
+def max_history_tokens() -> int:
+    return int(os.getenv("OCTORAG_HISTORY_MAX_TOKENS") or 40000)
+
+
+def default_db_path() -> str:
+    return os.getenv("OCTORAG_CHECKPOINT_DB") or os.path.join(
+        os.getenv("OCTORAG_CACHE_DIR")
+        or os.path.join(os.path.expanduser("~"), ".cache", "octorag"),
+        "checkpoints.sqlite",
+    )
+
+
+async def open_checkpointer(kind: str | None = None, path: str | None = None):
+    """Returns the checkpointer selected by ``kind`` or ``OCTORAG_CHECKPOINTER``. Must be called
+    from the event loop that will use it."""
+    kind = kind or os.getenv("OCTORAG_CHECKPOINTER") or "sqlite"
+    if kind == "sqlite" and AsyncSqliteSaver is None:
+        logger.warning(
+            "langgraph-checkpoint-sqlite or aiosqlite is not installed,"
+            " so checkpoints are kept in memory."
+        )
+    if kind != "sqlite" or AsyncSqliteSaver is None:
+        return MemorySaver()
+    path = path or default_db_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = aiosqlite.connect(path)
+    # The connection runs in its own thread, which must not keep the process alive when a client
+    # is never closed.
+    connection.daemon = True
+    saver = AsyncSqliteSaver(await connection)
+    await saver.setup()
+    return saver
+
+
+async def close_checkpointer(saver):
+    if AsyncSqliteSaver is not None and isinstance(saver, AsyncSqliteSaver):
+        await saver.conn.close()
+
+
+class CheckpointRetention:
+    """Drops the intermediate checkpoints of finished conversations, and the checkpoints of all but
+    the ``max_threads`` most recently finished ones."""
+
+    def __init__(self, saver, max_threads: int | None = None):
+        self.saver = saver
+        self.max_threads = max_threads or int(
+            os.getenv("OCTORAG_CHECKPOINT_MAX_THREADS") or 100
+        )
+        # Thread IDs, least recently finished first.
+        self.threads = {}
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        """Learns the conversations already stored, such as those of an earlier process."""
+        latest = {}
+        async for checkpoint in self.saver.alist(None):
+            thread_id = checkpoint.config["configurable"]["thread_id"]
+            checkpoint_id = checkpoint.config["configurable"]["checkpoint_id"]
+            # Checkpoint IDs sort by creation time.
+            latest[thread_id] = max(latest.get(thread_id, ""), checkpoint_id)
+        async with self._lock:
+            for thread_id in sorted(latest, key=latest.get):
+                self.threads[thread_id] = None
+            await self._evict()
+
+    async def finished(self, thread_id: str):
+        async with self._lock:
+            await self._keep_latest(thread_id)
+            self.threads.pop(thread_id, None)
+            self.threads[thread_id] = None
+            await self._evict()
+
+    async def _keep_latest(self, thread_id: str):
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        history = [c async for c in self.saver.alist(config, limit=2)]
+        if len(history) < 2:
+            return
+        latest = history[0]
+        # A conversation continues from its latest checkpoint, so that is all it needs.
+        await self.saver.adelete_thread(thread_id)
+        await self.saver.aput(
+            config,
+            latest.checkpoint,
+            latest.metadata,
+            latest.checkpoint["channel_versions"],
+        )
+
+    async def _evict(self):
+        while len(self.threads) > self.max_threads:
+            thread_id = next(iter(self.threads))
+            del self.threads[thread_id]
+            await self.saver.adelete_thread(thread_id)
+
+
+def message_text(message) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        item.get("text", "") if isinstance(item, dict) else str(item)
+        for item in content
+    )
+
+
+def message_tokens(message) -> int:
+    tokens = estimate_tokens(message_text(message))
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(json.dumps(call["args"]))
+    return tokens
+
+
+def is_handoff(message) -> bool:
+    return isinstance(message, HumanMessage) and message.name == HANDOFF
+
+
+def _truncate(text: str, note: str = "") -> str | None:
+    if len(text) <= COMPACTED_CHARS * 2:
+        return None
+    return (
+        text[:COMPACTED_CHARS]
+        + f"\n[... {len(text) - COMPACTED_CHARS} characters removed to save space.{note}]"
+    )
+
+
+def _compact_tool_output(message: ToolMessage) -> ToolMessage | None:
+    stub = _truncate(
+        message_text(message), f" Call {message.name} again if you need them."
+    )
+    if stub is None:
+        return None
+    return ToolMessage(
+        content=stub,
+        id=message.id,
+        name=message.name,
+        tool_call_id=message.tool_call_id,
+        status=message.status,
+    )
+
+
+def _compact_handoff_calls(message: AIMessage) -> AIMessage | None:
+    # The payload of a handoff call is repeated in the handoff message that follows it.
+    payloads = {}
+    for call in message.tool_calls:
+        if call["name"] == HANDOFF:
+            stub = _truncate(call["args"].get("payload", ""))
+            if stub is not None:
+                payloads[call["id"]] = stub
+    if not payloads:
+        return None
+    tool_calls = [
+        (
+            {**call, "args": {**call["args"], "payload": payloads[call["id"]]}}
+            if call["id"] in payloads
+            else call
+        )
+        for call in message.tool_calls
+    ]
+    content = message.content
+    if isinstance(content, list):
+        # Anthropic models also keep each tool call as a block of the content.
+        content = [
+            (
+                {**block, "input": {**block["input"], "payload": payloads[block["id"]]}}
+                if isinstance(block, dict)
+                and block.get("type") == "tool_use"
+                and block.get("id") in payloads
+                else block
+            )
+            for block in content
+        ]
+    return message.model_copy(update={"content": content, "tool_calls": tool_calls})
+
+
+def compact_messages(messages: list, budget: int | None = None) -> list:
+    """Returns truncated copies of the oldest tool outputs and handoff payloads, enough of them to
+    bring ``messages`` within ``budget`` tokens. The copies keep their message IDs, so they replace
+    the originals in the graph state. Messages the agents have not answered yet, and the latest
+    handoff message, are never truncated.
+    """
+    budget = budget or max_history_tokens()
+    total = sum(message_tokens(m) for m in messages)
+    if total <= budget:
+        return []
+
+    last_answer = max(
+        (i for i, m in enumerate(messages) if isinstance(m, AIMessage)), default=-1
+    )
+    last_handoff = max((i for i, m in enumerate(messages) if is_handoff(m)), default=-1)
+    compacted = []
+    for i, message in enumerate(messages[:last_answer]):
+        if total <= budget:
+            break
+        if message.id is None:
+            continue
+        if isinstance(message, ToolMessage):
+            replacement = _compact_tool_output(message)
+        elif isinstance(message, AIMessage):
+            replacement = _compact_handoff_calls(message)
+        elif is_handoff(message) and i < last_handoff:
+            stub = _truncate(message_text(message))
+            replacement = stub and HumanMessage(
+                content=stub, id=message.id, name=message.name
+            )
+        else:
+            continue
+        if replacement is None:
+            continue
+        total -= message_tokens(message) - message_tokens(replacement)
+        compacted.append(replacement)
+    return compacted
+
+
+def apply_compaction(messages: list, compacted: list) -> list:
+    """Returns ``messages`` with the messages in ``compacted`` swapped in."""
+    replacements = {m.id: m for m in compacted}
+    return [replacements.get(m.id, m) if m.id else m for m in messages]
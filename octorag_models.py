@@ -0,0 +1,48 @@
+"""Which chat model each agent runs on, and the classifier behind the recommendation fast path.
+
+Models are named as ``init_chat_model`` expects them, like ``anthropic:claude-3-7-sonnet-latest``.
+An agent's model is the one passed to the constructor, or else the one set for its role in the
+environment, or else ``OCTORAG_MODEL``:
+
+- ``OCTORAG_MODEL``: Default model of every agent. Default ``anthropic:claude-3-7-sonnet-latest``.
+- ``OCTORAG_RETRIEVER_MODEL``, ``OCTORAG_CURATOR_MODEL``, ``OCTORAG_GENERATOR_MODEL``, ``OCTORAG_POSTER_MODEL``: Model of one agent.
+- ``OCTORAG_LOCAL_MODEL``: Model of the single local agent.
+- ``OCTORAG_CLASSIFIER_MODEL``: Model deciding whether a query needs code. Default ``OCTORAG_MODEL`` if set, else ``anthropic:claude-3-5-haiku-latest``.
+- ``OCTORAG_FAST_PATH``: Set to ``0`` to send every query through the whole workflow. Default enabled.
+
+With the fast path, the classifier reads each query first. Queries that only ask for
+recommendations are curated and answered without the Code Generator and Code Poster.
+"""
+
+import os
+
+DEFAULT_MODEL = "anthropic:claude-3-7-sonnet-latest"
+DEFAULT_CLASSIFIER_MODEL = "anthropic:claude-3-5-haiku-latest"
+
+CLASSIFIER_PROMPT = (
+    "You decide how a request about GitHub repositories will be handled. "
+    "Answer CODE if the request asks for code to be written, generated, modified or published to a repository, "
+    "or if you are unsure. Answer RECOMMEND if it only asks to find, compare, explain or recommend repositories or libraries. "
+    "Answer with the single word CODE or RECOMMEND."
+)
+
+
+def model_for(role: str, model: str | None = None) -> str:
+    """Returns the model of the agent with ``role``, such as ``"curator"``."""
+    if model:
+        return model
+    default = DEFAULT_CLASSIFIER_MODEL if role == "classifier" else DEFAULT_MODEL
+    return (
+        os.getenv(f"OCTORAG_{role.upper()}_MODEL")
+        or os.getenv("OCTORAG_MODEL")
+        or default
+    )
+
+
+def fast_path_enabled() -> bool:
+    return os.getenv("OCTORAG_FAST_PATH", "1").lower() not in ("0", "false", "no")
+
+
+def needs_code(answer: str) -> bool:
+    """Reads the classifier's answer. Anything but a clear RECOMMEND keeps the whole workflow."""
+    return "RECOMMEND" not in answer.upper() or "CODE" in answer.upper()
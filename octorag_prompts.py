@@ -0,0 +1,87 @@
+"""Provider-side prompt caching for agent turns, and per-agent token accounting.
+
+Every agent turn re-sends the agent's system prompt, its tool schemas and the whole conversation
+so far, and only the last few messages are new. For models that support it (Anthropic's), the
+prompt is marked with two cache breakpoints: one on the system prompt, which caches the tool
+schemas and the system prompt in front of it, and one on the last message, so the next turn reads
+the conversation up to here from the cache and only pays full price for what was added since.
+
+- ``OCTORAG_PROMPT_CACHE``: Set to ``0`` to disable prompt caching. Default enabled.
+"""
+
+import os
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def supports_prompt_caching(model) -> bool:
+    if os.getenv("OCTORAG_PROMPT_CACHE", "1").lower() in ("0", "false", "no"):
+        return False
+    return getattr(model, "_llm_type", None) == "anthropic-chat"
+
+
+def cached_system_message(prompt: str) -> dict:
+    return {
+        "role": "system",
+        "content": [{"type": "text", "text": prompt, "cache_control": CACHE_CONTROL}],
+    }
+
+
+def with_cache_breakpoint(message):
+    """Returns a copy of ``message`` whose last content block is marked for caching."""
+    content = message.content
+    if message.type == "tool":
+        # Anthropic takes tool results as content blocks of their own.
+        block = {
+            "type": "tool_result",
+            "content": content,
+            "tool_use_id": message.tool_call_id,
+            "is_error": message.status == "error",
+            "cache_control": CACHE_CONTROL,
+        }
+        return message.model_copy(update={"content": [block]})
+    if isinstance(content, str):
+        if not content:
+            return message
+        blocks = [{"type": "text", "text": content, "cache_control": CACHE_CONTROL}]
+    elif content and isinstance(content[-1], dict):
+        blocks = content[:-1] + [{**content[-1], "cache_control": CACHE_CONTROL}]
+    else:
+        return message
+    return message.model_copy(update={"content": blocks})
+
+
+def cache_prompt(system_prompt: str, messages: list) -> list:
+    """Returns the prompt of an agent turn with the cache breakpoints described above."""
+    if messages:
+        messages = messages[:-1] + [with_cache_breakpoint(messages[-1])]
+    return [cached_system_message(system_prompt)] + messages
+
+
+def record_usage(usage: dict, agent: str, message):
+    """Adds the tokens used by the turn that produced ``message`` to ``usage[agent]``."""
+    metadata = getattr(message, "usage_metadata", None)
+    if not metadata:
+        return
+    details = metadata.get("input_token_details") or {}
+    cache_read = details.get("cache_read") or 0
+    cache_creation = details.get("cache_creation") or 0
+    totals = usage.setdefault(
+        agent,
+        {
+            "turns": 0,
+            "input_tokens": 0,
+            "cache_read_tokens": 0,
+            "cache_creation_tokens": 0,
+            "uncached_input_tokens": 0,
+            "output_tokens": 0,
+        },
+    )
+    totals["turns"] += 1
+    totals["input_tokens"] += metadata.get("input_tokens", 0)
+    totals["cache_read_tokens"] += cache_read
+    totals["cache_creation_tokens"] += cache_creation
+    totals["uncached_input_tokens"] += (
+        metadata.get("input_tokens", 0) - cache_read - cache_creation
+    )
+    totals["output_tokens"] += metadata.get("output_tokens", 0)
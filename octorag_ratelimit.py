@@ -0,0 +1,204 @@
+"""Rate-limit-aware scheduling of GitHub API calls.
+
+GitHub enforces separate primary budgets for the search API (30 requests per minute when
+authenticated) and the core API (5000 requests per hour), plus undocumented secondary limits that
+answer ``403``/``429`` with a ``Retry-After`` header. Rather than letting those errors reach the
+agents, every request first reserves a token from the bucket of its resource, waiting in line if the
+bucket is empty, and rate-limited responses are retried after the reset time or a jittered
+exponential backoff. Bucket levels are corrected from the ``X-RateLimit-*`` headers of each response.
+
+Environment variables:
+
+- ``OCTORAG_SEARCH_RATE``: Search requests allowed per minute. Default 30.
+- ``OCTORAG_CORE_RATE``: Core requests allowed per hour. Default 5000.
+- ``OCTORAG_MAX_RETRIES``: Retries of a rate-limited request before giving up. Default 5.
+- ``OCTORAG_MAX_RATE_LIMIT_WAIT``: Longest single wait in seconds before giving up. Default 900.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+
+import httpx
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        # Monotonic time before which no request may be sent, set from X-RateLimit-Reset/Retry-After.
+        self.blocked_until = 0.0
+
+    def reserve(self, now: float) -> float:
+        """Takes one token and returns how many seconds the caller must wait before using it.
+
+        Tokens may go negative: each caller reserves the next slot in line, so concurrent callers
+        are released one refill interval apart instead of all at once.
+        """
+        rate = self.capacity / self.period
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / rate
+        return max(wait, self.blocked_until - now)
+
+    def update(self, remaining: int, reset_in: float | None, now: float):
+        # Trust the server's count when it is lower than ours (other clients share the token).
+        self.tokens = min(self.tokens, float(remaining))
+        self.updated = now
+        if remaining == 0 and reset_in is not None:
+            self.block(reset_in, now)
+
+    def block(self, seconds: float, now: float):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RateLimitScheduler:
+    def __init__(
+        self,
+        search_per_minute: int = 30,
+        core_per_hour: int = 5000,
+        max_retries: int = 5,
+        max_wait: float = 900.0,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        self.buckets = {
+            "search": TokenBucket(search_per_minute, 60.0),
+            "core": TokenBucket(core_per_hour, 3600.0),
+        }
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self.metrics = {
+            "requests": 0,
+            "queued": 0,
+            "queue_wait_seconds": 0.0,
+            "max_queue_wait_seconds": 0.0,
+            "rate_limited": 0,
+            "retries": 0,
+        }
+
+    @staticmethod
+    def resource_for(url: str) -> str:
+        path = httpx.URL(url).path
+        return "search" if path.startswith("/search/") else "core"
+
+    def _reserve(self, resource: str) -> float:
+        with self._lock:
+            wait = self.buckets[resource].reserve(time.monotonic())
+            self.metrics["requests"] += 1
+            if wait > 0:
+                self._record_wait(wait)
+            return wait
+
+    def _record_wait(self, wait: float):
+        self.metrics["queued"] += 1
+        self.metrics["queue_wait_seconds"] += wait
+        self.metrics["max_queue_wait_seconds"] = max(
+            self.metrics["max_queue_wait_seconds"], wait
+        )
+
+    async def aacquire(self, resource: str):
+        wait = self._reserve(resource)
+        if wait > self.max_wait:
+            raise RateLimitExceeded(
+                f"GitHub {resource} rate limit exhausted for another {wait:.0f} seconds. Do not retry immediately."
+            )
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def observe(self, resource: str, response: httpx.Response, attempt: int) -> bool:
+        """Updates the buckets from a response and returns whether it should be retried.
+
+        A rate-limited response blocks its bucket for the required delay, so the retry (and every
+        other caller of the same resource) waits for it in ``aacquire``.
+        """
+        now = time.monotonic()
+        headers = response.headers
+        # GitHub names the budget the request was counted against.
+        resource = headers.get("X-RateLimit-Resource", resource)
+        bucket = self.buckets.get(resource, self.buckets["core"])
+        reset_in = None
+        if "X-RateLimit-Reset" in headers:
+            reset_in = max(0.0, float(headers["X-RateLimit-Reset"]) - time.time())
+        with self._lock:
+            if "X-RateLimit-Remaining" in headers:
+                bucket.update(int(headers["X-RateLimit-Remaining"]), reset_in, now)
+            if not self._is_rate_limited(response):
+                return False
+            self.metrics["rate_limited"] += 1
+            if attempt >= self.max_retries:
+                raise RateLimitExceeded(
+                    f"GitHub {resource} rate limit still exceeded after {attempt} retries. Do not retry immediately."
+                )
+            if "Retry-After" in headers:
+                delay = float(headers["Retry-After"])
+            elif headers.get("X-RateLimit-Remaining") == "0" and reset_in is not None:
+                delay = reset_in + 1.0
+            else:
+                # Secondary limit without guidance: exponential backoff with full jitter.
+                delay = random.uniform(
+                    0, min(self.backoff_max, self.backoff_base * 2**attempt)
+                )
+            if delay > self.max_wait:
+                raise RateLimitExceeded(
+                    f"GitHub {resource} rate limit exceeded, resets in {delay:.0f} seconds. Do not retry immediately."
+                )
+            # Hold back every other caller of this resource as well, instead of letting them trip it too.
+            bucket.block(delay, now)
+            self.metrics["retries"] += 1
+            return True
+
+    @staticmethod
+    def _is_rate_limited(response: httpx.Response) -> bool:
+        if response.status_code == 429:
+            return True
+        if response.status_code != 403:
+            return False
+        headers = response.headers
+        if headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in headers:
+            return True
+        return "rate limit" in response.text.lower()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.metrics)
+            now = time.monotonic()
+            for name, bucket in self.buckets.items():
+                stats[f"{name}_tokens"] = round(bucket.tokens, 2)
+                stats[f"{name}_blocked_for_seconds"] = round(
+                    max(0.0, bucket.blocked_until - now), 2
+                )
+            return stats
+
+
+_scheduler = None
+
+
+def get_scheduler() -> RateLimitScheduler:
+    """Returns the process-wide scheduler configured from the environment."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RateLimitScheduler(
+            search_per_minute=int(os.getenv("OCTORAG_SEARCH_RATE") or 30),
+            core_per_hour=int(os.getenv("OCTORAG_CORE_RATE") or 5000),
+            max_retries=int(os.getenv("OCTORAG_MAX_RETRIES") or 5),
+            max_wait=float(os.getenv("OCTORAG_MAX_RATE_LIMIT_WAIT") or 900),
+        )
+    return _scheduler
+
+
+def set_scheduler(scheduler: RateLimitScheduler):
+    global _scheduler
+    _scheduler = scheduler
@@ -0,0 +1,204 @@
+"""Shrinks READMEs before they are handed to an agent.
+
+Whole READMEs are often the largest thing in an agent's context, and much of them is badges, HTML,
+images and sections irrelevant to the question at hand. ``select_sections`` strips that noise,
+splits the README into sections by heading and returns as many sections as fit in a token budget:
+in document order by default, or the sections scoring highest for a ``focus`` query under BM25.
+The split form of each README is cached by content, so repeated reads only rescore it.
+
+- ``OCTORAG_README_MAX_TOKENS``: Approximate token budget of a README returned to an agent. Default 2000.
+"""
+
+import hashlib
+import math
+import os
+import re
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+
+# Rough size of a token in characters, good enough for budgeting English and code.
+CHARS_PER_TOKEN = 4
+
+_STOPWORDS = {
+    "a",
+    "an",
+    "and",
+    "are",
+    "for",
+    "how",
+    "i",
+    "in",
+    "is",
+    "it",
+    "of",
+    "on",
+    "or",
+    "the",
+    "to",
+    "with",
+}
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+@dataclass
+class Section:
+    heading: str
+    level: int
+    body: str
+    tokens: list[str]
+
+    def text(self) -> str:
+        if not self.heading:
+            return self.body
+        return f"{'#' * self.level} {self.heading}\n{self.body}".rstrip()
+
+
+def max_tokens() -> int:
+    return int(os.getenv("OCTORAG_README_MAX_TOKENS") or 2000)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def tokenize(text: str) -> list[str]:
+    return [
+        word
+        for word in re.findall(r"[a-z0-9_+#]+", text.lower())
+        if word not in _STOPWORDS
+    ]
+
+
+def clean_markdown(text: str) -> str:
+    """Removes badges, images, HTML and link reference definitions, keeping readable text."""
+    text = re.sub(r"<!--.*?-->", "", text, flags=re.DOTALL)
+    # Linked images (badges) first, then bare images.
+    text = re.sub(r"\[!\[[^\]]*\]\([^)]*\)\]\([^)]*\)", "", text)
+    text = re.sub(r"!\[[^\]]*\]\([^)]*\)", "", text)
+    text = re.sub(r"!\[[^\]]*\]\[[^\]]*\]", "", text)
+    text = re.sub(r"^\s*\[[^\]]+\]:\s*\S+.*$", "", text, flags=re.MULTILINE)
+    text = re.sub(r"<img\b[^>]*>", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"</?[a-zA-Z][^>]*>", "", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def split_sections(text: str) -> list[Section]:
+    sections = []
+    heading, level, lines = "", 0, []
+    in_fence = False
+
+    def flush():
+        body = "\n".join(lines).strip()
+        if heading or body:
+            sections.append(
+                Section(heading, level, body, tokenize(f"{heading} {body}"))
+            )
+
+    for line in text.splitlines():
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING.match(line)
+        if match:
+            flush()
+            heading, level, lines = match.group(2), len(match.group(1)), []
+        else:
+            lines.append(line)
+    flush()
+    return sections
+
+
+_chunk_cache = OrderedDict()
+_CHUNK_CACHE_SIZE = 256
+
+
+def chunk_readme(text: str) -> list[Section]:
+    """Returns the cleaned sections of a README, cached by content."""
+    digest = hashlib.sha256(text.encode()).hexdigest()
+    sections = _chunk_cache.get(digest)
+    if sections is None:
+        sections = split_sections(clean_markdown(text))
+        _chunk_cache[digest] = sections
+        if len(_chunk_cache) > _CHUNK_CACHE_SIZE:
+            _chunk_cache.popitem(last=False)
+    else:
+        _chunk_cache.move_to_end(digest)
+    return sections
+
+
+def bm25_scores(
+    sections: list[Section], query: str, k1: float = 1.5, b: float = 0.75
+) -> list[float]:
+    terms = tokenize(query)
+    if not terms or not sections:
+        return [0.0] * len(sections)
+    average_length = sum(len(s.tokens) for s in sections) / len(sections) or 1
+    document_frequency = Counter()
+    for section in sections:
+        document_frequency.update(set(section.tokens))
+    scores = []
+    for section in sections:
+        counts = Counter(section.tokens)
+        norm = k1 * (1 - b + b * len(section.tokens) / average_length)
+        score = 0.0
+        for term in terms:
+            if term not in counts:
+                continue
+            df = document_frequency[term]
+            idf = math.log(1 + (len(sections) - df + 0.5) / (df + 0.5))
+            score += idf * counts[term] * (k1 + 1) / (counts[term] + norm)
+        scores.append(score)
+    return scores
+
+
+def select_sections(
+    text: str,
+    focus: str | None = None,
+    full: bool = False,
+    budget: int | None = None,
+) -> str:
+    """Returns the parts of a README worth showing an agent, within ``budget`` tokens."""
+    if full:
+        return text
+    budget = budget or max_tokens()
+    sections = chunk_readme(text)
+    if focus:
+        scores = bm25_scores(sections, focus)
+        # The introduction says what the project is, so it always competes for a place.
+        if scores:
+            scores[0] = max(scores[0], max(scores) / 2)
+        order = sorted(range(len(sections)), key=lambda i: scores[i], reverse=True)
+        order = [i for i in order if scores[i] > 0] or list(range(len(sections)))
+    else:
+        order = list(range(len(sections)))
+
+    chosen = set()
+    used = 0
+    for i in order:
+        cost = estimate_tokens(sections[i].text())
+        if used + cost > budget:
+            if not chosen:
+                # Better a truncated section than nothing at all.
+                chosen.add(i)
+                used = budget
+            continue
+        chosen.add(i)
+        used += cost
+
+    out = []
+    for i in sorted(chosen):
+        section_text = sections[i].text()
+        if estimate_tokens(section_text) > budget:
+            section_text = section_text[: budget * CHARS_PER_TOKEN] + "\n[...]"
+        out.append(section_text)
+    omitted = [
+        s.heading for i, s in enumerate(sections) if i not in chosen and s.heading
+    ]
+    if omitted:
+        out.append(
+            "Sections left out to save space (call get_readme with a focus on them, or with full=True, to read them): "
+            + "; ".join(omitted)
+        )
+    return "\n\n".join(out)
@@ -0,0 +1,157 @@
+"""Turns the comma-delimited keyword lists agents send into GitHub repository searches.
+
+Each keyword becomes its own search, so ``python,computer vision,confidential`` finds repositories
+matching any of them instead of one search for the literal string. Keywords that are search
+qualifiers (``language:rust``, ``stars:>100``), programming language names, or simple phrases like
+``more than 500 stars`` or ``updated since 2024`` are turned into qualifiers applied to every search.
+Each search fetches a pool of candidates larger than the number of repositories asked for, so that
+a repository matching several keywords is found even if it is no keyword's most starred result.
+Results are merged, deduplicated and ranked by how many keywords matched, then by stars.
+"""
+
+import re
+
+# GitHub returns at most 1000 results per search, 100 per page.
+PER_PAGE = 100
+MAX_RESULTS = 1000
+
+# Each keyword's search fetches at least this many candidates for merging.
+MIN_CANDIDATES = 30
+
+QUALIFIERS = {
+    "archived",
+    "created",
+    "followers",
+    "fork",
+    "forks",
+    "good-first-issues",
+    "help-wanted-issues",
+    "in",
+    "is",
+    "language",
+    "license",
+    "org",
+    "pushed",
+    "repo",
+    "size",
+    "stars",
+    "topic",
+    "topics",
+    "user",
+}
+
+LANGUAGES = {
+    "c": "c",
+    "c#": "csharp",
+    "c++": "cpp",
+    "clojure": "clojure",
+    "cpp": "cpp",
+    "csharp": "csharp",
+    "dart": "dart",
+    "elixir": "elixir",
+    "erlang": "erlang",
+    "go": "go",
+    "golang": "go",
+    "haskell": "haskell",
+    "java": "java",
+    "javascript": "javascript",
+    "js": "javascript",
+    "julia": "julia",
+    "kotlin": "kotlin",
+    "lua": "lua",
+    "ocaml": "ocaml",
+    "php": "php",
+    "python": "python",
+    "ruby": "ruby",
+    "rust": "rust",
+    "scala": "scala",
+    "shell": "shell",
+    "swift": "swift",
+    "typescript": "typescript",
+    "ts": "typescript",
+    "zig": "zig",
+}
+
+_STARS = re.compile(
+    r"^(?:(?:more than|over|at least|min(?:imum)?)\s+)?(\d+)\+?\s*stars?$|^stars?\s*(?:>|>=|over)\s*(\d+)$"
+)
+_PUSHED = re.compile(
+    r"^(?:pushed|updated|active)\s+(?:after|since)\s+(\d{4}(?:-\d{2}(?:-\d{2})?)?)$"
+)
+
+
+def _date(value: str) -> str:
+    # GitHub qualifiers need full dates.
+    parts = value.split("-")
+    while len(parts) < 3:
+        parts.append("01")
+    return "-".join(parts)
+
+
+def parse_keywords(keywords: str) -> tuple[list[str], list[str]]:
+    """Splits a comma-delimited keyword list into plain search terms and shared qualifiers."""
+    terms = []
+    qualifiers = []
+    for keyword in keywords.split(","):
+        keyword = " ".join(keyword.split())
+        if not keyword:
+            continue
+        lowered = keyword.lower()
+        name, sep, value = lowered.partition(":")
+        if sep and name in QUALIFIERS and value:
+            qualifiers.append(f"{name}:{keyword.partition(':')[2].strip()}")
+        elif lowered in LANGUAGES:
+            qualifiers.append(f"language:{LANGUAGES[lowered]}")
+        elif match := _STARS.match(lowered):
+            qualifiers.append(f"stars:>={match.group(1) or match.group(2)}")
+        elif match := _PUSHED.match(lowered):
+            qualifiers.append(f"pushed:>{_date(match.group(1))}")
+        else:
+            terms.append(keyword)
+    return terms, qualifiers
+
+
+def build_queries(keywords: str) -> list[str]:
+    """Returns one search query per plain keyword, each carrying every qualifier."""
+    terms, qualifiers = parse_keywords(keywords)
+    suffix = " ".join(qualifiers)
+    if not terms:
+        return [suffix] if suffix else []
+    return [f"{term} {suffix}".strip() for term in terms]
+
+
+def candidate_count(count: int) -> int:
+    """Number of results to fetch per keyword to pick the best ``count`` from after merging."""
+    return min(max(count * 3, MIN_CANDIDATES), MAX_RESULTS)
+
+
+def page_count(count: int) -> int:
+    count = min(max(count, 1), MAX_RESULTS)
+    return -(-count // PER_PAGE)
+
+
+def per_page(count: int) -> int:
+    return min(max(count, 1), PER_PAGE)
+
+
+def merge_results(results: list[list[dict]], count: int) -> dict:
+    """Merges the items of several searches, best first, in the shape of a search response."""
+    repos = {}
+    matches = {}
+    for items in results:
+        seen = set()
+        for item in items:
+            key = item["full_name"].lower()
+            repos.setdefault(key, item)
+            if key not in seen:
+                seen.add(key)
+                matches[key] = matches.get(key, 0) + 1
+    ranked = sorted(
+        repos,
+        key=lambda key: (matches[key], repos[key]["stargazers_count"]),
+        reverse=True,
+    )
+    return {
+        "total_count": len(ranked),
+        "items": [repos[key] for key in ranked[:count]],
+    }
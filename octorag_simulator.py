@@ -0,0 +1,835 @@
+"""Offline stand-ins for the GitHub API and the chat models, for benchmarks and tests.
+
+``GitHubSimulator`` answers the GitHub endpoints the tools use from repositories kept in memory,
+through an ``httpx`` transport that ``install`` plugs into ``octorag_github``. The tools, the response
+cache and the rate limit scheduler run unchanged and never touch the network. The simulator can
+add latency, keeps search and core budgets of its own and reports them in ``X-RateLimit-*``
+headers, answers conditional requests with ``304``, and can be told to fail requests with
+``inject``. ``ScriptedChatModel`` plays back scripted agent turns instead of calling a model.
+``tests/octorag_offline_benchmark.py`` drives ``OctoRAG``, ``OctoRAG_MCP`` and the MCP server
+tools through them.
+"""
+
+import asyncio
+import base64
+import collections
+import hashlib
+import io
+import json
+import random
+import re
+import tarfile
+import threading
+import time
+import uuid
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from octorag_github import configure
+
+# GitHub's own limits for authenticated requests: (requests, window in seconds).
+DEFAULT_RATE_LIMITS = {"search": (30, 60), "core": (5000, 3600)}
+
+
+def _git_sha(kind: str, data: bytes) -> str:
+    return hashlib.sha1(f"{kind} {len(data)}\0".encode() + data).hexdigest()
+
+
+class SimulatedRepo:
+    def __init__(self, owner: str, name: str, **metadata):
+        self.owner = owner
+        self.name = name
+        self.metadata = metadata
+        self.default_branch = metadata.get("default_branch", "main")
+        # Branch name -> commit SHA. Empty until the first commit, like a new GitHub repository.
+        self.refs = {}
+
+    def to_json(self) -> dict:
+        full_name = f"{self.owner}/{self.name}"
+        return {
+            "id": int(hashlib.sha1(full_name.encode()).hexdigest()[:8], 16),
+            "name": self.name,
+            "full_name": full_name,
+            "owner": {"login": self.owner},
+            "html_url": f"https://github.com/{full_name}",
+            "description": self.metadata.get("description"),
+            "stargazers_count": self.metadata.get("stars", 0),
+            "license": (
+                {"name": self.metadata["license"]}
+                if self.metadata.get("license")
+                else None
+            ),
+            "topics": list(self.metadata.get("topics", ())),
+            "language": self.metadata.get("language"),
+            "private": self.metadata.get("private", False),
+            "default_branch": self.default_branch,
+        }
+
+
+class _Budget:
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.used = 0
+        self.reset_at = time.time() + window
+
+    def take(self) -> bool:
+        now = time.time()
+        if now >= self.reset_at:
+            self.used = 0
+            self.reset_at = now + self.window
+        if self.used >= self.limit:
+            return False
+        self.used += 1
+        return True
+
+    def headers(self, resource: str) -> dict:
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.limit - self.used),
+            "X-RateLimit-Used": str(self.used),
+            "X-RateLimit-Reset": str(int(self.reset_at)),
+            "X-RateLimit-Resource": resource,
+        }
+
+
+class GitHubSimulator:
+    """An in-memory GitHub API.
+
+    ``latency`` seconds, plus up to ``jitter`` more, are added to every response, and
+    ``bytes_per_second`` limits how fast bodies arrive. Files larger than ``max_file_bytes`` are
+    refused by the contents API, as GitHub does past 100 MB, but served by the blobs API. Recursive
+    trees with more than ``max_tree_entries`` entries come back truncated.
+    """
+
+    def __init__(
+        self,
+        user: str = "octorag-bench",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        bytes_per_second: float | None = None,
+        rate_limits: dict | None = None,
+        max_file_bytes: int = 100 * 1024 * 1024,
+        max_tree_entries: int = 100000,
+        seed: int = 0,
+    ):
+        self.user = user
+        self.latency = latency
+        self.jitter = jitter
+        self.bytes_per_second = bytes_per_second
+        self.max_file_bytes = max_file_bytes
+        self.max_tree_entries = max_tree_entries
+        self.repos = {}
+        # Git objects by SHA: ("blob", bytes), ("tree", entries) or ("commit", commit).
+        self.objects = {}
+        self.budgets = {
+            resource: _Budget(limit, window)
+            for resource, (limit, window) in {
+                **DEFAULT_RATE_LIMITS,
+                **(rate_limits or {}),
+            }.items()
+        }
+        self._errors = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+        self._routes = [
+            ("GET", r"/search/repositories", self._search),
+            ("GET", r"/user/repos", self._list_user_repos),
+            ("POST", r"/user/repos", self._create_repo),
+            ("GET", r"/repos/([^/]+)/([^/]+)", self._get_repo),
+            ("GET", r"/repos/([^/]+)/([^/]+)/branches/([^/]+)", self._get_branch),
+            ("GET", r"/repos/([^/]+)/([^/]+)/commits/([^/]+)", self._get_commit),
+            ("GET", r"/repos/([^/]+)/([^/]+)/readme", self._get_readme),
+            ("GET", r"/repos/([^/]+)/([^/]+)/contents/?(.*)", self._get_contents),
+            ("PUT", r"/repos/([^/]+)/([^/]+)/contents/(.+)", self._put_contents),
+            ("GET", r"/repos/([^/]+)/([^/]+)/git/trees/([^/]+)", self._get_tree),
+            ("POST", r"/repos/([^/]+)/([^/]+)/git/trees", self._post_tree),
+            ("GET", r"/repos/([^/]+)/([^/]+)/git/blobs/([^/]+)", self._get_blob),
+            ("POST", r"/repos/([^/]+)/([^/]+)/git/blobs", self._post_blob),
+            (
+                "GET",
+                r"/repos/([^/]+)/([^/]+)/git/commits/([^/]+)",
+                self._get_git_commit,
+            ),
+            ("POST", r"/repos/([^/]+)/([^/]+)/git/commits", self._post_commit),
+            ("GET", r"/repos/([^/]+)/([^/]+)/git/ref/heads/(.+)", self._get_ref),
+            ("PATCH", r"/repos/([^/]+)/([^/]+)/git/refs/heads/(.+)", self._update_ref),
+            ("GET", r"/repos/([^/]+)/([^/]+)/tarball/?(.*)", self._get_tarball),
+            # Served by codeload.github.com, where the tarball endpoint redirects to.
+            ("GET", r"/([^/]+)/([^/]+)/legacy\.tar\.gz/(.+)", self._get_codeload),
+        ]
+
+    # Setup
+
+    def add_repo(
+        self, owner: str, name: str, files: dict | None = None, **metadata
+    ) -> SimulatedRepo:
+        """Adds a repository with ``files`` (path -> text or bytes) on its default branch.
+        ``metadata`` can set ``description``, ``stars``, ``topics``, ``language``, ``license``
+        (a license name such as ``MIT License``) and ``default_branch``."""
+        repo = SimulatedRepo(owner, name, **metadata)
+        self.repos[(owner.lower(), name.lower())] = repo
+        if files:
+            self._commit(
+                repo, repo.default_branch, self._encode(files), "Initial commit"
+            )
+        return repo
+
+    def inject(
+        self,
+        status: int,
+        path: str = ".*",
+        method: str | None = None,
+        times: int | None = 1,
+        probability: float | None = None,
+        retry_after: float | None = None,
+    ):
+        """Fails requests whose path matches the ``path`` regex with ``status``, the next ``times``
+        of them, or each with ``probability``. ``retry_after`` makes it a secondary rate limit.
+        """
+        self._errors.append(
+            {
+                "status": status,
+                "path": re.compile(path),
+                "method": method,
+                "times": times,
+                "probability": probability,
+                "retry_after": retry_after,
+            }
+        )
+
+    def reset_stats(self):
+        self.stats = {
+            "requests": 0,
+            "bytes": 0,
+            "not_modified": 0,
+            "errors": 0,
+            "rate_limited": 0,
+            "endpoints": collections.Counter(),
+        }
+
+    def async_transport(self) -> httpx.AsyncBaseTransport:
+        async def handler(request):
+            response = self.handle(request)
+            await asyncio.sleep(self._delay(response))
+            return response
+
+        return httpx.MockTransport(handler)
+
+    def install(self):
+        """Routes the GitHub clients of ``octorag_github`` to the simulator. Call it before the
+        first tool call, like ``configure``."""
+        configure(async_transport=self.async_transport())
+
+    def _delay(self, response: httpx.Response) -> float:
+        delay = self.latency + (
+            self._random.uniform(0, self.jitter) if self.jitter else 0
+        )
+        if self.bytes_per_second:
+            delay += len(response.content) / self.bytes_per_second
+        return delay
+
+    # Dispatch
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        """Answers ``request`` without any added latency."""
+        with self._lock:
+            path = request.url.path
+            self.stats["requests"] += 1
+            self.stats["endpoints"][f"{request.method} {self._endpoint(path)}"] += 1
+            status, body, headers = self._dispatch(request, path)
+            if isinstance(body, (dict, list)):
+                content = json.dumps(body).encode()
+                headers.setdefault("Content-Type", "application/json; charset=utf-8")
+            elif isinstance(body, str):
+                content = body.encode()
+            else:
+                content = body
+            if request.method == "GET" and status == 200:
+                etag = f'"{hashlib.sha1(content).hexdigest()}"'
+                headers["ETag"] = etag
+                if request.headers.get("If-None-Match") == etag:
+                    self.stats["not_modified"] += 1
+                    return httpx.Response(304, headers=headers, request=request)
+            if status >= 400:
+                self.stats["errors"] += 1
+            self.stats["bytes"] += len(content)
+            return httpx.Response(
+                status, content=content, headers=headers, request=request
+            )
+
+    @staticmethod
+    def _endpoint(path: str) -> str:
+        # Groups requests like /repos/a/b/contents/src/x.py as /repos/{owner}/{repo}/contents.
+        parts = path.strip("/").split("/")
+        if parts[0] != "repos" or len(parts) < 3:
+            return path
+        rest = parts[3:5] if parts[3:4] == ["git"] else parts[3:4]
+        return "/".join(["/repos/{owner}/{repo}"] + rest)
+
+    def _dispatch(self, request: httpx.Request, path: str):
+        for rule in self._errors:
+            if self._fails(rule, request, path):
+                return self._injected(rule)
+        resource = "search" if path.startswith("/search/") else "core"
+        budget = self.budgets[resource]
+        # Conditional requests answered with 304 do not count against GitHub's rate limit.
+        if not request.headers.get("If-None-Match") and not budget.take():
+            self.stats["rate_limited"] += 1
+            return (
+                403,
+                {"message": f"API rate limit exceeded for {self.user}."},
+                budget.headers(resource),
+            )
+        for method, pattern, handler in self._routes:
+            match = re.fullmatch(pattern, path)
+            if method == request.method and match:
+                status, body, headers = handler(request, *match.groups())
+                return status, body, {**budget.headers(resource), **headers}
+        return 404, {"message": "Not Found"}, budget.headers(resource)
+
+    def _fails(self, rule: dict, request: httpx.Request, path: str) -> bool:
+        if rule["method"] and rule["method"] != request.method:
+            return False
+        if not rule["path"].search(path):
+            return False
+        if rule["probability"] is not None:
+            return self._random.random() < rule["probability"]
+        if rule["times"] is None:
+            return True
+        if rule["times"] > 0:
+            rule["times"] -= 1
+            return True
+        return False
+
+    def _injected(self, rule: dict):
+        headers = {}
+        message = "Simulated error"
+        if rule["retry_after"] is not None:
+            headers["Retry-After"] = str(rule["retry_after"])
+            message = "You have exceeded a secondary rate limit."
+        return rule["status"], {"message": message}, headers
+
+    # Git objects
+
+    @staticmethod
+    def _encode(files: dict) -> dict:
+        return {
+            path: content.encode() if isinstance(content, str) else content
+            for path, content in files.items()
+        }
+
+    def _store(self, kind: str, payload) -> str:
+        data = (
+            payload if kind == "blob" else json.dumps(payload, sort_keys=True).encode()
+        )
+        sha = _git_sha(kind, data)
+        self.objects[sha] = (kind, payload)
+        return sha
+
+    def _write_tree(self, files: dict) -> str:
+        entries = []
+        subtrees = {}
+        for path, content in files.items():
+            head, _, rest = path.partition("/")
+            if rest:
+                subtrees.setdefault(head, {})[rest] = content
+            else:
+                entries.append(
+                    {
+                        "path": head,
+                        "mode": "100644",
+                        "type": "blob",
+                        "sha": self._store("blob", content),
+                        "size": len(content),
+                    }
+                )
+        for name, subtree in subtrees.items():
+            entries.append(
+                {
+                    "path": name,
+                    "mode": "040000",
+                    "type": "tree",
+                    "sha": self._write_tree(subtree),
+                }
+            )
+        entries.sort(key=lambda entry: entry["path"])
+        return self._store("tree", entries)
+
+    def _tree_files(self, tree_sha: str, prefix: str = "") -> dict:
+        files = {}
+        for entry in self.objects[tree_sha][1]:
+            if entry["type"] == "tree":
+                files.update(
+                    self._tree_files(entry["sha"], prefix + entry["path"] + "/")
+                )
+            else:
+                files[prefix + entry["path"]] = self.objects[entry["sha"]][1]
+        return files
+
+    def _commit(
+        self, repo: SimulatedRepo, branch: str, files: dict, message: str
+    ) -> str:
+        parent = repo.refs.get(branch)
+        commit = {
+            "tree": {"sha": self._write_tree(files)},
+            "parents": [{"sha": parent}] if parent else [],
+            "message": message,
+        }
+        sha = self._store("commit", commit)
+        repo.refs[branch] = sha
+        return sha
+
+    def _commit_json(self, sha: str) -> dict:
+        return {"sha": sha, **self.objects[sha][1]}
+
+    def _resolve(self, repo: SimulatedRepo, ref: str | None) -> str | None:
+        """Returns the commit SHA ``ref`` (a branch, commit SHA or ``HEAD``) points at."""
+        if ref in (None, "HEAD"):
+            ref = repo.default_branch
+        if ref in repo.refs:
+            return repo.refs[ref]
+        if ref in self.objects and self.objects[ref][0] == "commit":
+            return ref
+        return None
+
+    def _files_at(self, repo: SimulatedRepo, ref: str | None) -> dict | None:
+        sha = self._resolve(repo, ref)
+        if sha is None:
+            return None
+        return self._tree_files(self.objects[sha][1]["tree"]["sha"])
+
+    def _repo(self, owner: str, name: str) -> SimulatedRepo | None:
+        return self.repos.get((owner.lower(), name.lower()))
+
+    # Endpoints. Each returns (status, body, headers).
+
+    @staticmethod
+    def _not_found():
+        return 404, {"message": "Not Found"}, {}
+
+    @staticmethod
+    def _empty():
+        return 409, {"message": "Git Repository is empty."}, {}
+
+    @staticmethod
+    def _raw(request: httpx.Request) -> bool:
+        return "raw" in request.headers.get("Accept", "")
+
+    def _search(self, request):
+        params = request.url.params
+        terms, qualifiers = [], []
+        for token in re.findall(r'"[^"]*"|\S+', params.get("q", "")):
+            if ":" in token and not token.startswith('"'):
+                qualifiers.append(token.split(":", 1))
+            else:
+                terms.append(token.strip('"').lower())
+        matches = [
+            repo
+            for repo in self.repos.values()
+            if not repo.metadata.get("private")
+            and all(self._matches_term(repo, term) for term in terms)
+            and all(self._matches_qualifier(repo, k, v) for k, v in qualifiers)
+        ]
+        matches.sort(key=lambda repo: -repo.metadata.get("stars", 0))
+        per_page = int(params.get("per_page", 30))
+        page = int(params.get("page", 1))
+        items = matches[(page - 1) * per_page : page * per_page]
+        return (
+            200,
+            {
+                "total_count": len(matches),
+                "incomplete_results": False,
+                "items": [repo.to_json() for repo in items],
+            },
+            {},
+        )
+
+    @staticmethod
+    def _matches_term(repo: SimulatedRepo, term: str) -> bool:
+        text = " ".join(
+            [repo.name, repo.metadata.get("description") or ""]
+            + list(repo.metadata.get("topics", ()))
+        ).lower()
+        return term in text
+
+    @staticmethod
+    def _matches_qualifier(repo: SimulatedRepo, key: str, value: str) -> bool:
+        if key == "language":
+            return (repo.metadata.get("language") or "").lower() == value.lower()
+        if key in ("topic", "topics"):
+            return value.lower() in repo.metadata.get("topics", ())
+        if key in ("user", "org"):
+            return repo.owner.lower() == value.lower()
+        if key == "stars":
+            bound = re.match(r"(>=|>|<=|<)?(\d+)", value)
+            if bound:
+                stars, limit = repo.metadata.get("stars", 0), int(bound.group(2))
+                return {
+                    ">": stars > limit,
+                    ">=": stars >= limit,
+                    "<": stars < limit,
+                    "<=": stars <= limit,
+                    None: stars == limit,
+                }[bound.group(1)]
+        # Dates, licenses and the like are not simulated and match everything.
+        return True
+
+    def _list_user_repos(self, request):
+        repos = [
+            repo.to_json() for repo in self.repos.values() if repo.owner == self.user
+        ]
+        return 200, repos, {}
+
+    def _create_repo(self, request):
+        data = json.loads(request.content)
+        if self._repo(self.user, data["name"]) is not None:
+            return 422, {"message": "name already exists on this account"}, {}
+        repo = self.add_repo(
+            self.user,
+            data["name"],
+            description=data.get("description"),
+            private=data.get("private", False),
+        )
+        return 201, repo.to_json(), {}
+
+    def _get_repo(self, request, owner, name):
+        repo = self._repo(owner, name)
+        if repo is None:
+            return self._not_found()
+        return 200, repo.to_json(), {}
+
+    def _get_branch(self, request, owner, name, branch):
+        repo = self._repo(owner, name)
+        if repo is None or branch not in repo.refs:
+            return self._not_found()
+        return 200, {"name": branch, "commit": self._commit_json(repo.refs[branch])}, {}
+
+    def _get_commit(self, request, owner, name, ref):
+        repo = self._repo(owner, name)
+        if repo is None:
+            return self._not_found()
+        if not repo.refs:
+            return self._empty()
+        sha = self._resolve(repo, ref)
+        if sha is None:
+            return 422, {"message": f"No commit found for SHA: {ref}"}, {}
+        if request.headers.get("Accept") == "application/vnd.github.sha":
+            return 200, sha, {"Content-Type": "application/vnd.github.sha"}
+        return 200, {"sha": sha, "commit": self.objects[sha][1]}, {}
+
+    def _get_readme(self, request, owner, name):
+        repo = self._repo(owner, name)
+        if repo is None:
+            return self._not_found()
+        files = self._files_at(repo, request.url.params.get("ref")) or {}
+        for path in files:
+            if "/" not in path and path.lower().startswith("readme"):
+                return self._file(request, path, files[path])
+        return self._not_found()
+
+    def _file(self, request, path: str, content: bytes):
+        if len(content) > self.max_file_bytes:
+            return 403, {"message": "This API returns blobs up to 100 MB in size."}, {}
+        if self._raw(request):
+            return 200, content, {"Content-Type": "application/vnd.github.raw"}
+        body = {
+            "type": "file",
+            "name": path.rpartition("/")[2],
+            "path": path,
+            "sha": _git_sha("blob", content),
+            "size": len(content),
+            "encoding": "base64",
+            "content": base64.b64encode(content).decode(),
+        }
+        return 200, body, {}
+
+    def _get_contents(self, request, owner, name, path):
+        repo = self._repo(owner, name)
+        if repo is None:
+            return self._not_found()
+        files = self._files_at(repo, request.url.params.get("ref"))
+        if files is None:
+            return self._not_found()
+        path = path.strip("/")
+        if path in files:
+            return self._file(request, path, files[path])
+        prefix = path + "/" if path else ""
+        listing = {}
+        for file_path, content in files.items():
+            if file_path.startswith(prefix):
+                head, _, rest = file_path[len(prefix) :].partition("/")
+                listing[head] = {
+                    "name": head,
+                    "path": prefix + head,
+                    "type": "dir" if rest else "file",
+                    "size": 0 if rest else len(content),
+                    "sha": None if rest else _git_sha("blob", content),
+                }
+        if not listing:
+            return self._not_found()
+        return 200, sorted(listing.values(), key=lambda entry: entry["name"]), {}
+
+    def _put_contents(self, request, owner, name, path):
+        repo = self._repo(owner, name)
+        if repo is None:
+            return self._not_found()
+        data = json.loads(request.content)
+        branch = data.get("branch") or repo.default_branch
+        files = dict(self._files_at(repo, branch) or {})
+        if branch not in repo.refs and repo.refs:
+            return 404, {"message": f"Branch {branch} not found"}, {}
+        exists = path in files
+        if exists and data.get("sha") != _git_sha("blob", files[path]):
+            return 409, {"message": f"{path} does not match {data.get('sha')}"}, {}
+        if not exists and data.get("sha"):
+            return 422, {"message": "sha wasn't supplied"}, {}
+        files[path] = base64.b64decode(data["content"])
+        sha = self._commit(repo, branch, files, data.get("message", ""))
+        body = {
+            "content": {"name": path.rpartition("/")[2], "path": path},
+            "commit": self._commit_json(sha),
+        }
+        return (200 if exists else 201), body, {}
+
+    def _get_tree(self, request, owner, name, tree_ish):
+        repo = self._repo(owner, name)
+        if repo is None:
+            return self._not_found()
+        if tree_ish in self.objects and self.objects[tree_ish][0] == "tree":
+            sha = tree_ish
+        else:
+            commit = self._resolve(repo, tree_ish)
+            if commit is None:
+                return self._not_found()
+            sha = self.objects[commit][1]["tree"]["sha"]
+        if not request.url.params.get("recursive"):
+            return (
+                200,
+                {"sha": sha, "tree": self.objects[sha][1], "truncated": False},
+                {},
+            )
+        entries = self._flatten(sha)
+        truncated = len(entries) > self.max_tree_entries
+        body = {
+            "sha": sha,
+            "tree": entries[: self.max_tree_entries],
+            "truncated": truncated,
+        }
+        return 200, body, {}
+
+    def _flatten(self, tree_sha: str, prefix: str = "") -> list:
+        entries = []
+        for entry in self.objects[tree_sha][1]:
+            entries.append({**entry, "path": prefix + entry["path"]})
+            if entry["type"] == "tree":
+                entries.extend(
+                    self._flatten(entry["sha"], prefix + entry["path"] + "/")
+                )
+        return entries
+
+    def _post_tree(self, request, owner, name):
+        if self._repo(owner, name) is None:
+            return self._not_found()
+        data = json.loads(request.content)
+        base = data.get("base_tree")
+        files = dict(self._tree_files(base)) if base in self.objects else {}
+        for entry in data["tree"]:
+            if "content" in entry:
+                files[entry["path"]] = entry["content"].encode()
+            elif entry.get("sha") is None:
+                files.pop(entry["path"], None)
+            else:
+                files[entry["path"]] = self.objects[entry["sha"]][1]
+        sha = self._write_tree(files)
+        return 201, {"sha": sha, "tree": self._flatten(sha), "truncated": False}, {}
+
+    def _get_tarball(self, request, owner, name, ref):
+        repo = self._repo(owner, name)
+        if repo is None:
+            return self._not_found()
+        sha = self._resolve(repo, ref or None)
+        if sha is None:
+            return self._not_found()
+        location = f"https://codeload.github.com/{owner}/{name}/legacy.tar.gz/{sha}"
+        return 302, "", {"Location": location}
+
+    def _get_codeload(self, request, owner, name, sha):
+        repo = self._repo(owner, name)
+        if repo is None or sha not in self.objects:
+            return self._not_found()
+        # Like GitHub's, the archive holds one directory named after the repository and commit.
+        prefix = f"{owner}-{name}-{sha[:7]}"
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+            root = tarfile.TarInfo(prefix)
+            root.type = tarfile.DIRTYPE
+            tar.addfile(root)
+            for entry in self._flatten(self.objects[sha][1]["tree"]["sha"]):
+                info = tarfile.TarInfo(f"{prefix}/{entry['path']}")
+                if entry["type"] == "tree":
+                    info.type = tarfile.DIRTYPE
+                    tar.addfile(info)
+                else:
+                    content = self.objects[entry["sha"]][1]
+                    info.size = len(content)
+                    tar.addfile(info, io.BytesIO(content))
+        return 200, buffer.getvalue(), {"Content-Type": "application/x-gzip"}
+
+    def _get_blob(self, request, owner, name, sha):
+        if self._repo(owner, name) is None or sha not in self.objects:
+            return self._not_found()
+        content = self.objects[sha][1]
+        if self._raw(request):
+            return 200, content, {"Content-Type": "application/vnd.github.raw"}
+        body = {
+            "sha": sha,
+            "size": len(content),
+            "encoding": "base64",
+            "content": base64.b64encode(content).decode(),
+        }
+        return 200, body, {}
+
+    def _post_blob(self, request, owner, name):
+        if self._repo(owner, name) is None:
+            return self._not_found()
+        data = json.loads(request.content)
+        content = data["content"]
+        if data.get("encoding") == "base64":
+            content = base64.b64decode(content)
+        else:
+            content = content.encode()
+        return 201, {"sha": self._store("blob", content)}, {}
+
+    def _get_git_commit(self, request, owner, name, sha):
+        if self._repo(owner, name) is None:
+            return self._not_found()
+        if sha not in self.objects or self.objects[sha][0] != "commit":
+            return self._not_found()
+        return 200, self._commit_json(sha), {}
+
+    def _post_commit(self, request, owner, name):
+        if self._repo(owner, name) is None:
+            return self._not_found()
+        data = json.loads(request.content)
+        commit = {
+            "tree": {"sha": data["tree"]},
+            "parents": [{"sha": parent} for parent in data.get("parents", [])],
+            "message": data.get("message", ""),
+        }
+        return 201, self._commit_json(self._store("commit", commit)), {}
+
+    def _get_ref(self, request, owner, name, branch):
+        repo = self._repo(owner, name)
+        if repo is None:
+            return self._not_found()
+        if not repo.refs:
+            return self._empty()
+        if branch not in repo.refs:
+            return self._not_found()
+        body = {
+            "ref": f"refs/heads/{branch}",
+            "object": {"sha": repo.refs[branch], "type": "commit"},
+        }
+        return 200, body, {}
+
+    def _update_ref(self, request, owner, name, branch):
+        repo = self._repo(owner, name)
+        if repo is None or branch not in repo.refs:
+            return self._not_found()
+        sha = json.loads(request.content)["sha"]
+        if sha not in self.objects:
+            return 422, {"message": "Object does not exist"}, {}
+        repo.refs[branch] = sha
+        body = {"ref": f"refs/heads/{branch}", "object": {"sha": sha, "type": "commit"}}
+        return 200, body, {}
+
+
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return json.dumps(content)
+
+
+def tool_calls(*calls: tuple[str, dict]) -> AIMessage:
+    """Returns an agent turn calling each ``(tool name, arguments)`` of ``calls``."""
+    return AIMessage(
+        content="",
+        tool_calls=[
+            {"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}
+            for name, args in calls
+        ],
+    )
+
+
+def handoff(to_agent: str, payload: str) -> AIMessage:
+    """Returns an agent turn handing the conversation to ``to_agent``."""
+    return tool_calls(("handoff", {"to_agent": to_agent, "payload": payload}))
+
+
+def tool_results(messages) -> list[str]:
+    """Returns the text of the tool results at the end of ``messages``."""
+    results = []
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            break
+        results.append(_text(message.content))
+    return results[::-1]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """A chat model that plays back ``turns`` in order instead of calling a model.
+
+    Each turn is an ``AIMessage``, a string answer, or a function of the prompt messages returning
+    either, for turns that depend on tool results. Replies report token usage estimated at four
+    characters per token, and take ``latency`` seconds.
+    """
+
+    turns: list
+    latency: float = 0.0
+    model: str = "scripted"
+    position: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _reply(self, messages) -> ChatResult:
+        if self.position >= len(self.turns):
+            raise IndexError(f"All {len(self.turns)} scripted turns have been played")
+        turn = self.turns[self.position]
+        self.position += 1
+        if callable(turn):
+            turn = turn(messages)
+        if isinstance(turn, str):
+            turn = AIMessage(content=turn)
+        output = len(_text(turn.content)) + len(json.dumps(turn.tool_calls))
+        prompt = sum(len(_text(message.content)) for message in messages)
+        # A fresh message each time, so replaying a turn never overwrites an earlier one.
+        message = AIMessage(
+            content=turn.content,
+            tool_calls=turn.tool_calls,
+            usage_metadata={
+                "input_tokens": prompt // 4,
+                "output_tokens": output // 4,
+                "total_tokens": (prompt + output) // 4,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
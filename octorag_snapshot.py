@@ -0,0 +1,289 @@
+"""Local snapshots of whole repositories, for agents that read many files of one repository.
+
+Exploring a dependency takes a tree listing and then many file reads, one API request each. In
+snapshot mode, ``get_repo_tree`` instead downloads the repository's tarball at the commit it
+pinned, once, and extracts it to disk. The tree listing, and the file and README reads pinned to
+that commit, are then answered from the extracted files without any request. Snapshots are keyed
+by commit SHA, so they never go stale, and the least recently used are deleted once together they
+take more than their disk budget. Repositories too large for a snapshot are read through the API.
+
+- ``OCTORAG_SNAPSHOTS``: Set to ``1`` to enable snapshot mode. Default disabled.
+- ``OCTORAG_SNAPSHOT_DIR``: Where to keep snapshots. Default ``snapshots`` in the cache directory.
+- ``OCTORAG_SNAPSHOT_MAX_BYTES``: Maximum total size of extracted snapshots. Default 1 GiB.
+- ``OCTORAG_SNAPSHOT_MAX_REPO_BYTES``: Largest repository, extracted, kept as a snapshot. Default 100 MiB.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+
+from octorag_github import agithub_stream, pinned_ref
+from octorag_tracing import span
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_MAX_REPO_BYTES = 100 * 1024 * 1024
+
+
+class SnapshotTooLarge(Exception):
+    pass
+
+
+class Snapshot:
+    """The files of one repository at one commit, extracted under ``directory/files``."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.root = os.path.realpath(os.path.join(directory, "files"))
+
+    def tree(self) -> list[str]:
+        """Returns every path in the repository, in the order of a recursive Git tree listing."""
+        with open(os.path.join(self.directory, "tree.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def read(self, path: str) -> bytes | None:
+        """Returns the contents of the file at ``path``, or None if there is no such file."""
+        full_path = os.path.realpath(os.path.join(self.root, path.strip("/")))
+        # Paths come from the model, and must not lead out of the snapshot.
+        if os.path.commonpath([self.root, full_path]) != self.root:
+            return None
+        try:
+            with open(full_path, "rb") as f:
+                return f.read()
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            return None
+
+
+class SnapshotStore:
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_repo_bytes: int = DEFAULT_MAX_REPO_BYTES,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_repo_bytes = max_repo_bytes
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "downloads": 0,
+            "bytes_downloaded": 0,
+            "too_large": 0,
+            "failures": 0,
+            "evictions": 0,
+        }
+        self._lock = threading.Lock()
+        # (owner, repo, sha) -> the task downloading that snapshot.
+        self._pending = {}
+        # Commits found too large, so that they are not downloaded again.
+        self._too_large = set()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _key(owner: str, repo: str, sha: str) -> tuple:
+        return owner.lower(), repo.lower(), sha
+
+    def _path(self, key: tuple) -> str:
+        return os.path.join(self.directory, *key)
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def get(self, owner: str, repo: str, sha: str) -> Snapshot | None:
+        """Returns the snapshot of ``owner/repo`` at commit ``sha`` if it is on disk."""
+        path = self._path(self._key(owner, repo, sha))
+        try:
+            # The modification time of meta.json is the snapshot's last access, for eviction.
+            os.utime(os.path.join(path, "meta.json"))
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return Snapshot(path)
+
+    async def aopen(self, owner: str, repo: str, sha: str) -> Snapshot | None:
+        """Returns the snapshot of ``owner/repo`` at commit ``sha``, downloading it first if
+        needed. Returns None if the repository is too large or the download failed."""
+        key = self._key(owner, repo, sha)
+        snapshot = self.get(owner, repo, sha)
+        if snapshot is not None or key in self._too_large:
+            return snapshot
+        # Concurrent callers wait for the same download.
+        task = self._pending.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._afetch(key))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        try:
+            return await asyncio.shield(task)
+        except SnapshotTooLarge:
+            self._too_large.add(key)
+            self._count("too_large")
+        except Exception:
+            # Rate limits, network and disk errors alike: the repository is read through the API.
+            self._count("failures")
+        return None
+
+    async def _afetch(self, key: tuple) -> Snapshot:
+        owner, repo, sha = key
+        with span(
+            "snapshot", **{"octorag.snapshot.repository": f"{owner}/{repo}"}
+        ) as current:
+            fd, archive = tempfile.mkstemp(dir=self.directory, suffix=".tar.gz")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    size = await self._adownload(
+                        f"/repos/{owner}/{repo}/tarball/{sha}", f
+                    )
+                self._count("downloads")
+                self._count("bytes_downloaded", size)
+                current.set(**{"http.response.body.size": size})
+                # Extraction is disk-bound, so it is kept off the event loop.
+                await asyncio.to_thread(self._extract, archive, self._path(key))
+            finally:
+                os.remove(archive)
+            await asyncio.to_thread(self._evict, self._path(key))
+            return Snapshot(self._path(key))
+
+    async def _adownload(self, url: str, file) -> int:
+        size = 0
+        # GitHub redirects to codeload.github.com, which serves the tarball.
+        async with agithub_stream("GET", url, follow_redirects=True) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > self.max_repo_bytes:
+                    raise SnapshotTooLarge(url)
+                file.write(chunk)
+        return size
+
+    def _extract(self, archive: str, target: str):
+        staging = tempfile.mkdtemp(dir=self.directory, prefix=".extract-")
+        try:
+            files = os.path.join(staging, "files")
+            paths = []
+            size = 0
+            with tarfile.open(archive, "r:gz") as tar:
+                for member in tar:
+                    # Every path sits under a directory named after the repository and commit.
+                    _, _, path = member.name.partition("/")
+                    path = path.rstrip("/")
+                    if not path or not (
+                        member.isfile() or member.isdir() or member.issym()
+                    ):
+                        continue
+                    size += member.size
+                    if size > self.max_repo_bytes:
+                        raise SnapshotTooLarge(target)
+                    member.name = path
+                    try:
+                        tar.extract(member, files, filter="data")
+                    except tarfile.FilterError:
+                        # Links out of the repository are listed, but not followed.
+                        pass
+                    paths.append(path)
+            with open(os.path.join(staging, "tree.json"), "w", encoding="utf-8") as f:
+                json.dump(paths, f)
+            with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"size": size}, f)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.rename(staging, target)
+            except OSError:
+                # Another process extracted the same commit first.
+                if not os.path.exists(os.path.join(target, "meta.json")):
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _snapshots(self) -> list[tuple[float, int, str]]:
+        snapshots = []
+        for meta in glob.glob(os.path.join(self.directory, "*", "*", "*", "meta.json")):
+            try:
+                with open(meta, encoding="utf-8") as f:
+                    size = json.load(f)["size"]
+                snapshots.append((os.path.getmtime(meta), size, os.path.dirname(meta)))
+            except (OSError, ValueError, KeyError):
+                continue
+        return snapshots
+
+    def _evict(self, keep: str):
+        snapshots = sorted(self._snapshots())
+        total = sum(size for _, size, _ in snapshots)
+        for _, size, path in snapshots:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self._count("evictions")
+
+    def stats(self) -> dict:
+        snapshots = self._snapshots()
+        with self._lock:
+            stats = dict(self.counters)
+        stats["snapshots"] = len(snapshots)
+        stats["bytes"] = sum(size for _, size, _ in snapshots)
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+_store = None
+_store_disabled = False
+
+
+def get_snapshots() -> SnapshotStore | None:
+    """Returns the process-wide snapshot store configured from the environment, or None if
+    snapshot mode is off."""
+    global _store, _store_disabled
+    if _store is not None or _store_disabled:
+        return _store
+    if os.getenv("OCTORAG_SNAPSHOTS", "0").lower() not in ("1", "true", "yes"):
+        _store_disabled = True
+        return None
+    directory = os.getenv("OCTORAG_SNAPSHOT_DIR") or os.path.join(
+        os.getenv("OCTORAG_CACHE_DIR")
+        or os.path.join(os.path.expanduser("~"), ".cache", "octorag"),
+        "snapshots",
+    )
+    _store = SnapshotStore(
+        directory,
+        max_bytes=int(os.getenv("OCTORAG_SNAPSHOT_MAX_BYTES") or DEFAULT_MAX_BYTES),
+        max_repo_bytes=int(
+            os.getenv("OCTORAG_SNAPSHOT_MAX_REPO_BYTES") or DEFAULT_MAX_REPO_BYTES
+        ),
+    )
+    return _store
+
+
+def set_snapshots(store: SnapshotStore | None):
+    """Replaces the process-wide snapshot store. Passing None turns snapshot mode off."""
+    global _store, _store_disabled
+    _store = store
+    _store_disabled = store is None
+
+
+def snapshot_file(owner: str, repo: str, path: str) -> bytes | None:
+    """Returns a file from the snapshot of the commit ``owner/repo`` is pinned to, or None if there
+    is no such snapshot or file."""
+    store = get_snapshots()
+    sha = pinned_ref(owner, repo) if store is not None else None
+    if sha is None:
+        return None
+    snapshot = store.get(owner, repo, sha)
+    return snapshot.read(path) if snapshot is not None else None
+
+
+def snapshot_stats() -> dict:
+    """Returns hit, download and eviction counters of the snapshot store."""
+    store = get_snapshots()
+    if store is None:
+        return {"enabled": False}
+    return {"enabled": True, **store.stats()}
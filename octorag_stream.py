@@ -0,0 +1,90 @@
+"""Turns LangGraph stream chunks into the events yielded by ``OctoRAG.stream`` and ``OctoRAG_MCP.astream``.
+
+Graphs are streamed with ``STREAM_MODE``: model tokens arrive in ``messages`` mode as they are
+generated, and tool calls are read from the ``updates`` of the nodes that make and run them.
+Every event is a dict with a ``type`` and the ``agent`` it came from (``None`` for the single
+local agent):
+
+- ``token``: ``text`` written by the model.
+- ``tool_start``: the model called tool ``name`` with ``args``, which is about to run. ``id`` matches the ``tool_end`` event.
+- ``tool_end``: tool ``name`` finished with ``output``. ``status`` is ``"success"`` or ``"error"``.
+"""
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+STREAM_MODE = ["messages", "updates"]
+
+
+def text_of(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(
+        item.get("text", "")
+        for item in content
+        if isinstance(item, dict) and item.get("type", "text") == "text"
+    )
+
+
+def to_events(mode: str, chunk, agents: dict | None = None) -> list[dict]:
+    """Returns the events in one chunk of a graph streamed with ``STREAM_MODE``.
+
+    ``agents`` maps the names of the nodes to report on to the names of their agents. Other nodes,
+    like the orchestrator that only routes between agents, are left out. Without it, every node is
+    reported with no agent.
+    """
+
+    def agent_of(node):
+        return None if agents is None else agents[node]
+
+    def reported(node):
+        return agents is None or node in agents
+
+    events = []
+    if mode == "messages":
+        message, metadata = chunk
+        node = metadata.get("langgraph_node")
+        # Tool outputs are reported by the updates of the node that ran them.
+        if isinstance(message, AIMessage) and reported(node):
+            text = text_of(message.content)
+            if text:
+                events.append(
+                    {
+                        "type": "token",
+                        "agent": agent_of(node),
+                        "text": text,
+                    }
+                )
+    elif mode == "updates":
+        for node, update in chunk.items():
+            if not isinstance(update, dict) or not reported(node):
+                continue
+            agent = agent_of(node)
+            messages = update.get("messages") or []
+            # Model nodes may also rewrite earlier tool outputs and handoff calls (see
+            # octorag_memory). Only their last message, the model's answer, is new.
+            if messages and isinstance(messages[-1], AIMessage):
+                messages = messages[-1:]
+            for message in messages:
+                if isinstance(message, AIMessage):
+                    for call in message.tool_calls:
+                        events.append(
+                            {
+                                "type": "tool_start",
+                                "agent": agent,
+                                "name": call["name"],
+                                "args": call["args"],
+                                "id": call["id"],
+                            }
+                        )
+                elif isinstance(message, ToolMessage):
+                    events.append(
+                        {
+                            "type": "tool_end",
+                            "agent": agent,
+                            "name": message.name,
+                            "id": message.tool_call_id,
+                            "output": text_of(message.content),
+                            "status": message.status,
+                        }
+                    )
+    return events
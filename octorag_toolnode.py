@@ -0,0 +1,110 @@
+"""Runs the tool calls an agent makes in one turn concurrently, except those that write to GitHub.
+
+When an agent calls several tools at once, like ``get_readme`` on five repositories, the read-only
+calls run concurrently, at most ``OCTORAG_TOOL_CONCURRENCY`` at a time (default 4). Calls to the
+tools in ``WRITE_TOOLS`` depend on each other, such as ``create_file`` on a repository the same
+turn's ``create_repo`` creates, so they run one after another in the order the agent made them,
+alongside the reads. Results are returned in call order either way.
+
+Each call is traced as an ``execute_tool`` span (see ``octorag_tracing``).
+
+``ConcurrentToolNode`` overrides private methods of LangGraph's ``ToolNode``, whose signatures
+change between releases, so ``langgraph-prebuilt`` is pinned in ``requirements.txt``. Check these
+overrides against the new ``ToolNode`` before upgrading it.
+"""
+
+import asyncio
+import os
+
+from langchain_core.runnables.config import get_config_list, get_executor_for_config
+from langgraph.prebuilt import ToolNode
+
+from octorag_tracing import span
+
+WRITE_TOOLS = frozenset(
+    {"create_repo", "create_file", "append_to_file", "upload_files"}
+)
+
+
+def tool_concurrency() -> int:
+    return int(os.getenv("OCTORAG_TOOL_CONCURRENCY") or 4)
+
+
+class ConcurrentToolNode(ToolNode):
+    def __init__(self, tools, *, max_concurrency: int | None = None, **kwargs):
+        super().__init__(tools, **kwargs)
+        self.max_concurrency = max_concurrency or tool_concurrency()
+
+    @staticmethod
+    def _split(tool_calls) -> tuple[list[int], list[int]]:
+        reads = [
+            i for i, call in enumerate(tool_calls) if call["name"] not in WRITE_TOOLS
+        ]
+        writes = [i for i, call in enumerate(tool_calls) if call["name"] in WRITE_TOOLS]
+        return reads, writes
+
+    @staticmethod
+    def _tool_span(call):
+        return span(
+            f"execute_tool {call['name']}",
+            **{"gen_ai.tool.name": call["name"], "gen_ai.tool.call.id": call["id"]},
+        )
+
+    @staticmethod
+    def _record_output(current, output):
+        if getattr(output, "status", None) == "error":
+            current.fail(str(output.content)[:200])
+
+    def _run_one(self, call, input_type, config):
+        with self._tool_span(call) as current:
+            output = super()._run_one(call, input_type, config)
+            self._record_output(current, output)
+            return output
+
+    async def _arun_one(self, call, input_type, config):
+        with self._tool_span(call) as current:
+            output = await super()._arun_one(call, input_type, config)
+            self._record_output(current, output)
+            return output
+
+    def _func(self, input, config, *, store):
+        tool_calls, input_type = self._parse_input(input, store)
+        config_list = get_config_list(config, len(tool_calls))
+        reads, writes = self._split(tool_calls)
+        outputs = [None] * len(tool_calls)
+
+        def run(i):
+            outputs[i] = self._run_one(tool_calls[i], input_type, config_list[i])
+
+        def run_writes():
+            for i in writes:
+                run(i)
+
+        # One worker more than the cap, for the writes.
+        with get_executor_for_config(
+            {**config, "max_concurrency": self.max_concurrency + 1}
+        ) as executor:
+            futures = [executor.submit(run_writes)]
+            futures += [executor.submit(run, i) for i in reads]
+            for future in futures:
+                future.result()
+
+        return self._combine_tool_outputs(outputs, input_type)
+
+    async def _afunc(self, input, config, *, store):
+        tool_calls, input_type = self._parse_input(input, store)
+        reads, writes = self._split(tool_calls)
+        outputs = [None] * len(tool_calls)
+        slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_read(i):
+            async with slots:
+                outputs[i] = await self._arun_one(tool_calls[i], input_type, config)
+
+        async def run_writes():
+            for i in writes:
+                outputs[i] = await self._arun_one(tool_calls[i], input_type, config)
+
+        await asyncio.gather(run_writes(), *(run_read(i) for i in reads))
+
+        return self._combine_tool_outputs(outputs, input_type)
@@ -0,0 +1,272 @@
+"""Tracing spans for queries, agent turns, model calls, tool calls and GitHub requests.
+
+Tracing is off unless one of the variables below is set, and costs nothing then. Spans nest the
+way the work does: a query contains agent turns, a turn contains its model call, and a tool call
+contains the GitHub requests it made. The MCP server traces its own tool calls and requests.
+
+Each finished span is appended to the trace file as one line of OpenTelemetry JSON (an OTLP
+``ExportTraceServiceRequest`` holding that span), which the OpenTelemetry Collector's
+``otlpjsonfile`` receiver and most trace viewers can import. The client and the server can share
+one file. ``python octorag_tracing.py trace.jsonl`` prints where the time went, per span name.
+
+- ``OCTORAG_TRACE_FILE``: File spans are appended to.
+- ``OCTORAG_TRACE``: Set to ``1`` to keep recent spans in memory only, for ``finished_spans``.
+- ``OCTORAG_TRACE_SERVICE``: ``service.name`` of the spans. Default ``octorag``.
+"""
+
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+
+# Spans kept in memory, most recent last.
+MAX_FINISHED_SPANS = 10000
+
+_overrides = {}
+_finished = collections.deque(maxlen=MAX_FINISHED_SPANS)
+_write_lock = threading.Lock()
+_current = contextvars.ContextVar("octorag_span", default=None)
+
+
+def configure_tracing(
+    path: str | None = None,
+    enabled: bool | None = None,
+    service_name: str | None = None,
+):
+    """Overrides the environment variables above for this process."""
+    for key, value in (
+        ("path", path),
+        ("enabled", enabled),
+        ("service_name", service_name),
+    ):
+        if value is not None:
+            _overrides[key] = value
+
+
+def trace_file() -> str | None:
+    return _overrides.get("path") or os.getenv("OCTORAG_TRACE_FILE") or None
+
+
+def tracing_enabled() -> bool:
+    if "enabled" in _overrides:
+        return _overrides["enabled"]
+    return bool(trace_file()) or os.getenv("OCTORAG_TRACE", "0").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+
+
+def service_name() -> str:
+    return (
+        _overrides.get("service_name")
+        or os.getenv("OCTORAG_TRACE_SERVICE")
+        or "octorag"
+    )
+
+
+class Span:
+    def __init__(self, name: str, attributes: dict, parent: "Span | None"):
+        self.name = name
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        """Sets attributes; names with dots can be passed as ``**{"http.method": ...}``."""
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    def fail(self, message: str):
+        self.error = message
+
+    @property
+    def duration(self) -> float:
+        """Seconds the span took."""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoSpan:
+    """Stands in for a span while tracing is off."""
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, message: str):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        # OTLP JSON encodes 64-bit integers as strings.
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def to_otlp(spans) -> dict:
+    """Returns ``spans`` as one OTLP JSON ``ExportTraceServiceRequest``."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [_otlp_attribute("service.name", service_name())]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "octorag"},
+                        "spans": [span.to_otlp() for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def _finish(span: Span):
+    span.end_ns = time.time_ns()
+    _finished.append(span)
+    path = trace_file()
+    if path:
+        line = json.dumps(to_otlp([span]), separators=(",", ":")) + "\n"
+        with _write_lock, open(path, "a", encoding="utf-8") as file:
+            file.write(line)
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """Times the block as a span, a child of the span around it. Exceptions mark it failed."""
+    if not tracing_enabled():
+        yield _NO_SPAN
+        return
+    current = Span(name, attributes, _current.get())
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current.reset(token)
+        _finish(current)
+
+
+def traced_tool(function):
+    """Wraps an async tool function in an ``execute_tool`` span."""
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        with span(
+            f"execute_tool {function.__name__}",
+            **{"gen_ai.tool.name": function.__name__},
+        ):
+            return await function(*args, **kwargs)
+
+    return wrapper
+
+
+def model_name(model) -> str | None:
+    """Returns the name of a chat model, bound to tools or not."""
+    model = getattr(model, "bound", model)
+    return getattr(model, "model", None) or getattr(model, "model_name", None)
+
+
+def chat_span(model, **attributes):
+    """Returns the span of one call to ``model``."""
+    name = model_name(model)
+    return span(
+        f"chat {name}" if name else "chat",
+        **{"gen_ai.request.model": name},
+        **attributes,
+    )
+
+
+def record_model_usage(current, message):
+    """Sets the token counts of the model call that produced ``message`` on ``current``."""
+    metadata = getattr(message, "usage_metadata", None)
+    if not metadata:
+        return
+    details = metadata.get("input_token_details") or {}
+    current.set(
+        **{
+            "gen_ai.usage.input_tokens": metadata.get("input_tokens"),
+            "gen_ai.usage.output_tokens": metadata.get("output_tokens"),
+            "gen_ai.usage.cache_read_input_tokens": details.get("cache_read"),
+            "gen_ai.usage.cache_creation_input_tokens": details.get("cache_creation"),
+        }
+    )
+
+
+def finished_spans() -> list[Span]:
+    """Returns the spans finished in this process, up to ``MAX_FINISHED_SPANS`` most recent."""
+    return list(_finished)
+
+
+def clear_spans():
+    _finished.clear()
+
+
+def summarize(path: str) -> list[tuple[str, int, float, float]]:
+    """Reads a trace file and returns (span name, count, total seconds, longest seconds) per
+    span name, slowest total first."""
+    totals = {}
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            for resource in json.loads(line)["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    for item in scope["spans"]:
+                        seconds = (
+                            int(item["endTimeUnixNano"])
+                            - int(item["startTimeUnixNano"])
+                        ) / 1e9
+                        count, total, longest = totals.get(item["name"], (0, 0.0, 0.0))
+                        totals[item["name"]] = (
+                            count + 1,
+                            total + seconds,
+                            max(longest, seconds),
+                        )
+    return sorted(
+        ((name, *values) for name, values in totals.items()),
+        key=lambda row: row[2],
+        reverse=True,
+    )
+
+
+if __name__ == "__main__":
+    print(f"{'span':<50} {'count':>6} {'total s':>9} {'max s':>8}")
+    for name, count, total, longest in summarize(sys.argv[1]):
+        print(f"{name[:50]:<50} {count:>6} {total:>9.2f} {longest:>8.2f}")
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+from octorag_embeddings import HashingVectorizer, RepoIndex
+
+
+def repo(i):
+    return {"name": f"repo{i}", "full_name": f"o/repo{i}", "description": f"thing {i}"}
+
+
+def names(index):
+    return [key.partition("@")[0] for key in index.keys]
+
+
+def test_index_limit():
+    vectorizer = HashingVectorizer()
+    expected = vectorizer.encode([f"repo{i} thing {i} " for i in range(20)])
+    directory = tempfile.mkdtemp(prefix="octorag-test-")
+    index = RepoIndex(directory, vectorizer, max_vectors=10)
+
+    # Vectors are only dropped once the index is full.
+    for batch in ([0, 1, 2], [3, 4, 5], [6], [7, 8]):
+        vectors = index.vectors_for([repo(i) for i in batch])
+        assert np.allclose(vectors, expected[batch], atol=1e-6)
+    assert len(index.keys) == 9
+
+    # The least recently used go first; repo0 was just used again.
+    index.vectors_for([repo(0)])
+    index.vectors_for([repo(i) for i in (9, 10, 11)])
+    assert len(index.keys) == 10
+    assert names(index)[:2] == ["o/repo3", "o/repo4"]
+    assert "o/repo1" not in names(index) and "o/repo0" in names(index)
+    assert len(index.vectors) == 10
+
+    # A reopened index has the same vectors.
+    reopened = RepoIndex(directory, vectorizer, max_vectors=10)
+    assert names(reopened) == names(index)
+    for i in (0, 3, 9, 11):
+        assert np.allclose(reopened.vectors_for([repo(i)]), expected[[i]], atol=1e-6)
+
+    # A batch larger than the limit is still answered in full.
+    vectors = RepoIndex(None, vectorizer, max_vectors=5).vectors_for(
+        [repo(i) for i in range(8)]
+    )
+    assert np.allclose(vectors, expected[:8], atol=1e-6)
+
+
+if __name__ == "__main__":
+    test_index_limit()
+    print("octorag_embeddings: all checks passed")
@@ -0,0 +1,104 @@
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# The agents are replaced below, so no real key is needed to construct them.
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages.ai import AIMessage
+from langchain_mcp_adapters.tools import load_mcp_tools
+
+from octorag_mcp_client import OctoRAG_MCP
+
+QUERIES = 20
+PORT = 8000
+
+
+class FakeAgent(GenericFakeChatModel):
+    # Answers instantly, so only graph and MCP overhead is measured.
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def fake_agents(model: OctoRAG_MCP):
+    for i in range(1, 5):
+        agent = FakeAgent(
+            messages=itertools.repeat(AIMessage(content="Nothing to do. <<END>>"))
+        )
+        setattr(model, f"agent{i}_raw", agent)
+
+
+async def run(graph, query: str, thread: int):
+    config = {"configurable": {"thread_id": str(thread)}}
+    async for _ in graph.astream(
+        {"messages": [{"role": "user", "content": query}]}, config
+    ):
+        pass
+
+
+async def rebuilt_per_query(model: OctoRAG_MCP, thread: int):
+    # What every query did before: connect, list tools, build and compile the graph.
+    async with model.client.session("octorag-mcp") as session:
+        tools = await load_mcp_tools(session)
+        graph = model.create_graph(tools)
+        await run(graph, "hello", thread)
+
+
+async def compiled_once(model: OctoRAG_MCP, thread: int):
+    await model.start()
+    await run(model.graph, "hello", thread)
+
+
+async def measure(name: str, step):
+    model = OctoRAG_MCP(fast_path=False)
+    fake_agents(model)
+    start = time.perf_counter()
+    await step(model, 0)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for thread in range(1, QUERIES + 1):
+        await step(model, thread)
+    per_query = (time.perf_counter() - start) / QUERIES
+    await model.aclose()
+    print(
+        f"{name}: first query {first * 1000:.1f} ms, then {per_query * 1000:.1f} ms per query"
+    )
+
+
+def wait_for_server(timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("localhost", PORT), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError("octorag_mcp_server did not start")
+
+
+def main():
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(os.path.dirname(__file__), "..", "octorag_mcp_server.py"),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server()
+        asyncio.run(measure("Rebuilt per query", rebuilt_per_query))
+        asyncio.run(measure("Compiled once", compiled_once))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+main()
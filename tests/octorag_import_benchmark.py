@@ -0,0 +1,79 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+RUNS = 5
+
+# What a short-lived process pays before it can do any work.
+STATEMENTS = [
+    ("import octorag", "import octorag"),
+    ("import octorag_mcp_client", "import octorag_mcp_client"),
+    ("import octorag_mcp_server", "import octorag_mcp_server"),
+    ("import octorag_tools", "import octorag_tools"),
+    ("OctoRAG()", "import octorag; octorag.OctoRAG()"),
+    (
+        "create_server()",
+        "import octorag_mcp_server; octorag_mcp_server.create_server()",
+    ),
+]
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """Returns (self, cumulative) microseconds per module from ``python -X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+
+def measure(statement: str) -> tuple[float, float, dict]:
+    """Runs ``statement`` in a fresh interpreter; returns its wall seconds, the seconds spent
+    importing, and the import times of every module."""
+    env = {
+        **os.environ,
+        "ANTHROPIC_API_KEY": os.getenv("ANTHROPIC_API_KEY", "benchmark"),
+    }
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = time.perf_counter() - start
+    modules = parse_importtime(result.stderr)
+    imports = sum(own for own, _ in modules.values()) / 1e6
+    return wall, imports, modules
+
+
+def by_package(modules: dict) -> list[tuple[int, str]]:
+    """Returns the microseconds spent importing each top-level package, slowest first."""
+    totals = {}
+    for name, (own, _) in modules.items():
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + own
+    return sorted(((own, package) for package, own in totals.items()), reverse=True)
+
+
+def main():
+    print(f"{'statement':<28} {'wall s':>7} {'import s':>9}  slowest packages (ms)")
+    for label, statement in STATEMENTS:
+        runs = [measure(statement) for _ in range(RUNS)]
+        wall = statistics.median(run[0] for run in runs)
+        imports = statistics.median(run[1] for run in runs)
+        top = ", ".join(
+            f"{package} {own / 1000:.0f}"
+            for own, package in by_package(runs[-1][2])[:3]
+        )
+        print(f"{label:<28} {wall:>7.2f} {imports:>9.2f}  {top}")
+
+
+main()
@@ -0,0 +1,396 @@
+import asyncio
+import logging
+import os
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Every model is scripted below, so no real key is needed to construct them.
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+
+from langchain_core.messages import ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+import octorag_github
+from octorag import OctoRAG
+from octorag_cache import ResponseCache, set_cache
+from octorag_mcp_client import OctoRAG_MCP
+from octorag_ratelimit import RateLimitScheduler, set_scheduler
+from octorag_snapshot import SnapshotStore, set_snapshots
+from octorag_simulator import (
+    GitHubSimulator,
+    ScriptedChatModel,
+    handoff,
+    tool_calls,
+    tool_results,
+)
+
+# Round trip to api.github.com as measured from a typical laptop.
+LATENCY = 0.08
+JITTER = 0.04
+USER = "octorag-bench"
+
+RETRIEVER = "Repository Retriever"
+CURATOR = "Repository Curator"
+GENERATOR = "Code Generator"
+POSTER = "Code Poster"
+
+SPHERE = """use raytrace_lib::{raytrace, Scene, Sphere};
+
+fn main() {
+    let scene = Scene::new().with(Sphere::new([0.0, 0.0, -3.0], 1.0));
+    raytrace(&scene, 640, 480).save("sphere.png").unwrap();
+}
+"""
+
+
+def github() -> GitHubSimulator:
+    simulator = GitHubSimulator(
+        user=USER, latency=LATENCY, jitter=JITTER, max_tree_entries=200
+    )
+    simulator.add_repo(
+        "ray",
+        "raytrace-lib",
+        {
+            "README.md": "# raytrace-lib\n\nEmbeddable raytracer.\n\n## Installation\n\n"
+            + "cargo add raytrace-lib\n\n## Usage\n\n"
+            + "Call `raytrace(&scene, width, height)`.\n" * 20,
+            "Cargo.toml": '[package]\nname = "raytrace-lib"\n',
+            "src/lib.rs": "pub mod scene;\npub fn raytrace() {}\n" * 40,
+            "src/scene.rs": "pub struct Scene;\npub struct Sphere;\n" * 40,
+            "examples/sphere.rs": SPHERE,
+        },
+        description="Embeddable raytracer library for Rust with a simple raytrace() API",
+        stars=820,
+        topics=["raytracing", "rust", "library"],
+        language="Rust",
+        license="MIT License",
+    )
+    simulator.add_repo(
+        "pbrt",
+        "pathtracer",
+        {
+            "README.md": "# pathtracer\n\nPhysically based path tracer.\n" * 30,
+            "src/main.rs": "fn main() {}\n",
+        },
+        description="Physically based raytracer and path tracer in Rust",
+        stars=2400,
+        topics=["raytracing", "rendering"],
+        language="Rust",
+    )
+    simulator.add_repo(
+        "tiny",
+        "tiny-raytracer",
+        {"README.md": "# tiny-raytracer\n\nA raytracer in 200 lines.\n"},
+        description="Tiny raytracer library written in Rust",
+        stars=310,
+        topics=["raytracing"],
+        language="Rust",
+    )
+    simulator.add_repo(
+        "bevyengine",
+        "bevy",
+        {"README.md": "# Bevy\n\nA data-driven game engine.\n" * 50},
+        description="A refreshingly simple data-driven game engine built in Rust",
+        stars=36000,
+        topics=["game-engine"],
+        language="Rust",
+    )
+    # Large enough that GitHub truncates its recursive tree listing.
+    simulator.add_repo(
+        "big",
+        "monorepo",
+        {
+            f"crates/crate{i}/src/module{j}.rs": f"// crate {i} module {j}\n" * 30
+            for i in range(12)
+            for j in range(25)
+        }
+        | {"README.md": "# monorepo\n"},
+        description="Rust monorepo of raytracer crates",
+        stars=90,
+        language="Rust",
+    )
+    return simulator
+
+
+def created_repo(messages) -> str:
+    match = re.search(r"Repository (\S+) created", " ".join(tool_results(messages)))
+    return match.group(1) if match else "missing"
+
+
+def upload(messages):
+    return tool_calls(
+        (
+            "upload_files",
+            {
+                "owner": USER,
+                "repo": created_repo(messages),
+                "files": {
+                    "src/main.rs": SPHERE,
+                    "Cargo.toml": '[package]\nname = "sphere"\n',
+                },
+            },
+        )
+    )
+
+
+SEARCH = ("query_for_github_repos", {"keywords": "rust,raytracer,library", "count": 5})
+
+
+def readmes(*repos, focus="usage as a library"):
+    return tool_calls(
+        *(
+            ("get_readme", {"html_url": f"https://github.com/{repo}", "focus": focus})
+            for repo in repos
+        )
+    )
+
+
+READ_CODE = [
+    tool_calls(("get_repo_tree", {"html_url": "https://github.com/ray/raytrace-lib"})),
+    tool_calls(
+        (
+            "get_files_contents",
+            {
+                "html_url": "https://github.com/ray/raytrace-lib",
+                "paths": ["src/lib.rs", "src/scene.rs", "examples/sphere.rs"],
+            },
+        )
+    ),
+]
+
+RECOMMENDATION = (
+    "raytrace-lib is the best fit: it exposes raytrace() and is meant to be embedded."
+)
+
+# Each scenario scripts the turns of the single local agent, and of each agent of the MCP client.
+SCENARIOS = [
+    {
+        "name": "recommend",
+        "query": "Which Rust library should I use to raytrace a sphere?",
+        "local": [
+            tool_calls(SEARCH),
+            readmes("ray/raytrace-lib", "pbrt/pathtracer", "tiny/tiny-raytracer"),
+            RECOMMENDATION,
+        ],
+        "mcp": {
+            "classifier": ["RECOMMEND"],
+            RETRIEVER: [
+                tool_calls(SEARCH),
+                handoff(CURATOR, "Curate raytrace-lib, pathtracer, tiny-raytracer."),
+            ],
+            CURATOR: [
+                readmes("ray/raytrace-lib", "pbrt/pathtracer", "tiny/tiny-raytracer"),
+                RECOMMENDATION,
+            ],
+        },
+    },
+    {
+        "name": "generate and publish",
+        "query": "Write a Rust program that raytraces a sphere and publish it to GitHub.",
+        "local": [
+            tool_calls(SEARCH),
+            readmes("ray/raytrace-lib", "pbrt/pathtracer"),
+            *READ_CODE,
+            tool_calls(("create_repo", {"repository_name": "sphere"})),
+            upload,
+            "Published the sphere renderer.",
+        ],
+        "mcp": {
+            "classifier": ["CODE"],
+            RETRIEVER: [
+                tool_calls(SEARCH),
+                handoff(CURATOR, "Curate raytrace-lib, pathtracer, tiny-raytracer."),
+            ],
+            CURATOR: [
+                readmes("ray/raytrace-lib", "pbrt/pathtracer"),
+                handoff(GENERATOR, "Generate code with ray/raytrace-lib."),
+            ],
+            GENERATOR: [
+                *READ_CODE,
+                handoff(POSTER, f"Upload src/main.rs:\n{SPHERE}"),
+            ],
+            POSTER: [
+                tool_calls(("create_repo", {"repository_name": "sphere"})),
+                upload,
+                "Published the sphere renderer.",
+            ],
+        },
+    },
+    {
+        "name": "recommend, flaky GitHub",
+        "query": "Which Rust library should I use to raytrace a sphere?",
+        "inject": [
+            {"status": 403, "path": "^/search/", "retry_after": 1},
+            {"status": 502, "path": "/contents/README.md", "times": 1},
+        ],
+        "local": [
+            tool_calls(SEARCH),
+            readmes("ray/raytrace-lib", "pbrt/pathtracer", "tiny/tiny-raytracer"),
+            readmes("ray/raytrace-lib"),
+            RECOMMENDATION,
+        ],
+        "mcp": {
+            "classifier": ["RECOMMEND"],
+            RETRIEVER: [
+                tool_calls(SEARCH),
+                handoff(CURATOR, "Curate raytrace-lib, pathtracer, tiny-raytracer."),
+            ],
+            CURATOR: [
+                readmes("ray/raytrace-lib", "pbrt/pathtracer", "tiny/tiny-raytracer"),
+                # One README failed to load, so it is read again.
+                readmes("ray/raytrace-lib"),
+                RECOMMENDATION,
+            ],
+        },
+    },
+]
+
+
+def fresh_state(simulator: GitHubSimulator, scenario: dict | None = None):
+    # Every run starts with a cold cache, full rate limit budgets and no pinned commits.
+    set_cache(ResponseCache(tempfile.mkdtemp(prefix="octorag-bench-")))
+    set_scheduler(RateLimitScheduler())
+    octorag_github._head_shas.clear()
+    for rule in (scenario or {}).get("inject", []):
+        simulator.inject(**rule)
+    simulator.reset_stats()
+
+
+# How the tools report failures they catch themselves.
+TOOL_ERROR = re.compile(r"^(Error|An error occurred|Failed at|Malformed input)")
+
+
+def check_results(scenario: str, client: str, results):
+    """Fails the benchmark if a tool failed, so that no error path is measured by mistake."""
+    for result in results:
+        if isinstance(result, ToolMessage):
+            name, text, failed = (
+                result.name,
+                str(result.content),
+                result.status == "error",
+            )
+        elif isinstance(result, str):
+            name, text, failed = "tool", result, False
+        else:
+            continue
+        if failed or TOOL_ERROR.match(text):
+            raise RuntimeError(f"{scenario} ({client}): {name} failed: {text[:300]}")
+
+
+def report(scenario: str, client: str, simulator: GitHubSimulator, wall: float, turns):
+    stats = simulator.stats
+    print(
+        f"{scenario:<28} {client:<14} {stats['requests']:>8} {stats['bytes']:>9} "
+        f"{wall:>7.2f} {turns:>6}"
+    )
+
+
+def run_local(simulator: GitHubSimulator, scenario: dict):
+    model = ScriptedChatModel(turns=scenario["local"])
+    with mock.patch("langchain.chat_models.init_chat_model", return_value=model):
+        octorag = OctoRAG()
+    fresh_state(simulator, scenario)
+    start = time.perf_counter()
+    octorag.query(scenario["query"], thread_id="benchmark")
+    wall = time.perf_counter() - start
+    state = octorag.graph.get_state({"configurable": {"thread_id": "benchmark"}})
+    check_results(scenario["name"], "OctoRAG", state.values["messages"])
+    report(scenario["name"], "OctoRAG", simulator, wall, model.position)
+
+
+async def run_mcp(simulator: GitHubSimulator, scenario: dict, url: str):
+    client = OctoRAG_MCP(mcp_url=url, checkpointer=MemorySaver())
+    models = {
+        role: ScriptedChatModel(turns=turns) for role, turns in scenario["mcp"].items()
+    }
+    client.classifier = models.get("classifier", ScriptedChatModel(turns=["CODE"]))
+    for number in range(1, 5):
+        model = models.get(client.agent_names[number], ScriptedChatModel(turns=[]))
+        setattr(client, f"agent{number}_raw", model)
+    await client.start()
+    fresh_state(simulator, scenario)
+    start = time.perf_counter()
+    await client.run(scenario["query"], thread_id="benchmark")
+    wall = time.perf_counter() - start
+    state = await client.graph.aget_state({"configurable": {"thread_id": "benchmark"}})
+    check_results(scenario["name"], "OctoRAG_MCP", state.values["messages"])
+    await client.aclose()
+    turns = sum(model.position for model in models.values())
+    report(scenario["name"], "OctoRAG_MCP", simulator, wall, turns)
+
+
+async def run_server_tools(simulator: GitHubSimulator, snapshots: bool = False):
+    import octorag_core as tools
+
+    fresh_state(simulator)
+    set_snapshots(
+        SnapshotStore(tempfile.mkdtemp(prefix="octorag-bench-")) if snapshots else None
+    )
+    start = time.perf_counter()
+    tree = await tools.get_repo_tree("https://github.com/big/monorepo")
+    files = await tools.get_files_contents(
+        "https://github.com/big/monorepo",
+        [f"crates/crate{i}/src/module0.rs" for i in range(12)],
+    )
+    wall = time.perf_counter() - start
+    scenario = "large repository, snapshot" if snapshots else "large repository"
+    check_results(scenario, "server tools", [tree, files])
+    report(scenario, "server tools", simulator, wall, "-")
+    set_snapshots(None)
+
+
+def start_server(port: int):
+    import anyio
+
+    import octorag_mcp_server
+
+    server = octorag_mcp_server.create_server()
+    server.settings.port = port
+    # FastMCP and uvicorn log every request at INFO, which would bury the results.
+    server.settings.log_level = "WARNING"
+    logging.getLogger().setLevel(logging.WARNING)
+    # The server runs in this process, so its GitHub requests reach the same simulator.
+    threading.Thread(
+        target=anyio.run, args=(octorag_mcp_server.main, server), daemon=True
+    ).start()
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("localhost", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError("octorag_mcp_server did not start")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    simulator = github()
+    simulator.install()
+    port = free_port()
+    start_server(port)
+    url = f"http://localhost:{port}/mcp"
+
+    print(
+        f"{'scenario':<28} {'client':<14} {'requests':>8} {'bytes':>9} {'wall s':>7} {'turns':>6}"
+    )
+    for scenario in SCENARIOS:
+        run_local(simulator, scenario)
+        asyncio.run(run_mcp(simulator, scenario, url))
+    asyncio.run(run_server_tools(simulator))
+    asyncio.run(run_server_tools(simulator, snapshots=True))
+
+
+main()
@@ -0,0 +1,84 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from octorag_readme import (
+    CHARS_PER_TOKEN,
+    bm25_scores,
+    estimate_tokens,
+    select_sections,
+    split_sections,
+)
+
+README = """# tinyray
+
+A small raytracer library.
+
+## Installation
+
+```sh
+# not a heading
+cargo add tinyray
+```
+
+## Usage
+
+Call `raytrace()` with a scene to render it.
+
+## License
+
+MIT
+"""
+
+
+def test_split_sections():
+    sections = split_sections(README)
+    assert [(s.heading, s.level) for s in sections] == [
+        ("tinyray", 1),
+        ("Installation", 2),
+        ("Usage", 2),
+        ("License", 2),
+    ]
+    # Headings inside code fences are part of the section.
+    assert "# not a heading" in sections[1].body
+    assert split_sections("Intro only.\n")[0].heading == ""
+
+
+def test_bm25_scores():
+    sections = split_sections(README)
+    scores = bm25_scores(sections, "how to render a scene")
+    assert scores.index(max(scores)) == 2
+    assert scores[3] == 0.0
+    # Queries of stopwords only score nothing.
+    assert bm25_scores(sections, "how to") == [0.0] * len(sections)
+
+
+def test_select_sections():
+    assert select_sections(README, full=True) == README
+    # Everything fits: all sections in document order, nothing left out.
+    text = select_sections(README, budget=1000)
+    assert text.index("Installation") < text.index("Usage") < text.index("License")
+    assert "left out" not in text
+
+    # A focus picks the best sections, still in document order, and lists the rest.
+    text = select_sections(README, focus="render scene", budget=20)
+    assert "raytrace()" in text
+    assert "cargo add" not in text
+    assert text.endswith("Installation; License")
+
+    # A first section over budget is truncated rather than dropped.
+    long_readme = "# Big\n\n" + "word " * 400 + "\n\n## Small\n\ntext\n"
+    text = select_sections(long_readme, budget=50)
+    first = text.split("\n\n")[0]
+    assert first.endswith("\n[...]")
+    assert len(first) <= 50 * CHARS_PER_TOKEN + len("\n[...]")
+    assert text.endswith("with full=True, to read them): Small")
+    assert estimate_tokens("abcd" * 10) == 10
+
+
+if __name__ == "__main__":
+    test_split_sections()
+    test_bm25_scores()
+    test_select_sections()
+    print("octorag_readme: all checks passed")
@@ -0,0 +1,197 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from octorag_embeddings import HashingVectorizer, RepoIndex
+
+# Candidates as GitHub's star-sorted search returns them, with the ones that actually answer the query marked.
+SCENARIOS = [
+    (
+        "rust,raytracer,library",
+        [
+            (
+                "bevy",
+                "A refreshingly simple data-driven game engine built in Rust",
+                ["game-engine"],
+                False,
+            ),
+            (
+                "wgpu",
+                "Cross-platform, safe, pure-rust graphics api",
+                ["graphics", "webgpu"],
+                False,
+            ),
+            (
+                "rust-raytracer-tutorial",
+                "Code for the Ray Tracing in One Weekend blog series",
+                ["tutorial"],
+                False,
+            ),
+            (
+                "awesome-rust",
+                "A curated list of Rust code and resources",
+                ["awesome"],
+                False,
+            ),
+            (
+                "raytracer-cli",
+                "Command line ray tracer rendering scene files to PNG",
+                ["cli"],
+                False,
+            ),
+            ("rayon", "A data parallelism library for Rust", ["parallelism"], False),
+            (
+                "raytrace-lib",
+                "Embeddable raytracer library for Rust with a simple raytrace() API",
+                ["raytracing", "library"],
+                True,
+            ),
+            (
+                "pathtracer",
+                "Physically based path tracing renderer library",
+                ["rendering"],
+                True,
+            ),
+        ],
+    ),
+    (
+        "python,http server,nba stats",
+        [
+            (
+                "flask",
+                "The Python micro framework for building web applications",
+                ["web"],
+                False,
+            ),
+            (
+                "fastapi",
+                "FastAPI framework, high performance, easy to learn",
+                ["web", "api"],
+                False,
+            ),
+            ("requests", "A simple, yet elegant, HTTP library", ["http"], False),
+            (
+                "nba_api",
+                "An API Client package to access the APIs for NBA.com",
+                ["nba", "stats"],
+                True,
+            ),
+            (
+                "basketball-reference-scraper",
+                "Scrape NBA stats from basketball-reference",
+                ["nba"],
+                True,
+            ),
+            (
+                "httpie",
+                "Modern, user-friendly command-line HTTP client",
+                ["cli"],
+                False,
+            ),
+        ],
+    ),
+    (
+        "go,kubernetes operator,postgres backup",
+        [
+            (
+                "kubernetes",
+                "Production-Grade Container Scheduling and Management",
+                ["containers"],
+                False,
+            ),
+            ("etcd", "Distributed reliable key-value store", ["database"], False),
+            (
+                "operator-sdk",
+                "SDK for building Kubernetes applications",
+                ["operator"],
+                False,
+            ),
+            (
+                "prometheus",
+                "The Prometheus monitoring system and time series database",
+                ["monitoring"],
+                False,
+            ),
+            (
+                "cloudnative-pg",
+                "Kubernetes operator for PostgreSQL with continuous backup",
+                ["postgres", "backup", "operator"],
+                True,
+            ),
+            (
+                "pgbackrest",
+                "Reliable PostgreSQL backup and restore",
+                ["postgres", "backup"],
+                True,
+            ),
+        ],
+    ),
+    (
+        "javascript,markdown editor,react component",
+        [
+            ("react", "The library for web and native user interfaces", ["ui"], False),
+            ("next.js", "The React Framework", ["framework"], False),
+            (
+                "marked",
+                "A markdown parser and compiler built for speed",
+                ["markdown"],
+                False,
+            ),
+            (
+                "prettier",
+                "Prettier is an opinionated code formatter",
+                ["formatter"],
+                False,
+            ),
+            (
+                "react-md-editor",
+                "A simple markdown editor React component with preview",
+                ["markdown", "editor", "react"],
+                True,
+            ),
+        ],
+    ),
+]
+
+
+def readme_fetches(repos) -> int:
+    # The Repository Curator reads READMEs in listed order until it finds a relevant repository.
+    for position, repo in enumerate(repos, start=1):
+        if repo["relevant"]:
+            return position
+    return len(repos)
+
+
+def main():
+    index = RepoIndex(tempfile.mkdtemp(), HashingVectorizer())
+    star_sorted_total = 0
+    reranked_total = 0
+    start = time.perf_counter()
+    for query, candidates in SCENARIOS:
+        repos = [
+            {
+                "name": name,
+                "full_name": f"example/{name}",
+                "description": description,
+                "topics": topics,
+                "relevant": relevant,
+            }
+            for name, description, topics, relevant in candidates
+        ]
+        reranked = index.rank(query.replace(",", " "), repos, len(repos))
+        star_sorted = readme_fetches(repos)
+        after = readme_fetches(reranked)
+        star_sorted_total += star_sorted
+        reranked_total += after
+        print(f"{query!r}: {star_sorted} README fetches star-sorted, {after} re-ranked")
+    elapsed = time.perf_counter() - start
+    print(
+        f"Mean README fetches per query: {star_sorted_total / len(SCENARIOS):.2f} star-sorted, "
+        f"{reranked_total / len(SCENARIOS):.2f} re-ranked ({elapsed * 1000:.1f} ms to embed and rank)"
+    )
+
+
+main()
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# The agents are replaced below, so no real key is needed to construct them.
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages.ai import AIMessage
+from langchain_core.tools import StructuredTool
+from langgraph.checkpoint.memory import MemorySaver
+
+from octorag_mcp_client import OctoRAG_MCP
+
+RETRIEVER = "Repository Retriever"
+CURATOR = "Repository Curator"
+GENERATOR = "Code Generator"
+POSTER = "Code Poster"
+END = None
+
+# Agent turns as agents actually phrase them, with where each one was meant to go.
+SCENARIOS = [
+    [
+        (
+            RETRIEVER,
+            "Found tokio and actix-web. Repository Curator, please curate these repositories based on the query: rust http server",
+            CURATOR,
+        ),
+        (
+            CURATOR,
+            "Both are maintained, so there is no need to ask the Repository Retriever for more. Code Generator, please generate code with actix-web.",
+            GENERATOR,
+        ),
+        (
+            GENERATOR,
+            "Please upload these files to a new GitHub repository: main.rs: ...",
+            POSTER,
+        ),
+        (POSTER, "Uploaded to github.com/me/actix-server.", END),
+    ],
+    [
+        (
+            RETRIEVER,
+            "Please curate these repositories [nba_api, basketball-reference-scraper] based on the query: nba stats server",
+            CURATOR,
+        ),
+        (
+            CURATOR,
+            "nba_api covers the stats. The Code Generator is not needed, the user only asked for a recommendation: nba_api.",
+            END,
+        ),
+    ],
+    [
+        (
+            RETRIEVER,
+            "GitHub is a code hosting platform, no repositories are needed to answer this.",
+            END,
+        ),
+    ],
+    [
+        (
+            RETRIEVER,
+            "Repository Curator, please curate these repositories [raytrace-lib, pathtracer] based on the query: rust raytracer library",
+            CURATOR,
+        ),
+        (
+            CURATOR,
+            "Neither exposes a raytrace() function. Please retrieve more repositories based on the query: rust raytracer library with a simple API",
+            RETRIEVER,
+        ),
+        (
+            RETRIEVER,
+            "Repository Curator, here are more: [rayt, tiny-raytracer]. Please curate them based on the same query.",
+            CURATOR,
+        ),
+        (
+            CURATOR,
+            "rayt fits. Please generate code based on these repositories [rayt] and the query: render a sphere",
+            GENERATOR,
+        ),
+        (
+            GENERATOR,
+            "Code Poster, please upload these files to a new GitHub repository: src/main.rs: ...",
+            POSTER,
+        ),
+        (POSTER, "Done, the Code Generator's files are at github.com/me/sphere.", END),
+    ],
+]
+
+
+def substring_route(agent: str, content: str):
+    """How agents were routed before the handoff tool: by searching their replies for agent names."""
+    content = content.lower()
+    targets = {
+        RETRIEVER: [CURATOR],
+        CURATOR: [RETRIEVER, GENERATOR],
+        GENERATOR: [POSTER],
+        POSTER: [],
+    }[agent]
+    for target in targets:
+        if target.lower() in content:
+            return target
+    if "<<end>>" in content:
+        return END
+    return agent
+
+
+def count_substring_routing():
+    misroutes = 0
+    wasted_turns = 0
+    for scenario in SCENARIOS:
+        for agent, content, intended in scenario:
+            if intended is END:
+                # As the agents were told to finish.
+                content += " <<END>>"
+            routed = substring_route(agent, content)
+            if routed == intended:
+                continue
+            if routed == agent:
+                # The agent is asked to go again and has to repeat itself properly.
+                wasted_turns += 1
+            else:
+                # The wrong agent takes a turn, and one more is needed to send the work back.
+                misroutes += 1
+                wasted_turns += 2
+    return misroutes, wasted_turns
+
+
+class ScriptedAgent(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def scripted_agents(scenario):
+    turns = {name: [] for name in (RETRIEVER, CURATOR, GENERATOR, POSTER)}
+    for i, (agent, content, intended) in enumerate(scenario):
+        if intended is END:
+            turns[agent].append(AIMessage(content=content))
+        else:
+            turns[agent].append(
+                AIMessage(
+                    content="",
+                    tool_calls=[
+                        {
+                            "name": "handoff",
+                            "args": {"to_agent": intended, "payload": content},
+                            "id": f"handoff-{i}",
+                        }
+                    ],
+                )
+            )
+    return turns
+
+
+def placeholder_tools(model: OctoRAG_MCP):
+    async def unused(**kwargs):
+        return ""
+
+    names = {name for names in model.agent_tool_names[1:] for name in names}
+    return [
+        StructuredTool.from_function(coroutine=unused, name=name, description=name)
+        for name in names
+    ]
+
+
+async def count_handoff_routing():
+    misroutes = 0
+    wasted_turns = 0
+    for number, scenario in enumerate(SCENARIOS):
+        model = OctoRAG_MCP(checkpointer=MemorySaver(), fast_path=False)
+        turns = scripted_agents(scenario)
+        for i in range(1, 5):
+            setattr(
+                model,
+                f"agent{i}_raw",
+                ScriptedAgent(messages=iter(turns[model.agent_names[i]])),
+            )
+        graph = model.create_graph(placeholder_tools(model))
+        visited = []
+        async for update in graph.astream(
+            {"messages": [{"role": "user", "content": "query"}]},
+            {"configurable": {"thread_id": str(number)}},
+            stream_mode="updates",
+        ):
+            visited += [node for node in update if node in model.agent_names]
+        intended = [agent for agent, _, _ in scenario]
+        misroutes += sum(a != b for a, b in zip(visited, intended))
+        wasted_turns += len(visited) - len(intended)
+    return misroutes, wasted_turns
+
+
+def main():
+    turns = sum(len(scenario) for scenario in SCENARIOS)
+    before = count_substring_routing()
+    after = asyncio.run(count_handoff_routing())
+    print(f"{turns} agent turns in {len(SCENARIOS)} conversations")
+    print(f"Substring routing: {before[0]} misroutes, {before[1]} wasted turns")
+    print(f"Handoff tool:      {after[0]} misroutes, {after[1]} wasted turns")
+
+
+main()
@@ -0,0 +1,117 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from octorag_cache import set_cache
+from octorag_core import query_repos
+from octorag_github import run_sync
+from octorag_search import build_queries, candidate_count, merge_results, parse_keywords
+from octorag_simulator import GitHubSimulator
+
+
+def repo(full_name, stars):
+    return {"full_name": full_name, "stargazers_count": stars}
+
+
+def test_parse_keywords():
+    terms, qualifiers = parse_keywords(
+        "raytracer, rust,stars:>100 , more than 500 stars,updated since 2024,library"
+    )
+    assert terms == ["raytracer", "library"]
+    assert qualifiers == [
+        "language:rust",
+        "stars:>100",
+        "stars:>=500",
+        "pushed:>2024-01-01",
+    ]
+
+    # Qualifier values keep their case, and unknown qualifiers are plain terms.
+    assert parse_keywords("topic:RayTracing,C++,foo:bar") == (
+        ["foo:bar"],
+        ["topic:RayTracing", "language:cpp"],
+    )
+    assert parse_keywords("1000+ stars,stars over 50,pushed after 2023-06") == (
+        [],
+        ["stars:>=1000", "stars:>=50", "pushed:>2023-06-01"],
+    )
+    assert parse_keywords(" , ,") == ([], [])
+
+
+def test_build_queries():
+    assert build_queries("http server,python,stars:>100") == [
+        "http server language:python stars:>100"
+    ]
+    assert build_queries("cli,tui,go") == ["cli language:go", "tui language:go"]
+    # Only qualifiers: one search with all of them.
+    assert build_queries("rust,topic:raytracing") == ["language:rust topic:raytracing"]
+    assert build_queries("") == []
+
+
+def test_merge_results():
+    merged = merge_results(
+        [
+            [repo("a/popular", 900), repo("a/both", 10), repo("a/both", 10)],
+            [repo("A/Both", 10), repo("a/other", 50)],
+        ],
+        count=10,
+    )
+    # Matching more keywords beats more stars, and duplicates count once per search.
+    assert [item["full_name"] for item in merged["items"]] == [
+        "a/both",
+        "a/popular",
+        "a/other",
+    ]
+    assert merged["total_count"] == 3
+
+    merged = merge_results([[repo("a/x", 1), repo("a/y", 3), repo("a/z", 2)]], 2)
+    assert [item["full_name"] for item in merged["items"]] == ["a/y", "a/z"]
+    assert merged["total_count"] == 3
+    assert merge_results([], 5) == {"total_count": 0, "items": []}
+
+    # A repository matching both keywords beats each keyword's most starred result.
+    merged = merge_results(
+        [
+            [repo("a/engine", 5000), repo("a/tracer", 300), repo("a/both", 20)],
+            [repo("a/toolkit", 9000), repo("a/both", 20)],
+        ],
+        count=1,
+    )
+    assert [item["full_name"] for item in merged["items"]] == ["a/both"]
+
+
+def test_query_repos():
+    assert candidate_count(1) >= 30
+    simulator = GitHubSimulator()
+    simulator.add_repo(
+        "b", "tokio", description="An async runtime library", stars=90000
+    )
+    simulator.add_repo(
+        "c", "raytracer-go", description="A raytracer written in Go", stars=5000
+    )
+    simulator.add_repo(
+        "a",
+        "raytrace-lib",
+        description="Embeddable raytracer library",
+        stars=820,
+        language="Rust",
+    )
+    simulator.add_repo("d", "serde", description="A library", stars=8000)
+    simulator.install()
+    set_cache(None)
+
+    repos = run_sync(query_repos("raytracer,library", 1))
+    assert [item["full_name"] for item in repos["items"]] == ["a/raytrace-lib"]
+    # One search per keyword, each a single page of candidates.
+    assert simulator.stats["requests"] == 2
+
+    repos = run_sync(query_repos("library,rust", 2))
+    assert [item["full_name"] for item in repos["items"]] == ["a/raytrace-lib"]
+
+
+if __name__ == "__main__":
+    test_parse_keywords()
+    test_build_queries()
+    test_merge_results()
+    test_query_repos()
+    print("octorag_search: all checks passed")